@@ -1,53 +1,206 @@
+import asyncio
+import importlib.util
+import time
+from contextlib import asynccontextmanager
 import httpx
 from pydantic import ValidationError
-from typing import Union
+from typing import AsyncIterator, Dict, List, Optional, Union
 
 from app.models import (
+    BatchSignalEntry,
+    BatchSignalResponse,
     DeepSeekRequest,
+    DeepSeekResponseFormat,
+    DeepSeekStreamChunk,
     DeepSeekMessage,
     DeepSeekResponse,
     DeepSeekErrorResponse,
+    DeepSeekUsage,
 )
+from app.metrics import DEEPSEEK_REQUESTS, DEEPSEEK_TOKENS
+from app.prompt import PromptBuilder, estimate_tokens
+from app.ratelimit import get_limiter
 from app.utils import logger
 
+_client: Optional[httpx.AsyncClient] = None
 
-async def get_trading_signal(
-    indicators: dict,
-    api_key: str,
-) -> Union[str, DeepSeekErrorResponse]:
+
+class ConnectionStats:
     """
-    Generates a trading signal (buy, sell, or hold) using the DeepSeek API
-    based on the provided technical indicators.
+    Tracks TCP/TLS handshakes on the shared DeepSeek client.
+
+    Each call is traced through httpcore's ``trace`` extension: a call that
+    opens a connection records its handshake time, a call that reuses a
+    pooled connection is credited with the last measured handshake time.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.last_handshake_ms: Optional[float] = None
+        self.saved_ms = 0.0
+
+    def tracer(self) -> "_CallTrace":
+        return _CallTrace(self)
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "last_handshake_ms": self.last_handshake_ms,
+            "saved_ms": round(self.saved_ms, 3),
+        }
+
+
+class _CallTrace:
+    def __init__(self, stats: ConnectionStats):
+        self.stats = stats
+        self.started: Optional[float] = None
+        self.handshake_ms: Optional[float] = None
+
+    async def __call__(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.started":
+            self.started = time.perf_counter()
+        elif event_name in (
+            "connection.connect_tcp.complete", "connection.start_tls.complete"
+        ) and self.started is not None:
+            self.handshake_ms = (time.perf_counter() - self.started) * 1000
+
+    def finish(self) -> str:
+        """Records the call and returns a one-line handshake report."""
+        stats = self.stats
+        stats.calls += 1
+        if self.handshake_ms is not None:
+            stats.new_connections += 1
+            stats.last_handshake_ms = round(self.handshake_ms, 3)
+            return f"new connection, handshake {self.handshake_ms:.1f}ms"
+        stats.reused_connections += 1
+        if stats.last_handshake_ms is None:
+            return "reused connection"
+        stats.saved_ms += stats.last_handshake_ms
+        return (
+            f"reused connection, saved ~{stats.last_handshake_ms:.1f}ms "
+            f"handshake ({stats.saved_ms:.1f}ms total)"
+        )
+
+
+connection_stats = ConnectionStats()
+
+
+class TokenUsage:
+    """Accumulates ``DeepSeekUsage`` across calls to track prompt size."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.last_prompt_tokens: Optional[int] = None
+        self.estimated_calls = 0
+
+    def record(self, usage: DeepSeekUsage, estimated: bool = False):
+        self.calls += 1
+        self.estimated_calls += estimated
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.last_prompt_tokens = usage.prompt_tokens
+        DEEPSEEK_REQUESTS.inc()
+        DEEPSEEK_TOKENS.inc(usage.prompt_tokens, kind="prompt")
+        DEEPSEEK_TOKENS.inc(usage.completion_tokens, kind="completion")
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "last_prompt_tokens": self.last_prompt_tokens,
+            "estimated_calls": self.estimated_calls,
+            "avg_prompt_tokens": (
+                round(self.prompt_tokens / self.calls, 1) if self.calls else None
+            ),
+        }
+
+
+token_usage = TokenUsage()
+_prompt_builder = PromptBuilder()
+
+
+def set_prompt_builder(builder: PromptBuilder):
+    """Replaces the builder used to encode indicators into prompts."""
+    global _prompt_builder
+    _prompt_builder = builder
+
+
+def init_client(
+    max_connections: int = 10,
+    http2: bool = False,
+    connect_timeout: float = 5.0,
+    read_timeout: float = 30.0,
+) -> httpx.AsyncClient:
+    """
+    Creates the shared, keep-alive DeepSeek client used by every call.
 
     Args:
-        indicators (dict): A dictionary of technical indicators.
-        api_key: str): Your DeepSeek API key.
+        max_connections (int): Pool size; match it to symbol concurrency.
+        http2 (bool): Use HTTP/2 if the optional ``h2`` package is installed.
+        connect_timeout (float): Seconds allowed to establish a connection.
+        read_timeout (float): Seconds allowed between response bytes.
 
     Returns:
-        Union[str, DeepSeekErrorResponse]: The trading signal ("buy", "sell",
-                                          "hold") or an error response.
+        httpx.AsyncClient: The shared client.
     """
-    deepseek_api_url = "https://api.deepseek.com/chat/completions"
-
-    prompt_content = (
-        f"Given the following technical indicator values:\n"
-        f"{indicators}\n\n"
-        f"Based on these values, provide a trading signal. Respond with only"
-        f" one word: 'buy, sell', or 'hold'."
+    global _client
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("DeepSeek: HTTP/2 requested but 'h2' is not installed. Using HTTP/1.1.")
+        http2 = False
+    _client = httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(
+            connect=connect_timeout, read=read_timeout, write=read_timeout,
+            pool=connect_timeout,
+        ),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
     )
+    logger.info(
+        f"DeepSeek: Shared client ready (pool={max_connections}, http2={http2})."
+    )
+    return _client
 
 
+async def close_client():
+    """Closes the shared DeepSeek client, if one is open."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Returns the shared DeepSeek client, creating a default one if needed."""
+    if _client is None or _client.is_closed:
+        return init_client()
+    return _client
 
-    messages = [
-        DeepSeekMessage(
-            role="system",
-            content="You are a trading signal generator. Your only output is"
-            " 'buy, 'sell', or 'hold'.",
-        ),
-        DeepSeekMessage(role="user", content=prompt_content),
-    ]
 
-    request_body = DeepSeekRequest(messages=messages).model_dump_json(by_alias=True)
+DEEPSEEK_API_URL = "https://api.deepseek.com/chat/completions"
+SIGNALS = ("buy", "sell", "hold")
+
+
+async def _request_completion(
+    request: DeepSeekRequest,
+    api_key: str,
+) -> Union[DeepSeekResponse, DeepSeekErrorResponse]:
+    """
+    Sends a chat completion request on the shared client.
+
+    Network, HTTP and validation failures are turned into a
+    ``DeepSeekErrorResponse`` instead of being raised.
+    """
+    request_body = request.model_dump_json(by_alias=True, exclude_none=True)
 
     headers = {
         "Content-Type": "application/json",
@@ -55,42 +208,24 @@ async def get_trading_signal(
     }
 
     try:
-        logger.info("Requesting trading signal from DeepSeek API...")
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                deepseek_api_url, headers=headers, content=request_body
-            )
-            response.raise_for_status()
-            data = response.json()
+        trace = connection_stats.tracer()
+        response = await get_limiter("deepseek").request(lambda: get_client().post(
+            DEEPSEEK_API_URL, headers=headers, content=request_body,
+            extensions={"trace": trace},
+        ))
+        logger.debug("DeepSeek: %s", trace.finish())
+        response.raise_for_status()
+        data = response.json()
 
         try:
             deepseek_response = DeepSeekResponse(**data)
-            if deepseek_response.choices and \
-               deepseek_response.choices[0].message.content:
-                signal = (
-                    deepseek_response.choices[0].message.content.strip().lower()
-                )
-                if signal in ["buy", "sell", "hold"]:
-                    logger.info(f"Received signal from DeepSeek: {signal}")
-                    return signal
-                else:
-                    logger.warning(
-                        f"DeepSeek returned an unexpected signal format: {signal}"
-                    )
-                    return DeepSeekErrorResponse(
-                        error={
-                            "message": f"Unexpected signal format: {signal}",
-                            "type": "parsing_error",
-                        }
-                    )
-            else:
-                logger.warning("No signal found in DeepSeek response.")
-                return DeepSeekErrorResponse(
-                    error={
-                        "message": "No signal found in DeepSeek response.",
-                        "type": "parsing_error",
-                    }
-                )
+            token_usage.record(deepseek_response.usage)
+            logger.debug(
+                "DeepSeek usage: prompt_tokens=%d, completion_tokens=%d",
+                deepseek_response.usage.prompt_tokens,
+                deepseek_response.usage.completion_tokens,
+            )
+            return deepseek_response
         except ValidationError as e:
             logger.error(f"Validation error parsing DeepSeek response: {e}")
             try:
@@ -103,7 +238,13 @@ async def get_trading_signal(
                     }
                 )
 
-    except httpx.RequestError as exc:
+    except Exception as exc:
+        return _error_from_exception(exc)
+
+
+def _error_from_exception(exc: Exception) -> DeepSeekErrorResponse:
+    """Maps a failed DeepSeek call to an error response and logs it."""
+    if isinstance(exc, httpx.RequestError):
         logger.error(f"Network error during DeepSeek API call: {exc}")
         return DeepSeekErrorResponse(
             error={
@@ -111,7 +252,7 @@ async def get_trading_signal(
                 "type": "network_error",
             }
         )
-    except httpx.HTTPStatusError as exc:
+    if isinstance(exc, httpx.HTTPStatusError):
         logger.error(
             f"HTTP error from DeepSeek API: {exc.response.status_code} - "
             f"{exc.response.text}"
@@ -125,13 +266,330 @@ async def get_trading_signal(
                 "type": "http_error",
             }
         )
+    logger.error(f"An unexpected error occurred during DeepSeek API call: {exc}")
+    return DeepSeekErrorResponse(
+        error={
+            "message": (
+                f"An unexpected error occurred during DeepSeek API call: {exc}"
+            ),
+            "type": "unexpected_error",
+        }
+    )
+
+
+def _resolve_signal(text: str) -> Optional[str]:
+    """
+    Returns the signal once streamed text spells one out, "" if the text can
+    no longer become a signal, and None while it is still undecided.
+    """
+    word = text.strip().strip("'\".!").lower()
+    if word in SIGNALS:
+        return word
+    if any(signal.startswith(word) for signal in SIGNALS):
+        return None
+    return ""
+
+
+def _estimate_usage(request: DeepSeekRequest, completion: str) -> DeepSeekUsage:
+    """Approximate usage of a stream that ended before its usage chunk."""
+    prompt_tokens = sum(estimate_tokens(message.content) for message in request.messages)
+    completion_tokens = estimate_tokens(completion)
+    return DeepSeekUsage(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+    )
+
+
+@asynccontextmanager
+async def _open_stream(body: str, headers: dict, trace) -> AsyncIterator[httpx.Response]:
+    """
+    Opens a streamed completion under the DeepSeek rate limiter, retrying
+    429/5xx replies before any of the body is consumed.
+    """
+    limiter = get_limiter("deepseek")
+    attempt = 0
+    while True:
+        async with limiter.slot():
+            async with get_client().stream(
+                "POST", DEEPSEEK_API_URL, headers=headers, content=body,
+                extensions={"trace": trace},
+            ) as response:
+                if not response.is_error:
+                    yield response
+                    return
+                await response.aread()
+                delay = limiter.retry_delay(attempt, response)
+                if delay is None:
+                    response.raise_for_status()
+        attempt += 1
+        await limiter.sleep(delay)
+
+
+async def _stream_signal(
+    request: DeepSeekRequest,
+    api_key: str,
+) -> Union[str, DeepSeekErrorResponse]:
+    """
+    Streams a completion and returns as soon as the text resolves to a
+    signal; leaving the ``stream`` context closes the response, which
+    cancels the rest of the stream.
+
+    DeepSeek only reports usage in the stream's last chunk, so a stream cut
+    short is recorded with usage estimated from the prompt and the text
+    received; either way every stream that was answered counts as a request.
+    """
+    request_body = request.model_dump_json(by_alias=True, exclude_none=True)
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}",
+        "Accept": "text/event-stream",
+    }
+    started = time.perf_counter()
+    text = ""
+    answered = False
+    usage: Optional[DeepSeekUsage] = None
+
+    try:
+        trace = connection_stats.tracer()
+        async with _open_stream(request_body, headers, trace) as response:
+            answered = True
+            logger.debug("DeepSeek: %s", trace.finish())
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue  # Blank separators and ": keep-alive" comments
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                try:
+                    chunk = DeepSeekStreamChunk.model_validate_json(payload)
+                except ValidationError as e:
+                    logger.error(f"Validation error parsing DeepSeek stream chunk: {e}")
+                    return DeepSeekErrorResponse(
+                        error={
+                            "message": f"Failed to parse DeepSeek stream chunk: {payload}",
+                            "type": "validation_error",
+                        }
+                    )
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    text += chunk.choices[0].delta.content
+                    signal = _resolve_signal(text)
+                    if signal:
+                        elapsed_ms = (time.perf_counter() - started) * 1000
+                        logger.info(
+                            f"Received streamed signal from DeepSeek after "
+                            f"{elapsed_ms:.1f}ms: {signal}"
+                        )
+                        return signal
+                    if signal == "":
+                        break
     except Exception as exc:
-        logger.error(f"An unexpected error occurred during DeepSeek API call: {exc}")
+        return _error_from_exception(exc)
+    finally:
+        if answered:
+            if usage is not None:
+                token_usage.record(usage)
+            else:
+                token_usage.record(_estimate_usage(request, text), estimated=True)
+
+    signal = text.strip().lower()
+    if not signal:
+        logger.warning("No signal found in DeepSeek stream.")
         return DeepSeekErrorResponse(
             error={
-                "message": (
-                    f"An unexpected error occurred during DeepSeek API call: {exc}"
-                ),
-                "type": "unexpected_error",
+                "message": "No signal found in DeepSeek response.",
+                "type": "parsing_error",
+            }
+        )
+    logger.warning(f"DeepSeek returned an unexpected signal format: {signal}")
+    return DeepSeekErrorResponse(
+        error={
+            "message": f"Unexpected signal format: {signal}",
+            "type": "parsing_error",
+        }
+    )
+
+
+def _first_message(deepseek_response: DeepSeekResponse) -> Optional[str]:
+    if deepseek_response.choices and deepseek_response.choices[0].message.content:
+        return deepseek_response.choices[0].message.content
+    return None
+
+
+async def get_trading_signal(
+    indicators: dict,
+    api_key: str,
+    stream: bool = False,
+) -> Union[str, DeepSeekErrorResponse]:
+    """
+    Generates a trading signal (buy, sell, or hold) using the DeepSeek API
+    based on the provided technical indicators.
+
+    Args:
+        indicators (dict): A dictionary of technical indicators.
+        api_key: str): Your DeepSeek API key.
+        stream (bool): Stream the reply and return as soon as it resolves
+                       to a signal instead of waiting for the full response.
+
+    Returns:
+        Union[str, DeepSeekErrorResponse]: The trading signal ("buy", "sell",
+                                          "hold") or an error response.
+    """
+    table, estimated_tokens = _prompt_builder.table({None: indicators})
+    logger.debug("DeepSeek prompt table: ~%d tokens", estimated_tokens)
+    prompt_content = (
+        f"Given the following technical indicator values (CSV):\n"
+        f"{table}\n\n"
+        f"Based on these values, provide a trading signal. Respond with only"
+        f" one word: 'buy, sell', or 'hold'."
+    )
+
+    messages = [
+        DeepSeekMessage(
+            role="system",
+            content="You are a trading signal generator. Your only output is"
+            " 'buy, 'sell', or 'hold'.",
+        ),
+        DeepSeekMessage(role="user", content=prompt_content),
+    ]
+
+    if stream:
+        logger.debug("Requesting streamed trading signal from DeepSeek API...")
+        return await _stream_signal(
+            DeepSeekRequest(messages=messages, max_tokens=5, stream=True),
+            api_key,
+        )
+
+    logger.debug("Requesting trading signal from DeepSeek API...")
+    deepseek_response = await _request_completion(
+        DeepSeekRequest(messages=messages), api_key
+    )
+    if isinstance(deepseek_response, DeepSeekErrorResponse):
+        return deepseek_response
+
+    content = _first_message(deepseek_response)
+    if content is None:
+        logger.warning("No signal found in DeepSeek response.")
+        return DeepSeekErrorResponse(
+            error={
+                "message": "No signal found in DeepSeek response.",
+                "type": "parsing_error",
             }
         )
+
+    signal = content.strip().lower()
+    if signal in SIGNALS:
+        logger.debug("Received signal from DeepSeek: %s", signal)
+        return signal
+
+    logger.warning(f"DeepSeek returned an unexpected signal format: {signal}")
+    return DeepSeekErrorResponse(
+        error={
+            "message": f"Unexpected signal format: {signal}",
+            "type": "parsing_error",
+        }
+    )
+
+
+def _parse_batch_signals(content: Optional[str], symbols: List[str]) -> Dict[str, str]:
+    """Returns the valid entries of a batch reply; invalid ones are left out."""
+    if content is None:
+        return {}
+    try:
+        batch = BatchSignalResponse.model_validate_json(content)
+    except ValidationError as e:
+        logger.warning(f"DeepSeek batch reply is not a valid signal map: {e}")
+        return {}
+
+    signals = {}
+    for symbol in symbols:
+        try:
+            entry = BatchSignalEntry(symbol=symbol, signal=batch.signals.get(symbol))
+            signals[symbol] = entry.signal
+        except ValidationError:
+            logger.warning(
+                f"DeepSeek batch reply has no valid signal for {symbol}: "
+                f"{batch.signals.get(symbol)!r}"
+            )
+    return signals
+
+
+async def get_trading_signals(
+    indicators_by_symbol: Dict[str, dict],
+    api_key: str,
+    stream: bool = False,
+) -> Dict[str, Union[str, DeepSeekErrorResponse]]:
+    """
+    Generates trading signals for several symbols with one DeepSeek request.
+
+    The model is asked for a JSON object mapping each symbol to a signal.
+    Symbols whose entry is missing or invalid fall back to individual
+    ``get_trading_signal`` calls. If the request itself fails, every symbol
+    gets its error and nothing is retried.
+
+    Args:
+        indicators_by_symbol (Dict[str, dict]): Indicators keyed by symbol.
+        api_key (str): Your DeepSeek API key.
+        stream (bool): Stream the per-symbol calls (the batched JSON reply
+                       itself is never streamed).
+
+    Returns:
+        Dict[str, Union[str, DeepSeekErrorResponse]]: Signal or error
+                                                      response per symbol.
+    """
+    symbols = list(indicators_by_symbol)
+    if len(symbols) <= 1:
+        return {
+            symbol: await get_trading_signal(
+                indicators=indicators, api_key=api_key, stream=stream
+            )
+            for symbol, indicators in indicators_by_symbol.items()
+        }
+
+    table, estimated_tokens = _prompt_builder.table(indicators_by_symbol)
+    logger.debug("DeepSeek batch prompt table: ~%d tokens", estimated_tokens)
+    prompt_content = (
+        f"Given the following technical indicator values per symbol (CSV):\n"
+        f"{table}\n\n"
+        f"Based on these values, provide a trading signal for every symbol. "
+        f"Respond with only a JSON object of the form "
+        f'{{"signals": {{"<symbol>": "buy" | "sell" | "hold"}}}}.'
+    )
+    messages = [
+        DeepSeekMessage(
+            role="system",
+            content="You are a trading signal generator. Your only output is"
+            " a JSON object mapping each symbol to 'buy', 'sell', or 'hold'.",
+        ),
+        DeepSeekMessage(role="user", content=prompt_content),
+    ]
+    request = DeepSeekRequest(
+        messages=messages,
+        max_tokens=20 + 12 * len(symbols),
+        response_format=DeepSeekResponseFormat(type="json_object"),
+    )
+
+    logger.debug("Requesting batched trading signals for %d symbols...", len(symbols))
+    deepseek_response = await _request_completion(request, api_key)
+    if isinstance(deepseek_response, DeepSeekErrorResponse):
+        # Per-symbol retries would multiply the traffic of a throttled or
+        # unreachable provider; the next tick tries the batch again
+        return {symbol: deepseek_response for symbol in symbols}
+    signals = _parse_batch_signals(_first_message(deepseek_response), symbols)
+    logger.debug("Received batched signals from DeepSeek: %s", signals)
+
+    results: Dict[str, Union[str, DeepSeekErrorResponse]] = dict(signals)
+    fallback = [symbol for symbol in symbols if symbol not in signals]
+    if fallback:
+        logger.info(f"Falling back to per-symbol requests for {fallback}.")
+        retried = await asyncio.gather(*(
+            get_trading_signal(
+                indicators=indicators_by_symbol[symbol], api_key=api_key,
+                stream=stream,
+            )
+            for symbol in fallback
+        ))
+        results.update(zip(fallback, retried))
+    return {symbol: results[symbol] for symbol in symbols}
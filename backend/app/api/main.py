@@ -1,27 +1,189 @@
 import asyncio
-from fastapi import FastAPI
-from app.state import load_state
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from app import analyzer
+from app.config import get_settings, settings
+from app.history import DOWNSAMPLE_METHODS
+from app.metrics import REGISTRY
+from app.models import HistoricalIndicatorDataPoint
+from app.prompt import PromptBuilder
+from app.ratelimit import limiter_stats
+from app.state import close_store, get_store, load_state
+from app.utils import setup_logging
+from app import background
 from app.background import trading_loop
 
-app = FastAPI()
 
-@app.on_event("startup")
-async def startup_event():
-    asyncio.create_task(trading_loop())
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_settings()  # Resolve (and validate) settings before anything starts
+    setup_logging(settings.LOG_LEVEL, settings.LOG_FORMAT)
+    # One keep-alive DeepSeek client for the app's lifetime, pooled to the
+    # number of symbol pipelines that can request signals at once.
+    analyzer.init_client(
+        max_connections=settings.MAX_CONCURRENT_SYMBOLS,
+        http2=settings.DEEPSEEK_HTTP2,
+        connect_timeout=settings.DEEPSEEK_CONNECT_TIMEOUT,
+        read_timeout=settings.DEEPSEEK_READ_TIMEOUT,
+    )
+    analyzer.set_prompt_builder(PromptBuilder(
+        indicators=settings.PROMPT_INDICATORS,
+        significant_digits=settings.PROMPT_SIGNIFICANT_DIGITS,
+        token_budget=settings.PROMPT_TOKEN_BUDGET,
+    ))
+    get_store()  # Recover the journaled state before serving or trading
+    background.configure()
+    task = asyncio.create_task(trading_loop())
+    yield
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await analyzer.close_client()
+    close_store()
+
+
+app = FastAPI(lifespan=lifespan)
+
 
 @app.get("/")
 def read_root():
     return {"message": "AI Trading Bot API is running."}
 
+
+def _state_symbol(symbol: Optional[str]) -> str:
+    """The requested symbol, or the configured one when only one trades."""
+    if symbol is not None:
+        return symbol
+    if len(settings.SYMBOLS) != 1:
+        raise HTTPException(
+            status_code=400,
+            detail=f"symbol is required, one of {list(settings.SYMBOLS)}",
+        )
+    return next(iter(settings.SYMBOLS))
+
+
 @app.get("/api/signal")
-def get_signal():
-    last_executed_signal, _ = load_state()
+def get_signal(symbol: Optional[str] = None):
+    last_executed_signal, _ = load_state(_state_symbol(symbol))
     return {"signal": last_executed_signal}
 
+
 @app.get("/api/state")
-def get_state():
-    last_executed_signal, last_indicators = load_state()
+def get_state(symbol: Optional[str] = None):
+    last_executed_signal, last_indicators = load_state(_state_symbol(symbol))
     return {
         "last_executed_signal": last_executed_signal,
         "last_indicators": last_indicators,
     }
+
+
+@app.get("/api/connections")
+def get_connections():
+    return {"deepseek": analyzer.connection_stats.as_dict()}
+
+
+@app.get("/api/usage")
+def get_usage():
+    return {"deepseek": analyzer.token_usage.as_dict()}
+
+
+@app.get("/api/signal-cache")
+def get_signal_cache():
+    if background.signal_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **background.signal_cache.stats()}
+
+
+@app.get("/api/history", response_model=List[HistoricalIndicatorDataPoint])
+def get_history(
+    indicator: str,
+    symbol: Optional[str] = None,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    max_points: Optional[int] = 1000,
+    method: str = "lttb",
+):
+    """
+    Historical values of one indicator, optionally downsampled server-side.
+
+    ``start``/``end`` are Unix seconds; ``symbol`` defaults to the first
+    configured symbol; ``method`` is 'lttb', 'minmax' or 'none'.
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"method must be one of {DOWNSAMPLE_METHODS}",
+        )
+    symbol = symbol or next(iter(settings.SYMBOLS))
+    points = background.indicator_history.query(
+        symbol, indicator, start=start, end=end,
+        max_points=max_points, method=method,
+    )
+    return [
+        HistoricalIndicatorDataPoint(timestamp=timestamp, value=value)
+        for timestamp, value in points
+    ]
+
+
+@app.get("/api/stream")
+async def stream_updates(last_event_id: Optional[int] = Header(None)):
+    """
+    Server-Sent Events feed: a snapshot of every symbol's state, then a
+    diff whenever the trading loop produces new indicators, signals,
+    state or orders. Reconnecting clients resume from ``Last-Event-ID``.
+    """
+    return StreamingResponse(
+        background.broadcaster.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/stream/stats")
+def get_stream_stats():
+    return background.broadcaster.stats()
+
+
+@app.get("/api/scheduler")
+def get_scheduler():
+    if background.scheduler is None:
+        return {"running": False}
+    return {"running": True, **background.scheduler.stats()}
+
+
+@app.get("/api/ledger")
+def get_ledger():
+    if background.ledger is None:
+        return {"running": False}
+    return {"running": True, **background.ledger.snapshot()}
+
+
+@app.get("/api/orders")
+def get_orders(symbol: Optional[str] = None, limit: int = 50):
+    """Recent orders with fill price, slippage and latencies, newest first."""
+    if background.order_tracker is None:
+        return []
+    return background.order_tracker.recent(limit=limit, symbol=symbol)
+
+
+@app.get("/api/orders/summary")
+def get_orders_summary():
+    if background.order_tracker is None:
+        return {"running": False}
+    return {"running": True, **background.order_tracker.summary()}
+
+
+@app.get("/api/ratelimits")
+def get_rate_limits():
+    """Tokens, in-flight and queued requests and retries per provider."""
+    return limiter_stats()
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Stage latencies, error and token counters in Prometheus text format."""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,120 +1,490 @@
 import asyncio
-from app.data_fetcher import get_realtime_data, calculate_indicators
-from app.analyzer import get_trading_signal
+import logging
+import time
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Awaitable, Dict, List, Optional, Union
+
+from app.broadcast import Broadcaster
+from app.executor import create_executor, run_blocking
+from app.history import IndicatorHistory
+from app.ingest import BarAggregator, WebSocketSource, alpaca_subscription, ingest
+from app.metrics import DEEPSEEK_ERRORS, STAGE_ERRORS, STAGE_SECONDS
+from app.models import AlpacaOrder, DeepSeekErrorResponse
+from app.orders import OrderTracker
+from app.ratelimit import configure_limiter
+from app.scheduler import TickScheduler, run_pipelined
+from app.signal_cache import (
+    SignalCache,
+    get_cached_trading_signal,
+    get_cached_trading_signals,
+)
+from app.rules import default_rules
 from app.thinker import should_execute_trade
-from app.trader import AlpacaTrader
+from app.trader import AlpacaTrader, PositionLedger
 from app.config import settings
 
-from app.utils import logger
-from app.state import load_state, save_state
+from app.utils import LogSampler, logger
+from app.state import load_entry, save_state
 
-async def trading_loop():
-    logger.info("Starting the AI Trading Bot background task...")
+if TYPE_CHECKING:
+    # pandas, yfinance and the indicator engine are imported on first use
+    # so that importing the API stays fast.
+    import pandas as pd
 
-    # --- Symbol Configuration ---
-    TICKER = "BTC-USD"  # Using yfinance format
-    ALPACA_SYMBOL = "BTCUSD"
+# Built from settings by ``configure``; the defaults below only serve
+# until then (and in tests).
+signal_cache: Optional[SignalCache] = None
+indicator_history = IndicatorHistory()
+thinker_rules = default_rules()
 
-    trader = AlpacaTrader()
-    await trader.get_account_info()
+# Pushes indicator, signal, state and order changes to /api/stream clients
+broadcaster = Broadcaster()
 
-    while True:
-        try:
-            last_executed_signal, last_indicators = load_state()
-
-            logger.info(f"\n--- Fetching Real-Time Data for {TICKER} ---")
-            data = get_realtime_data(TICKER)
-            if data.empty:
-                logger.warning(f"No real-time data fetched for {TICKER}. Skipping this interval.")
-                await asyncio.sleep(settings.TRADE_INTERVAL_SECONDS)
-                continue
-            
-            data = calculate_indicators(data)
-            
-            if 'close_btc-usd' not in data.columns:
-                logger.error(f"'close' column not found in fetched data for {TICKER}. Available columns: {data.columns.tolist()}. Skipping this interval.")
-                await asyncio.sleep(settings.TRADE_INTERVAL_SECONDS)
-                continue
-
-            current_indicators = data.iloc[-1].to_dict()
-
-            logger.info(f"Current Indicators for {TICKER}:")
-            for key, value in current_indicators.items():
-                logger.info(f"  {key}: {value}")
-
-            logger.info("\n--- Generating Trading Signal ---")
-            proposed_signal = await get_trading_signal(
-                indicators=current_indicators,
-                api_key=settings.DEEPSEEK_API_KEY
+# Set while trading_loop runs; exposes tick timing and overruns
+scheduler: Optional[TickScheduler] = None
+
+# Set while trading_loop runs; the local view of cash and positions
+ledger: Optional[PositionLedger] = None
+
+# Set while trading_loop runs; follows submitted orders until filled
+order_tracker: Optional[OrderTracker] = None
+
+# One structured record per symbol per tick; routine ones are rate-limited
+tick_log_sampler = LogSampler(60.0)
+
+
+def configure():
+    """Builds the shared caches, history, rules, broadcaster and rate limiters from settings."""
+    global signal_cache, indicator_history, thinker_rules, broadcaster, tick_log_sampler
+    signal_cache = SignalCache(
+        buckets=settings.SIGNAL_CACHE_BUCKETS,
+        max_size=settings.SIGNAL_CACHE_MAX_SIZE,
+        ttl_seconds=settings.SIGNAL_CACHE_TTL_SECONDS,
+        indicators=settings.PROMPT_INDICATORS,
+        relative_bucket=settings.SIGNAL_CACHE_RELATIVE_BUCKET,
+    ) if settings.SIGNAL_CACHE_ENABLED else None
+    indicator_history = IndicatorHistory(
+        retention_seconds=settings.HISTORY_RETENTION_MINUTES * 60,
+        max_rows=settings.HISTORY_RETENTION_MINUTES + 1,
+        dtype=settings.SERIES_DTYPE,
+        mirrored=settings.HISTORY_MIRRORED,
+    )
+    thinker_rules = default_rules(
+        min_rsi_change=settings.THINKER_MIN_RSI_CHANGE,
+        cooldown_seconds=settings.THINKER_COOLDOWN_SECONDS,
+        max_volatility=settings.THINKER_MAX_VOLATILITY,
+    )
+    broadcaster = Broadcaster(buffer_size=settings.STREAM_BUFFER_SIZE)
+    tick_log_sampler = LogSampler(settings.LOG_TICK_SAMPLE_SECONDS)
+    configure_limiter(
+        "deepseek", rate=settings.DEEPSEEK_RATE_PER_SECOND,
+        max_concurrency=settings.DEEPSEEK_MAX_IN_FLIGHT,
+        max_retries=settings.RATE_LIMIT_MAX_RETRIES,
+    )
+    configure_limiter(
+        "alpaca", rate=settings.ALPACA_RATE_PER_SECOND,
+        max_concurrency=settings.ALPACA_MAX_IN_FLIGHT,
+        max_retries=settings.RATE_LIMIT_MAX_RETRIES,
+    )
+
+
+class SymbolPipeline:
+    """
+    Per-symbol fetch -> indicators -> signal -> thinker -> order pipeline.
+
+    Holds the symbol's incremental indicator state between ticks; market
+    data for all symbols is fetched once per tick by ``trading_loop``.
+    Indicator updates run in ``executor`` so they never block the event loop.
+    """
+
+    def __init__(self, ticker: str, alpaca_symbol: str,
+                 executor: Optional[Executor] = None):
+        from app.indicators import StreamingIndicators
+
+        self.ticker = ticker  # yfinance format
+        self.alpaca_symbol = alpaca_symbol
+        self.close_column = f"close_{ticker.lower()}"
+        self.indicator_engine = StreamingIndicators()
+        self.executor = executor
+
+    async def run_once(self, data: Optional["pd.DataFrame"], trader: AlpacaTrader,
+                       closed: bool = False):
+        """Runs the whole pipeline for one tick with an unbatched signal call."""
+        current_indicators = await self.compute_indicators(data, closed)
+        if current_indicators is None:
+            return
+
+        logger.debug("Generating trading signal for %s", self.ticker)
+        proposed_signal = await get_cached_trading_signal(
+            indicators=current_indicators,
+            api_key=settings.DEEPSEEK_API_KEY,
+            cache=signal_cache,
+            stream=settings.DEEPSEEK_STREAM,
+            symbol=self.ticker,
+        )
+        await self.act(proposed_signal, current_indicators, trader)
+
+    async def compute_indicators(self, data: Optional["pd.DataFrame"],
+                                 closed: bool = False) -> Optional[dict]:
+        """
+        Advances the indicator engine; returns None if the tick is skipped.
+
+        ``data`` from a download ends with the still-forming bar, which is
+        ignored; pass ``closed=True`` for streamed bars that are all closed.
+        """
+        from app.indicators import advance_engine
+
+        ticker = self.ticker
+        if data is None or data.empty:
+            logger.warning(f"No real-time data fetched for {ticker}. Skipping this interval.")
+            return None
+
+        if self.close_column not in data.columns:
+            logger.error(f"'close' column not found in fetched data for {ticker}. Available columns: {data.columns.tolist()}. Skipping this interval.")
+            return None
+
+        # Only closed bars are fed to the incremental engine, which
+        # processes just the new ones.
+        if not closed:
+            data = data.iloc[:-1]
+        with STAGE_SECONDS.time(stage="indicators"):
+            self.indicator_engine, current_indicators = await run_blocking(
+                self.executor, advance_engine, self.indicator_engine, data
             )
+        if current_indicators is None:
+            logger.warning(f"No closed bars yet for {ticker}. Skipping this interval.")
+            return None
 
-            if isinstance(proposed_signal, str):
-                logger.info(f"Proposed Trading Signal: {proposed_signal.upper()}")
-            else:
-                logger.error(f"Error generating signal: {proposed_signal.error.message}")
-                continue
+        timestamp = self.indicator_engine.last_timestamp.timestamp()
+        indicator_history.append(ticker, timestamp, current_indicators)
+        broadcaster.publish(ticker, {"indicators": current_indicators, "timestamp": timestamp})
+        return current_indicators
 
-            logger.info("\n--- Applying Thinker Logic ---")
+    async def act(self, proposed_signal: Union[str, DeepSeekErrorResponse],
+                  current_indicators: dict, trader: AlpacaTrader):
+        """Applies the thinker to a proposed signal and places any order."""
+        record = {
+            "symbol": self.ticker,
+            "bar_time": self.indicator_engine.last_timestamp.timestamp(),
+            "close": current_indicators.get(self.close_column),
+            "signal_time": time.time(),
+        }
+        try:
+            await self._act(proposed_signal, current_indicators, trader, record)
+        finally:
+            self._log_tick(record, current_indicators)
+
+    def _log_tick(self, record: dict, current_indicators: dict):
+        """Emits the tick as one structured record, sampled per symbol."""
+        error = record.get("error")
+        suppressed = tick_log_sampler.sample(
+            self.ticker, force=error is not None or "order_id" in record
+        )
+        if suppressed is None:
+            return
+        # Serialized to JSON on the logging thread, not here
+        record.update(indicators=current_indicators, suppressed=suppressed)
+        logger.log(
+            logging.ERROR if error is not None else logging.INFO,
+            "Tick %s: %s", self.ticker, record.get("action", "error"),
+            extra={"fields": record},
+        )
+
+    async def _act(self, proposed_signal: Union[str, DeepSeekErrorResponse],
+                   current_indicators: dict, trader: AlpacaTrader, record: dict):
+        ticker = self.ticker
+        last_state = load_entry(ticker)
+        last_executed_signal = last_state.get("last_executed_signal")
+        last_trade_time = last_state.get("last_trade_time")
+
+        if isinstance(proposed_signal, str):
+            record["signal"] = proposed_signal
+            broadcaster.publish(ticker, {"signal": proposed_signal, "error": None})
+        else:
+            record["error"] = proposed_signal.error.message
+            DEEPSEEK_ERRORS.inc(type=proposed_signal.error.type)
+            broadcaster.publish(ticker, {"error": proposed_signal.error.message})
+            return
+
+        current_timestamp = self.indicator_engine.last_timestamp.timestamp()
+        with STAGE_SECONDS.time(stage="thinker"):
             execute_trade = await should_execute_trade(
                 proposed_signal=proposed_signal,
                 last_executed_signal=last_executed_signal,
-                min_rsi_change_threshold=0.5,  # Enabled this rule
                 current_indicators=current_indicators,
-                last_indicators=last_indicators
+                last_indicators=last_state.get("last_indicators"),
+                rules=thinker_rules,
+                last_trade_time=last_trade_time,
+                now=current_timestamp,
             )
+        record["approved"] = execute_trade
 
-            if execute_trade:
-                logger.info("Thinker: Trade approved. Proceeding to execution.")
-                position = await trader.get_position(symbol=ALPACA_SYMBOL)
+        if not execute_trade:
+            record["action"] = "not approved"
+            return
 
-                if proposed_signal == "buy":
-                    if position:
-                        logger.info("Trader: Position already open. No trade executed.")
-                    else:
-                        account_info = await trader.get_account_info()
-                        if account_info:
-                            buying_power = float(account_info.cash)
-                            try:
-                                logger.info(f"Attempting to get current price from data. Columns: {data.columns.tolist()}")
-                                current_price = data.iloc[-1]['close_btc-usd'] # Get current closing price
-                                current_timestamp = data.index[-1].timestamp()
-                                logger.info(f"Successfully retrieved current price: {current_price}")
-                            except Exception as price_e:
-                                logger.error(f"Error getting current price: {price_e}, type: {type(price_e)}. Skipping trade for this interval.")
-                                continue # Skip this iteration if price cannot be retrieved
-
-                            if current_price > 0:
-                                # Calculate quantity based on a percentage of buying power
-                                trade_amount = buying_power * settings.TRADE_ALLOCATION_PERCENTAGE
-                                trade_qty = trade_amount / current_price # Allow fractional quantities
-                                
-                                if trade_qty > 0:
-                                    await trader.place_order(symbol=ALPACA_SYMBOL, qty=trade_qty, side="buy")
-                                else:
-                                    logger.info("Calculated trade quantity is zero. Not placing order.")
-                            else:
-                                logger.error("Current price is zero or negative, cannot calculate trade quantity.")
+        current_price = current_indicators[self.close_column]  # Last closed bar
+        # Sizing and gating read the local ledger, not the broker
+        ledger = trader.ledger
+        position_qty = ledger.position(self.alpaca_symbol)
+        order = None
+
+        if proposed_signal == "buy":
+            if position_qty:
+                record["action"] = "position already open"
+            else:
+                buying_power = ledger.buying_power
+                if buying_power is not None:
+                    if current_price > 0:
+                        # Calculate quantity based on a percentage of buying power
+                        trade_amount = buying_power * settings.TRADE_ALLOCATION_PERCENTAGE
+                        trade_qty = trade_amount / current_price  # Allow fractional quantities
+
+                        if trade_qty > 0:
+                            order = await self._place_order(
+                                trader, trade_qty, "buy", current_price, record,
+                            )
                         else:
-                            logger.error("Could not retrieve account info to determine buying power.")
-                elif proposed_signal == "sell":
-                    if position:
-                        await trader.place_order(symbol=ALPACA_SYMBOL, qty=position.qty, side="sell")
+                            record["action"] = "zero quantity"
                     else:
-                        logger.info("Trader: No position to sell. No trade executed.")
-                elif proposed_signal == "hold":
-                    logger.info("Trader: Signal is HOLD. No trade executed.")
+                        logger.error("Current price is zero or negative, cannot calculate trade quantity.")
+                else:
+                    logger.error("Ledger has no buying power yet; cannot size the order.")
+        elif proposed_signal == "sell":
+            if position_qty:
+                # Buy fees and partial fills leave less than the ledger may
+                # think; a full exit never asks for more than the broker holds
+                position = await trader.get_position(self.alpaca_symbol)
+                held = float(position.qty) if position is not None else 0.0
+                if held < position_qty:
+                    trader.ledger.stale = True
+                if held > 0:
+                    order = await self._place_order(
+                        trader, min(position_qty, held), "sell", current_price, record,
+                    )
+                else:
+                    record["action"] = "no position to sell"
+            else:
+                record["action"] = "no position to sell"
+        elif proposed_signal == "hold":
+            record["action"] = "hold"
 
-                await trader.get_position(symbol=ALPACA_SYMBOL)
+        if proposed_signal != "hold":
+            if order is None:
+                # Nothing went through: a retry must not look like a duplicate
+                record.setdefault("action", "no order")
+                return
+            last_trade_time = current_timestamp
 
-                last_executed_signal = proposed_signal
-                save_state(last_executed_signal, current_indicators, 
-                           current_price, 
-                           current_timestamp)
-            else:
-                logger.info("Thinker: Trade not approved. Skipping execution.")
+        save_state(proposed_signal, current_indicators,
+                   current_price,
+                   current_timestamp,
+                   symbol=ticker,
+                   last_trade_time=last_trade_time)
+        update = {
+            "last_executed_signal": proposed_signal,
+            "last_price": current_price,
+            "last_updated": current_timestamp,
+        }
+        if isinstance(order, AlpacaOrder):
+            record.update(action=f"{proposed_signal} order placed", order_id=order.id)
+            update["order"] = order.model_dump(
+                include={"id", "symbol", "qty", "side", "type", "status"}
+            )
+        broadcaster.publish(ticker, update)
+
+    async def _place_order(self, trader: AlpacaTrader, qty: float, side: str,
+                           price: float, record: dict) -> Optional[AlpacaOrder]:
+        """Places an order through the tracker while the trading loop runs."""
+        if order_tracker is None:
+            return await trader.place_order(symbol=self.alpaca_symbol, qty=qty, side=side)
+        return await order_tracker.submit(
+            self.alpaca_symbol, qty, side, price,
+            bar_time=record["bar_time"], signal_time=record["signal_time"],
+        )
 
+
+async def _run_guarded(ticker: str, stage: Awaitable,
+                       semaphore: asyncio.Semaphore):
+    async with semaphore:
+        try:
+            return await stage
         except Exception as e:
-            logger.error(f"An error occurred in the main loop: {e}")
+            logger.error(f"An error occurred in the pipeline for {ticker}: {e}")
+            STAGE_ERRORS.inc(stage="pipeline")
+            return None
+
+
+async def _run_batched_tick(pipelines: List[SymbolPipeline],
+                            frames: Dict[str, "pd.DataFrame"],
+                            trader: AlpacaTrader,
+                            semaphore: asyncio.Semaphore,
+                            closed: bool = False):
+    """
+    Runs one tick with a single batched signal request per
+    ``DEEPSEEK_BATCH_SIZE`` symbols instead of one request per symbol.
+    """
+    indicators = await asyncio.gather(*(
+        _run_guarded(
+            pipeline.ticker,
+            pipeline.compute_indicators(frames.get(pipeline.ticker), closed),
+            semaphore,
+        )
+        for pipeline in pipelines
+    ))
+    ready = {
+        pipeline.ticker: current
+        for pipeline, current in zip(pipelines, indicators)
+        if current is not None
+    }
+    if not ready:
+        return
+
+    logger.debug("Generating trading signals for %d symbols", len(ready))
+    signals = await get_cached_trading_signals(
+        ready,
+        api_key=settings.DEEPSEEK_API_KEY,
+        cache=signal_cache,
+        batch_size=settings.DEEPSEEK_BATCH_SIZE,
+        stream=settings.DEEPSEEK_STREAM,
+    )
+    await asyncio.gather(*(
+        _run_guarded(
+            pipeline.ticker,
+            pipeline.act(signals[pipeline.ticker], ready[pipeline.ticker], trader),
+            semaphore,
+        )
+        for pipeline in pipelines
+        if pipeline.ticker in ready
+    ))
+
+
+async def trading_loop():
+    global scheduler, ledger, order_tracker
+    import pandas as pd
+
+    from app.bar_cache import BarCache
+    from app.data_fetcher import get_realtime_data_batch
+
+    logger.info("Starting the AI Trading Bot background task...")
+
+    # Blocking downloads and indicator math run off the event loop so the
+    # API keeps serving requests while a tick is computed.
+    fetch_executor = create_executor("thread", settings.FETCH_MAX_WORKERS)
+    indicator_executor = create_executor(
+        settings.INDICATOR_EXECUTOR, settings.INDICATOR_MAX_WORKERS
+    )
+
+    # --- Symbol Configuration ---
+    pipelines = [
+        SymbolPipeline(ticker, alpaca_symbol, executor=indicator_executor)
+        for ticker, alpaca_symbol in settings.SYMBOLS.items()
+    ]
+    tickers = [pipeline.ticker for pipeline in pipelines]
+    logger.info(f"Trading universe: {tickers}")
+
+    trader = AlpacaTrader()
+    ledger = trader.ledger
+    ingest_task = None
+    bar_cache = None
+    history_loaded = False
+    try:
+        await trader.reconcile()  # Seeds the ledger with cash and positions
+        order_tracker = OrderTracker(
+            trader, settings.ORDERS_DB, timeout_seconds=settings.ORDER_POLL_TIMEOUT_SECONDS,
+            retention_seconds=settings.ORDER_RETENTION_DAYS * 24 * 3600,
+        )
+        tickers_by_symbol = {pipeline.alpaca_symbol: pipeline.ticker for pipeline in pipelines}
+        order_tracker.on_fill.append(lambda fill: broadcaster.publish(
+            tickers_by_symbol.get(fill["symbol"], fill["symbol"]), {"fill": fill}
+        ))
+        order_tracker.resume()
+        bar_cache = BarCache(
+            cache_dir=settings.BAR_CACHE_DIR,
+            lookback=pd.Timedelta(minutes=settings.BAR_CACHE_LOOKBACK_MINUTES),
+            flush_seconds=settings.BAR_CACHE_FLUSH_SECONDS,
+        )
+        semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_SYMBOLS)
+        streaming = bool(settings.MARKET_STREAM_URL)
+        scheduler = TickScheduler(
+            settings.TRADE_INTERVAL_SECONDS,
+            # Streamed bars close on the first trade past the boundary, so
+            # there is no need to wait for the data provider to publish them.
+            offset_seconds=0.0 if streaming else settings.BAR_CLOSE_DELAY_SECONDS,
+            deadline_seconds=settings.TICK_DEADLINE_SECONDS,
+        )
+        if settings.HISTORY_FILE:
+            indicator_history.load(settings.HISTORY_FILE)
+            history_loaded = True
+
+        async def fetch(tick: float) -> Dict[str, "pd.DataFrame"]:
+            logger.debug("Fetching real-time data for %d symbols", len(tickers))
+            with STAGE_SECONDS.time(stage="fetch"):
+                return await run_blocking(
+                    fetch_executor, get_realtime_data_batch, tickers, cache=bar_cache
+                )
+
+        aggregator = None
+        if streaming:
+            aggregator = BarAggregator(
+                tickers, interval_seconds=60, max_bars=settings.BAR_CACHE_LOOKBACK_MINUTES,
+                dtype=settings.SERIES_DTYPE,
+            )
+            # Warm the indicator engines with one download, then stream
+            try:
+                for ticker, frame in (await fetch(0.0)).items():
+                    aggregator.seed(ticker, frame.iloc[:-1])
+            except Exception as e:
+                logger.warning(f"Could not seed streamed bars with history: {e}")
+            source = WebSocketSource(
+                settings.MARKET_STREAM_URL,
+                {ticker.replace("-", "/"): ticker for ticker in tickers},
+                subscribe=alpaca_subscription(
+                    [ticker.replace("-", "/") for ticker in tickers],
+                    settings.ALPACA_API_KEY, settings.ALPACA_SECRET_KEY,
+                ),
+            )
+            ingest_task = asyncio.create_task(ingest(source, aggregator))
+
+        async def fetch_streamed(tick: float) -> Dict[str, "pd.DataFrame"]:
+            with STAGE_SECONDS.time(stage="fetch"):
+                return await aggregator.wait_closed(
+                    tick, timeout=settings.STREAM_BAR_CLOSE_GRACE_SECONDS
+                )
+
+        async def process(tick: float, frames: Dict[str, "pd.DataFrame"]):
+            # At most one account + positions sync per tick, not per decision
+            await trader.maybe_reconcile(settings.LEDGER_RECONCILE_SECONDS)
+            if settings.DEEPSEEK_BATCH_SIZE > 1 and len(pipelines) > 1:
+                await _run_batched_tick(pipelines, frames, trader, semaphore, streaming)
+            else:
+                await asyncio.gather(*(
+                    _run_guarded(
+                        pipeline.ticker,
+                        pipeline.run_once(
+                            frames.get(pipeline.ticker), trader, streaming
+                        ),
+                        semaphore,
+                    )
+                    for pipeline in pipelines
+                ))
+            logger.debug(
+                "Waiting for the next %s seconds bar boundary", settings.TRADE_INTERVAL_SECONDS
+            )
 
-        logger.info(f"\n--- Waiting for the next {settings.TRADE_INTERVAL_SECONDS} seconds interval ---")
-        await asyncio.sleep(settings.TRADE_INTERVAL_SECONDS)
+        await run_pipelined(scheduler, fetch_streamed if streaming else fetch, process)
+    finally:
+        scheduler = ledger = None
+        if order_tracker is not None:
+            await order_tracker.aclose()
+            order_tracker = None
+        if ingest_task is not None:
+            ingest_task.cancel()
+            await asyncio.gather(ingest_task, return_exceptions=True)
+        await trader.aclose()
+        if history_loaded:
+            indicator_history.save(settings.HISTORY_FILE)
+        if bar_cache is not None:
+            bar_cache.flush()
+        fetch_executor.shutdown(wait=False, cancel_futures=True)
+        indicator_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,314 @@
+import argparse
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.bar_cache import normalize_columns
+from app.rules import SIGNALS, ThinkerRules, default_rules
+from app.utils import logger
+
+# Indicator columns the thinker rules may use
+RULE_COLUMNS = ("RSI_14", "ATRr_14")
+
+# Takes the full indicator frame and returns one signal per row; rows with
+# anything other than buy/sell/hold (e.g. "" or None) are treated as ticks
+# where no signal was produced.
+SignalSource = Callable[[pd.DataFrame], Sequence[Optional[str]]]
+
+
+def load_bars(path: str) -> pd.DataFrame:
+    """
+    Loads historical OHLCV bars from a CSV or Parquet file indexed by
+    timestamp, with lower-case open/high/low/close/volume columns.
+    """
+    if path.endswith(".parquet"):
+        data = pd.read_parquet(path)
+    else:
+        data = pd.read_csv(path, index_col=0, parse_dates=True)
+    data = normalize_columns(data)
+    # Bars saved from a yfinance frame carry a ticker suffix (close_btc-usd)
+    data.columns = [str(column).split("_")[0] for column in data.columns]
+    return data.sort_index()
+
+
+def _rma(values: np.ndarray, length: int) -> np.ndarray:
+    """Wilder's moving average, as pandas-ta's ``rma`` (and ``indicators._Rma``)."""
+    return pd.Series(values).ewm(alpha=1.0 / length, min_periods=length).mean().to_numpy()
+
+
+def rule_indicators(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds only the ``RULE_COLUMNS`` (RSI_14, ATRr_14) to ``data``, each in
+    one vectorized pass with the same values as ``calculate_indicators``.
+
+    The full pandas-ta set is dominated by indicators the rules and
+    ``rsi_signals`` never read (PSAR alone is a row-by-row loop); pass
+    ``calculate_indicators`` as ``indicators`` for signal sources that
+    need more columns.
+    """
+    high = data["high"].to_numpy(dtype=float)
+    low = data["low"].to_numpy(dtype=float)
+    close = data["close"].to_numpy(dtype=float)
+    change = np.diff(close, prepend=np.nan)
+    gain = _rma(np.where(np.isnan(change), np.nan, np.maximum(change, 0.0)), 14)
+    loss = _rma(np.where(np.isnan(change), np.nan, np.maximum(-change, 0.0)), 14)
+    previous = np.concatenate([[np.nan], close[:-1]])
+    true_range = np.maximum.reduce([
+        high - low, np.abs(high - previous), np.abs(previous - low),
+    ])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        data["RSI_14"] = np.where(gain + loss != 0, 100.0 * gain / (gain + loss), np.nan)
+    data["ATRr_14"] = _rma(true_range, 14)
+    return data
+
+
+def rsi_signals(oversold: float = 30.0, overbought: float = 70.0) -> SignalSource:
+    """Rule-based stand-in for the LLM: buy below ``oversold`` RSI, sell above ``overbought``."""
+    def source(frame: pd.DataFrame) -> np.ndarray:
+        rsi = frame["RSI_14"].to_numpy()
+        return np.where(rsi < oversold, "buy", np.where(rsi > overbought, "sell", "hold"))
+    return source
+
+
+def recorded_signals(signals: pd.Series) -> SignalSource:
+    """Replays recorded signals (e.g. logged LLM outputs) keyed by bar timestamp."""
+    def source(frame: pd.DataFrame) -> np.ndarray:
+        return signals.reindex(frame.index).fillna("").str.strip().str.lower().to_numpy()
+    return source
+
+
+class BacktestResult:
+    """Fills, equity curve and drawdown of one backtest run."""
+
+    def __init__(self, fills: pd.DataFrame, equity: pd.Series, initial_cash: float):
+        self.fills = fills
+        self.equity = equity
+        self.initial_cash = initial_cash
+        self.drawdown = equity / equity.cummax() - 1.0
+
+    def summary(self) -> dict:
+        sells = self.fills[self.fills["side"] == "sell"]
+        final_equity = float(self.equity.iloc[-1]) if len(self.equity) else self.initial_cash
+        return {
+            "bars": len(self.equity),
+            "fills": len(self.fills),
+            "round_trips": len(sells),
+            "win_rate": round(float((sells["pnl"] > 0).mean()), 4) if len(sells) else None,
+            "initial_cash": self.initial_cash,
+            "final_equity": round(final_equity, 2),
+            "total_return": round(final_equity / self.initial_cash - 1.0, 6),
+            "max_drawdown": round(float(self.drawdown.min()), 6) if len(self.drawdown) else 0.0,
+        }
+
+
+def encode_signals(signals: Sequence[Optional[str]]) -> np.ndarray:
+    """Encodes signals as int8 codes: 1 + index in ``SIGNALS``, 0 for no signal."""
+    signals = np.asarray(signals, dtype=object)
+    codes = np.zeros(len(signals), dtype=np.int8)
+    for code, signal in enumerate(SIGNALS, start=1):
+        codes[signals == signal] = code
+    return codes
+
+
+def simulate(
+    columns: Dict[str, np.ndarray],
+    signal_codes: np.ndarray,
+    index: Optional[pd.Index] = None,
+    min_rsi_change_threshold: Optional[float] = 0.5,
+    cooldown_seconds: float = 0.0,
+    max_volatility: Optional[float] = None,
+    allocation: float = 0.60,
+    initial_cash: float = 100_000.0,
+    fee_bps: float = 0.0,
+    slippage_bps: float = 0.0,
+    rules: Optional[ThinkerRules] = None,
+) -> BacktestResult:
+    """
+    Applies the thinker rules and order sizing to precomputed arrays.
+
+    This is the part of ``run_backtest`` that depends on the trading
+    parameters, split out so a sweep can rerun it on shared arrays. The
+    rules are evaluated for all bars in one ``ThinkerRules.evaluate_batch``
+    call (``default_rules`` built from the threshold, cooldown and
+    volatility arguments unless ``rules`` is given); only approved bars
+    reach the order loop.
+
+    Args:
+        columns (Dict[str, np.ndarray]): ``time`` (seconds), ``close`` and
+            the indicator arrays the rules use.
+        signal_codes (np.ndarray): Signals from ``encode_signals``.
+    """
+    close = columns["close"]
+    if rules is None:
+        rules = default_rules(
+            min_rsi_change=min_rsi_change_threshold,
+            cooldown_seconds=cooldown_seconds,
+            max_volatility=max_volatility,
+        )
+    signals = np.array(("",) + SIGNALS, dtype=object)[signal_codes]
+    approved, _, _ = rules.evaluate_batch(signals, columns, columns.get("time"))
+
+    cash_delta = np.zeros(len(close))
+    qty_delta = np.zeros(len(close))
+    fills = []
+    cash, qty, cost_basis = initial_cash, 0.0, 0.0
+
+    for i in np.flatnonzero(approved):
+        signal = signals[i]
+        price = close[i]
+        if signal == "buy" and qty == 0 and price > 0:
+            fill_price = price * (1 + slippage_bps / 10_000)
+            notional = cash * allocation
+            fee = notional * fee_bps / 10_000
+            bought = (notional - fee) / fill_price
+            if bought <= 0:
+                continue
+            cash -= notional
+            qty, cost_basis = bought, notional
+            cash_delta[i] -= notional
+            qty_delta[i] += bought
+            fills.append((i, "buy", bought, fill_price, fee, np.nan))
+        elif signal == "sell" and qty > 0:
+            fill_price = price * (1 - slippage_bps / 10_000)
+            notional = qty * fill_price
+            fee = notional * fee_bps / 10_000
+            cash += notional - fee
+            cash_delta[i] += notional - fee
+            qty_delta[i] -= qty
+            fills.append((i, "sell", qty, fill_price, fee,
+                          notional - fee - cost_basis))
+            qty, cost_basis = 0.0, 0.0
+
+    if index is None:
+        index = pd.RangeIndex(len(close))
+    equity = pd.Series(
+        initial_cash + np.cumsum(cash_delta) + np.cumsum(qty_delta) * close,
+        index=index,
+        name="equity",
+    )
+    fills = pd.DataFrame(
+        fills, columns=["timestamp", "side", "qty", "price", "fee", "pnl"]
+    )
+    fills["timestamp"] = index[fills["timestamp"].to_numpy(dtype=int)]
+    return BacktestResult(fills.set_index("timestamp"), equity, initial_cash)
+
+
+def prepare(
+    bars: pd.DataFrame,
+    signal_source: SignalSource,
+    indicators: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+) -> Tuple[pd.Index, Dict[str, np.ndarray], np.ndarray]:
+    """
+    Runs the vectorized, parameter-independent part of a backtest.
+
+    ``indicators`` defaults to ``rule_indicators``: only the columns the
+    rules and ``rsi_signals`` read.
+
+    Returns:
+        Tuple: The bar index, the ``time``/``close``/``RULE_COLUMNS``
+               arrays (NaN where an indicator is absent) and the encoded
+               signals.
+    """
+    frame = (indicators or rule_indicators)(bars.copy())
+    signal_codes = encode_signals(signal_source(frame))
+    if isinstance(frame.index, pd.DatetimeIndex):
+        time_ = frame.index.asi8 / 1e9
+    else:
+        time_ = np.arange(len(frame), dtype=float)
+    columns = {"time": time_, "close": frame["close"].to_numpy(dtype=float)}
+    for name in RULE_COLUMNS:
+        columns[name] = (
+            frame[name].to_numpy(dtype=float)
+            if name in frame.columns else np.full(len(frame), np.nan)
+        )
+    return frame.index, columns, signal_codes
+
+
+def run_backtest(
+    bars: pd.DataFrame,
+    signal_source: SignalSource,
+    indicators: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+    min_rsi_change_threshold: Optional[float] = 0.5,
+    cooldown_seconds: float = 0.0,
+    max_volatility: Optional[float] = None,
+    allocation: float = 0.60,
+    initial_cash: float = 100_000.0,
+    fee_bps: float = 0.0,
+    slippage_bps: float = 0.0,
+) -> BacktestResult:
+    """
+    Replays the live pipeline over historical bars.
+
+    Indicators are computed for the whole history in one vectorized pass
+    (by default only the columns the rules use), signals come from
+    ``signal_source`` and the thinker rules are applied to every bar, so a
+    year of 1-minute bars runs in seconds. Orders follow
+    ``SymbolPipeline.act``: a buy spends ``allocation`` of the cash when
+    flat, a sell closes the whole position, and every approved signal
+    (including hold) becomes the new last executed signal. Fills happen at
+    the bar's close adjusted by ``slippage_bps``.
+
+    Args:
+        bars (pd.DataFrame): OHLCV bars with lower-case column names.
+        signal_source (SignalSource): Produces one signal per bar.
+        indicators (Optional[Callable]): Vectorized indicator function;
+            defaults to ``rule_indicators``. Pass ``calculate_indicators``
+            for signal sources that read other columns.
+        min_rsi_change_threshold (Optional[float]): Thinker RSI threshold.
+        cooldown_seconds (float): Minimum time between approved buys/sells.
+        max_volatility (Optional[float]): ATRr_14 / close gate for trades.
+        allocation (float): Fraction of cash spent per buy.
+        initial_cash (float): Starting cash.
+        fee_bps (float): Fee per fill in basis points of its notional.
+        slippage_bps (float): Adverse price move per fill in basis points.
+
+    Returns:
+        BacktestResult: Fills, equity curve and drawdown.
+    """
+    started = time.perf_counter()
+    index, columns, signal_codes = prepare(bars, signal_source, indicators)
+    result = simulate(
+        columns, signal_codes, index=index,
+        min_rsi_change_threshold=min_rsi_change_threshold,
+        cooldown_seconds=cooldown_seconds,
+        max_volatility=max_volatility,
+        allocation=allocation,
+        initial_cash=initial_cash,
+        fee_bps=fee_bps,
+        slippage_bps=slippage_bps,
+    )
+    logger.info(
+        f"Backtest: {len(index)} bars, {len(result.fills)} fills in "
+        f"{time.perf_counter() - started:.2f}s"
+    )
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the trading rules on historical bars.")
+    parser.add_argument("bars", help="CSV or Parquet file of 1-minute OHLCV bars")
+    parser.add_argument("--signals", help="CSV of recorded signals (timestamp,signal)")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    parser.add_argument("--allocation", type=float, default=0.60)
+    parser.add_argument("--cash", type=float, default=100_000.0)
+    parser.add_argument("--fee-bps", type=float, default=0.0)
+    parser.add_argument("--slippage-bps", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.signals:
+        recorded = pd.read_csv(args.signals, index_col=0, parse_dates=True).iloc[:, 0]
+        source = recorded_signals(recorded)
+    else:
+        source = rsi_signals()
+    result = run_backtest(
+        load_bars(args.bars),
+        source,
+        min_rsi_change_threshold=args.threshold,
+        allocation=args.allocation,
+        initial_cash=args.cash,
+        fee_bps=args.fee_bps,
+        slippage_bps=args.slippage_bps,
+    )
+    print(result.summary())
@@ -0,0 +1,210 @@
+import os
+import re
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+import yfinance as yf
+
+from app.utils import logger
+
+BAR_CACHE_DIR = "bar_cache"
+
+
+def normalize_columns(data: pd.DataFrame) -> pd.DataFrame:
+    """Flattens yfinance's MultiIndex columns into lower-case names."""
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = ['_'.join(col).strip() for col in data.columns.values]
+    data.columns = data.columns.str.lower()
+    return data
+
+
+def split_tickers(data: pd.DataFrame, tickers: List[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Splits a batched yfinance download into one frame per ticker.
+
+    Each frame gets the same ``<field>_<ticker>`` column names a single-ticker
+    download produces after ``normalize_columns``. Rows where the ticker has
+    no bar (e.g. outside its trading hours) are dropped.
+    """
+    frames = {}
+    for ticker in tickers:
+        if data.empty:
+            frames[ticker] = pd.DataFrame()
+            continue
+        if isinstance(data.columns, pd.MultiIndex):
+            if ticker not in data.columns.get_level_values(-1):
+                frames[ticker] = pd.DataFrame()
+                continue
+            frame = data.xs(ticker, axis=1, level=-1).copy()
+        else:
+            frame = data.copy()
+        frame.columns = [f"{str(col).lower()}_{ticker.lower()}" for col in frame.columns]
+        frames[ticker] = frame.dropna(how="all")
+    return frames
+
+
+def _utc(timestamp: pd.Timestamp) -> pd.Timestamp:
+    """``timestamp`` as UTC; naive timestamps are taken to be UTC already."""
+    if timestamp.tzinfo is None:
+        return timestamp.tz_localize("UTC")
+    return timestamp.tz_convert("UTC")
+
+
+class BarCache:
+    """
+    Persistent OHLCV bar store keyed by symbol and interval.
+
+    The first request for a key downloads the lookback window; later
+    requests only download bars from that key's last cached timestamp
+    onwards (the last bar is re-fetched because it may still have been
+    forming), merge them in and drop bars older than the lookback window.
+    A key whose newest bar is already outside the window (e.g. a pickle
+    left from an old run) is fetched in full again. Memory is
+    authoritative while running; the keys changed since the last flush are
+    written to ``cache_dir`` every ``flush_seconds`` (from the fetching
+    thread) and by ``flush`` at shutdown, so restarts resume from disk
+    without every tick rewriting every key's file.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = BAR_CACHE_DIR,
+        lookback: pd.Timedelta = pd.Timedelta(days=1),
+        flush_seconds: Optional[float] = 300.0,
+        clock: Callable[[], pd.Timestamp] = lambda: pd.Timestamp.now(tz="UTC"),
+    ):
+        self.cache_dir = cache_dir
+        self.lookback = lookback
+        self.flush_seconds = flush_seconds
+        self.clock = clock
+        self._frames: Dict[Tuple[str, str], pd.DataFrame] = {}
+        self._dirty: Set[Tuple[str, str]] = set()
+        self._flushed_at = time.monotonic()
+
+    def get(self, ticker: str, interval: str = "1m") -> pd.DataFrame:
+        """
+        Returns the cached bars for a ticker, fetching only the delta.
+
+        Args:
+            ticker (str): The yfinance ticker (e.g., 'BTC-USD').
+            interval (str): The bar interval (e.g., '1m').
+
+        Returns:
+            pd.DataFrame: Bars within the lookback window, oldest first.
+        """
+        return self.get_many([ticker], interval)[ticker]
+
+    def get_many(self, tickers: List[str], interval: str = "1m") -> Dict[str, pd.DataFrame]:
+        """
+        Returns cached bars for several tickers with batched downloads.
+
+        Tickers already in the cache are refreshed from their own last
+        cached timestamp, with one download per distinct timestamp (so one
+        quiet ticker does not make the others re-download); tickers seen
+        for the first time, or whose bars are all too old, share one
+        download of the lookback window.
+
+        Args:
+            tickers (List[str]): The yfinance tickers.
+            interval (str): The bar interval (e.g., '1m').
+
+        Returns:
+            Dict[str, pd.DataFrame]: Bars per ticker, oldest first.
+        """
+        oldest = self.clock() - self.lookback
+        cached = {}
+        for ticker in tickers:
+            frame = self._frames.get((ticker, interval))
+            if frame is None:
+                frame = self._load(ticker, interval)
+            if frame is not None and not frame.empty and _utc(frame.index[-1]) < oldest:
+                logger.info(f"BarCache: Cached {ticker} ({interval}) bars are past the lookback; refetching.")
+                frame = None
+            cached[ticker] = frame
+
+        missing = [t for t in tickers if cached[t] is None or cached[t].empty]
+        starts: Dict[pd.Timestamp, List[str]] = {}
+        for ticker in tickers:
+            if ticker not in missing:
+                starts.setdefault(cached[ticker].index[-1], []).append(ticker)
+        fresh = {}
+        if missing:
+            logger.info(f"BarCache: Full fetch for {missing} ({interval}).")
+            fresh.update(self._download(missing, interval, start=oldest))
+        for start, known in starts.items():
+            fresh.update(self._download(known, interval, start=start))
+            logger.info(
+                f"BarCache: Fetched delta for {len(known)} tickers "
+                f"({interval}) since {start}."
+            )
+
+        result = {}
+        for ticker in tickers:
+            if ticker in missing:
+                combined = fresh[ticker]
+            else:
+                combined = self.merge(cached[ticker], fresh[ticker])
+            if not combined.empty:
+                combined = combined[
+                    combined.index >= combined.index[-1] - self.lookback
+                ]
+                self._frames[(ticker, interval)] = combined
+                self._dirty.add((ticker, interval))
+            result[ticker] = combined
+        if self.flush_seconds is not None:
+            # A crash loses at most ``flush_seconds`` of bars, not the cache
+            if time.monotonic() - self._flushed_at >= self.flush_seconds:
+                self.flush()
+        return result
+
+    @staticmethod
+    def merge(cached: pd.DataFrame, fresh: pd.DataFrame) -> pd.DataFrame:
+        """Appends fresh bars, letting them overwrite overlapping timestamps."""
+        if fresh.empty:
+            return cached
+        combined = pd.concat([cached, fresh])
+        combined = combined[~combined.index.duplicated(keep="last")]
+        return combined.sort_index()
+
+    def flush(self) -> int:
+        """Persists the keys changed since the last flush; returns how many."""
+        self._flushed_at = time.monotonic()
+        flushed = 0
+        dirty, self._dirty = self._dirty, set()
+        for ticker, interval in sorted(dirty):
+            try:
+                self._save(ticker, interval, self._frames[(ticker, interval)])
+                flushed += 1
+            except Exception as e:
+                logger.error(f"BarCache: Could not write {ticker} ({interval}): {e}")
+        if flushed:
+            logger.info(f"BarCache: Flushed {flushed} key(s) to {self.cache_dir}.")
+        return flushed
+
+    def _download(self, tickers: List[str], interval: str, **kwargs) -> Dict[str, pd.DataFrame]:
+        data = yf.download(tickers, interval=interval, **kwargs)
+        return split_tickers(data, tickers)
+
+    def _path(self, ticker: str, interval: str) -> str:
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{ticker}_{interval}")
+        return os.path.join(self.cache_dir, f"{name}.pkl")
+
+    def _load(self, ticker: str, interval: str):
+        path = self._path(ticker, interval)
+        try:
+            data = pd.read_pickle(path)
+            logger.info(f"BarCache: Loaded {len(data)} bars from {path}.")
+            return data
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"BarCache: Could not read {path}: {e}. Refetching.")
+            return None
+
+    def _save(self, ticker: str, interval: str, data: pd.DataFrame):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(ticker, interval)
+        tmp_path = f"{path}.tmp"
+        data.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
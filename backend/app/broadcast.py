@@ -0,0 +1,138 @@
+import asyncio
+import json
+import math
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+from app.utils import logger
+
+
+def _clean(value):
+    """Makes a value JSON-safe for browsers (NaN/inf become null)."""
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    if isinstance(value, dict):
+        return {str(k): _clean(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    return value
+
+
+def _diff(old: dict, new: dict) -> dict:
+    """The keys of ``new`` whose values differ from ``old``, one level into dicts."""
+    changes = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            nested = {k: v for k, v in value.items() if previous.get(k) != v}
+            if nested:
+                changes[key] = nested
+        elif key not in old or previous != value:
+            changes[key] = value
+    return changes
+
+
+def _sse(seq: int, event: str, data: dict) -> bytes:
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class Broadcaster:
+    """
+    Fans trading-loop updates out to many Server-Sent Events clients.
+
+    Updates are diffed against the last known state per symbol, encoded
+    once and appended to a single bounded buffer that every client reads
+    from at its own pace; publishing never waits for clients. A client that
+    falls more than ``buffer_size`` events behind (or resumes from an event
+    that has left the buffer, or from a previous server run) is sent a fresh
+    snapshot instead of the missed diffs.
+    """
+
+    def __init__(self, buffer_size: int = 256, heartbeat_seconds: float = 15.0):
+        self.buffer_size = buffer_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.seq = 0
+        self.clients = 0
+        self.resyncs = 0
+        self._buffer: Deque[Tuple[int, bytes]] = deque(maxlen=buffer_size)
+        self._state: Dict[str, dict] = {}
+        self._published = asyncio.Event()
+
+    def publish(self, symbol: str, update: dict):
+        """
+        Merges an update into a symbol's state and broadcasts what changed.
+
+        Args:
+            symbol (str): The symbol the update belongs to.
+            update (dict): New values, e.g. ``{"signal": "buy"}``.
+        """
+        update = _clean(update)
+        state = self._state.setdefault(symbol, {})
+        changes = _diff(state, update)
+        if not changes:
+            return
+        for key, value in changes.items():
+            if isinstance(value, dict) and isinstance(state.get(key), dict):
+                state[key] = {**state[key], **value}
+            else:
+                state[key] = value
+        self.seq += 1
+        self._buffer.append((self.seq, _sse(self.seq, "diff", {symbol: changes})))
+        # Wake every waiting client, then arm a fresh event for the next publish.
+        self._published.set()
+        self._published = asyncio.Event()
+
+    def snapshot(self) -> bytes:
+        return _sse(self.seq, "snapshot", self._state)
+
+    def stats(self) -> dict:
+        return {
+            "clients": self.clients,
+            "seq": self.seq,
+            "buffered": len(self._buffer),
+            "buffer_size": self.buffer_size,
+            "resyncs": self.resyncs,
+        }
+
+    def _since(self, cursor: int) -> Optional[list]:
+        """Buffered events after ``cursor``, or None if some were dropped."""
+        if cursor > self.seq:
+            return None  # From before a restart; those ids mean nothing now
+        if cursor == self.seq:
+            return []
+        if not self._buffer or self._buffer[0][0] > cursor + 1:
+            return None
+        return [payload for seq, payload in self._buffer if seq > cursor]
+
+    async def stream(self, last_event_id: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        Yields SSE-encoded events for one client: a snapshot (unless it can
+        resume from ``last_event_id``), then diffs as they are published.
+        """
+        self.clients += 1
+        try:
+            cursor = last_event_id
+            if cursor is None or self._since(cursor) is None:
+                cursor = self.seq
+                yield self.snapshot()
+            while True:
+                pending = self._since(cursor)
+                if pending is None:
+                    self.resyncs += 1
+                    logger.warning("Broadcaster: Client fell behind, resending snapshot.")
+                    cursor = self.seq
+                    yield self.snapshot()
+                    continue
+                if pending:
+                    cursor = self.seq
+                    for payload in pending:
+                        yield payload
+                    continue
+                try:
+                    await asyncio.wait_for(
+                        self._published.wait(), timeout=self.heartbeat_seconds
+                    )
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+        finally:
+            self.clients -= 1
@@ -1,6 +1,11 @@
+from functools import lru_cache
+from typing import Dict, List, Optional
+
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
+from app.prompt import DEFAULT_PROMPT_INDICATORS
+
 load_dotenv()
 
 
@@ -10,12 +15,96 @@ class Settings(BaseSettings):
     ALPACA_API_KEY: str
     ALPACA_SECRET_KEY: str
     APCA_API_BASE_URL: str = "https://paper-api.alpaca.markets"
+    ALPACA_MAX_CONNECTIONS: int = 20  # Pooled keep-alive connections
+    ALPACA_RATE_PER_SECOND: Optional[float] = 3.0  # Alpaca allows 200 requests/minute
+    ALPACA_MAX_IN_FLIGHT: Optional[int] = None  # Concurrent requests; None is unlimited
+    LEDGER_RECONCILE_SECONDS: float = 300.0  # Resync positions/cash with Alpaca this often
+    ORDERS_DB: str = "orders.db"  # Submitted orders with fills, slippage and latencies
+    ORDER_POLL_TIMEOUT_SECONDS: float = 120.0  # Stop polling an order's status after this
+    ORDER_RETENTION_DAYS: float = 7.0  # Finished orders kept in ORDERS_DB
     TRADE_ALLOCATION_PERCENTAGE: float = 0.60 # 60% of buying power
+    THINKER_MIN_RSI_CHANGE: float = 0.5  # Tune with `python -m app.sweep`
+    THINKER_COOLDOWN_SECONDS: float = 0.0  # Minimum time between approved buys/sells
+    THINKER_MAX_VOLATILITY: Optional[float] = None  # Max ATRr_14 / close for trades
     TRADE_INTERVAL_SECONDS: int = 300  # 1 minute interval for trading
+    BAR_CLOSE_DELAY_SECONDS: float = 2.0  # Wait after a bar boundary for the bar to publish
+    # Trade stream to build 1m bars from instead of polling downloads, e.g.
+    # wss://stream.data.alpaca.markets/v1beta3/crypto/us (needs 'websockets')
+    MARKET_STREAM_URL: Optional[str] = None
+    STREAM_BAR_CLOSE_GRACE_SECONDS: float = 2.0  # Max wait for quiet symbols' bars to close
+    TICK_DEADLINE_SECONDS: Optional[float] = None  # Defaults to TRADE_INTERVAL_SECONDS
+    BAR_CACHE_DIR: str = "bar_cache"
+    BAR_CACHE_LOOKBACK_MINUTES: int = 1440  # Bars kept per symbol/interval
+    BAR_CACHE_FLUSH_SECONDS: Optional[float] = 300.0  # None writes only at shutdown
+    HISTORY_FILE: Optional[str] = "indicator_history.npz"  # None keeps it in memory only
+    HISTORY_RETENTION_MINUTES: int = 7 * 24 * 60  # Indicator rows kept per symbol
+    HISTORY_MIRRORED: bool = False  # Zero-copy history queries at twice the memory
+    SERIES_DTYPE: str = "float64"  # "float32" halves bar/indicator buffer memory
+    STREAM_BUFFER_SIZE: int = 256  # Events kept for /api/stream clients to catch up
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" (one object per line) or "text"
+    LOG_TICK_SAMPLE_SECONDS: float = 60.0  # Min gap between routine tick records per symbol
+    # yfinance ticker -> Alpaca symbol; set as JSON in the environment
+    SYMBOLS: Dict[str, str] = {"BTC-USD": "BTCUSD"}
+    MAX_CONCURRENT_SYMBOLS: int = 10  # Symbol pipelines running at once
+    DEEPSEEK_HTTP2: bool = False  # Needs the optional 'h2' package
+    DEEPSEEK_BATCH_SIZE: int = 10  # Symbols per signal request; 1 disables batching
+    DEEPSEEK_STREAM: bool = False  # Stream single-symbol replies, stop at the signal
+    # Indicators sent to the model, highest priority first
+    PROMPT_INDICATORS: List[str] = DEFAULT_PROMPT_INDICATORS
+    PROMPT_SIGNIFICANT_DIGITS: int = 5
+    PROMPT_TOKEN_BUDGET: int = 400  # Estimated tokens for the indicator table
+    SIGNAL_CACHE_ENABLED: bool = True
+    # Indicator -> bucket width used to quantize the signal cache key
+    SIGNAL_CACHE_BUCKETS: Dict[str, float] = {
+        "RSI_14": 2.0,
+        "ADX_14": 2.0,
+        "STOCHk_14_3_3": 5.0,
+        "STOCHd_14_3_3": 5.0,
+        "CCI_14_0.015": 10.0,
+        "BBP_5_2.0": 0.1,
+    }
+    # Relative bucket width for prompt indicators without one above (0.2%)
+    SIGNAL_CACHE_RELATIVE_BUCKET: float = 0.002
+    SIGNAL_CACHE_TTL_SECONDS: float = 900
+    SIGNAL_CACHE_MAX_SIZE: int = 1024
+    DEEPSEEK_CONNECT_TIMEOUT: float = 5.0
+    DEEPSEEK_READ_TIMEOUT: float = 30.0
+    DEEPSEEK_RATE_PER_SECOND: Optional[float] = None  # None is unlimited
+    DEEPSEEK_MAX_IN_FLIGHT: Optional[int] = 10  # Concurrent requests; None is unlimited
+    RATE_LIMIT_MAX_RETRIES: int = 3  # Retries of 429/5xx responses, with jittered backoff
+    FETCH_MAX_WORKERS: int = 4  # Threads for blocking market data downloads
+    INDICATOR_EXECUTOR: str = "thread"  # "thread" or "process"
+    INDICATOR_MAX_WORKERS: int = 4
 
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
 
 
-settings = Settings()
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Reads the environment and .env once, on first use."""
+    return Settings()
+
+
+class _LazySettings:
+    """
+    Stands in for the ``Settings`` instance until an attribute is used.
+
+    Importing a module that refers to ``settings`` no longer reads the
+    environment, so the API and tests can be imported without credentials;
+    the app resolves settings explicitly in its lifespan.
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value):
+        setattr(get_settings(), name, value)
+
+    def __delattr__(self, name: str):
+        delattr(get_settings(), name)
+
+
+settings = _LazySettings()
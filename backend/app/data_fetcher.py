@@ -1,17 +1,35 @@
+from typing import Dict, List, Optional
+
 import yfinance as yf
-import pandas_ta as ta
 import pandas as pd
 
-def get_realtime_data(ticker):
-    """Fetches real-time data for a given ticker."""
+from app.bar_cache import BarCache, normalize_columns, split_tickers
+
+def get_realtime_data(ticker, cache: Optional[BarCache] = None):
+    """
+    Fetches real-time data for a given ticker.
+
+    With a ``BarCache`` only bars newer than the last cached one are
+    downloaded; without one the full 1-day, 1-minute window is fetched.
+    """
+    if cache is not None:
+        return cache.get(ticker, interval="1m")
     data = yf.download(ticker, period="1d", interval="1m")
-    if isinstance(data.columns, pd.MultiIndex):
-        data.columns = ['_'.join(col).strip() for col in data.columns.values]
-    data.columns = data.columns.str.lower()
-    return data
+    return normalize_columns(data)
+
+
+def get_realtime_data_batch(tickers: List[str], cache: Optional[BarCache] = None) -> Dict[str, pd.DataFrame]:
+    """Fetches real-time data for several tickers with one batched download."""
+    if cache is not None:
+        return cache.get_many(tickers, interval="1m")
+    data = yf.download(tickers, period="1d", interval="1m")
+    return split_tickers(data, tickers)
+
 
 def calculate_indicators(data):
     """Calculates technical indicators using pandas-ta."""
+    import pandas_ta as ta  # noqa: F401 (registers the DataFrame.ta accessor)
+
     data.ta.rsi(append=True)
     data.ta.macd(append=True)
     data.ta.adx(append=True)
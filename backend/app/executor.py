@@ -0,0 +1,42 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+
+EXECUTOR_KINDS = ("thread", "process")
+
+
+def create_executor(kind: str = "thread", max_workers: Optional[int] = None) -> Executor:
+    """
+    Creates the pool that blocking pipeline stages run in.
+
+    Args:
+        kind (str): 'thread' for I/O-bound or GIL-releasing work, 'process'
+                    for CPU-bound work. Functions and arguments sent to a
+                    process pool must be picklable.
+        max_workers (Optional[int]): Pool size; the executor default if None.
+
+    Returns:
+        Executor: The created executor.
+    """
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trading")
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=max_workers)
+    raise ValueError(f"Unknown executor kind: {kind}. Must be one of {EXECUTOR_KINDS}.")
+
+
+async def run_blocking(executor: Optional[Executor], func: Callable, *args, **kwargs):
+    """
+    Runs a blocking function in an executor without blocking the event loop.
+
+    Args:
+        executor (Optional[Executor]): The pool to use; the loop's default
+                                       thread pool if None.
+        func (Callable): The blocking function.
+
+    Returns:
+        The function's return value.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
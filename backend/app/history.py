@@ -0,0 +1,207 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.ring import RingBuffer
+from app.utils import logger
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax", "none")
+# Cap on rows kept per symbol when sized from the retention (a week of 1m)
+MAX_DEFAULT_ROWS = 7 * 24 * 60
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last points and, from each of ``max_points - 2``
+    equal-size buckets in between, the point forming the largest triangle
+    with the previously kept point and the average of the next bucket.
+
+    Returns:
+        np.ndarray: Indices of the kept points.
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    kept = np.empty(max_points, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = n - 1, n
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+        cross = (x[previous] - next_x) * (y[start:end] - y[previous])
+        area = np.abs(cross - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def minmax(y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Min/max downsampling: the minimum and maximum of each of
+    ``max_points // 2`` buckets, in time order, so spikes survive.
+
+    Returns:
+        np.ndarray: Indices of the kept points.
+    """
+    n = len(y)
+    buckets = max_points // 2
+    if max_points >= n or buckets < 1:
+        return np.arange(n)
+    edges = np.linspace(0, n, buckets + 1).astype(int)[:-1]
+    lows, highs = [], []
+    for start, end in zip(edges, np.append(edges[1:], n)):
+        window = y[start:end]
+        lows.append(start + int(np.argmin(window)))
+        highs.append(start + int(np.argmax(window)))
+    return np.unique(np.concatenate([lows, highs]))
+
+
+class IndicatorHistory:
+    """
+    Columnar per-symbol history of every numeric indicator, one row per tick.
+
+    Each symbol keeps a preallocated ``RingBuffer`` of ``max_rows`` rows
+    (by default one per minute of ``retention_seconds``), so per-symbol
+    memory is fixed up front. The buffers are not mirrored by default: a
+    week of minute rows is the largest buffer in the process and queries
+    are rare next to appends, so a query that wraps around the ring pays
+    for one copy instead of every symbol paying for twice the memory.
+    Rows older than ``retention_seconds`` are left out of queries.
+    Queries can be downsampled server-side with LTTB or min/max.
+    """
+
+    def __init__(self, retention_seconds: int = 7 * 24 * 3600,
+                 max_rows: Optional[int] = None, dtype="float64",
+                 mirrored: bool = False):
+        self.retention_seconds = retention_seconds
+        self.max_rows = max_rows or min(retention_seconds // 60, MAX_DEFAULT_ROWS) + 1
+        self.dtype = dtype
+        self.mirrored = mirrored
+        self._symbols: Dict[str, RingBuffer] = {}
+
+    def _buffer(self, symbol: str) -> RingBuffer:
+        history = self._symbols.get(symbol)
+        if history is None:
+            history = self._symbols[symbol] = RingBuffer(
+                self.max_rows, dtype=self.dtype, mirrored=self.mirrored,
+            )
+        return history
+
+    def append(self, symbol: str, timestamp: float, indicators: dict):
+        """
+        Records one tick; ticks not newer than the last row are ignored.
+
+        Args:
+            symbol (str): The symbol the indicators belong to.
+            timestamp (float): Unix time of the bar, in seconds.
+            indicators (dict): Indicator values; non-numeric ones are skipped.
+        """
+        history = self._buffer(symbol)
+        timestamp = int(timestamp)
+        if history.size and timestamp <= history.times(1)[0]:
+            return
+        values = {
+            name: float(value) for name, value in indicators.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+        history.append(timestamp, values)
+
+    def _live(self, history: RingBuffer) -> int:
+        """How many of the newest rows are within the retention window."""
+        timestamps = history.times()
+        if not len(timestamps):
+            return 0
+        oldest = timestamps[-1] - self.retention_seconds
+        return len(timestamps) - int(np.searchsorted(timestamps, oldest, side="left"))
+
+    def symbols(self) -> List[str]:
+        return list(self._symbols)
+
+    def indicators(self, symbol: str) -> List[str]:
+        history = self._symbols.get(symbol)
+        return list(history.columns) if history is not None else []
+
+    def query(
+        self,
+        symbol: str,
+        indicator: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        max_points: Optional[int] = None,
+        method: str = "lttb",
+    ) -> List[Tuple[int, float]]:
+        """
+        Returns the (timestamp, value) points of one indicator in a range.
+
+        Args:
+            symbol (str): The symbol to query.
+            indicator (str): The indicator column, e.g. 'RSI_14'.
+            start (Optional[int]): Inclusive start, Unix seconds.
+            end (Optional[int]): Inclusive end, Unix seconds.
+            max_points (Optional[int]): Downsample to at most this many points.
+            method (str): 'lttb', 'minmax' or 'none'.
+
+        Returns:
+            List[Tuple[int, float]]: The points in time order, NaNs dropped.
+        """
+        if method not in DOWNSAMPLE_METHODS:
+            raise ValueError(
+                f"Unknown downsampling method: {method}. Must be one of {DOWNSAMPLE_METHODS}."
+            )
+        history = self._symbols.get(symbol)
+        if history is None or indicator not in history.columns:
+            return []
+        live = self._live(history)
+        timestamps, values = history.times(live), history.column(indicator, live)
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+        hi = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side="right"))
+        timestamps, values = timestamps[lo:hi], values[lo:hi]
+        valid = ~np.isnan(values)
+        timestamps, values = timestamps[valid], values[valid]
+
+        if max_points is not None and method != "none":
+            if method == "lttb":
+                kept = lttb(timestamps.astype(float), values, max_points)
+            else:
+                kept = minmax(values, max_points)
+            timestamps, values = timestamps[kept], values[kept]
+        return list(zip(timestamps.tolist(), values.tolist()))
+
+    def nbytes(self) -> Dict[str, int]:
+        """Bytes allocated per symbol."""
+        return {symbol: history.nbytes for symbol, history in self._symbols.items()}
+
+    def save(self, path: str):
+        """Writes the live rows of every symbol to an ``.npz`` file."""
+        arrays = {}
+        for symbol, history in self._symbols.items():
+            live = self._live(history)
+            arrays[f"{symbol}|"] = history.times(live)
+            for name in history.columns:
+                arrays[f"{symbol}|{name}"] = history.column(name, live)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+        logger.info(f"IndicatorHistory: Saved {len(self._symbols)} symbol(s) to {path}")
+
+    def load(self, path: str):
+        """Restores histories written by ``save``; a missing file is ignored."""
+        if not os.path.exists(path):
+            return
+        with np.load(path) as arrays:
+            columns: Dict[str, Dict[str, np.ndarray]] = {}
+            for key in arrays.files:
+                symbol, name = key.split("|", 1)
+                columns.setdefault(symbol, {})[name] = arrays[key]
+        for symbol, values in columns.items():
+            self._buffer(symbol).extend(values.pop(""), values)
+        logger.info(f"IndicatorHistory: Loaded {len(self._symbols)} symbol(s) from {path}")
@@ -0,0 +1,437 @@
+import math
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+NAN = float("nan")
+
+
+class _Sma:
+    """Simple moving average over a fixed window (pandas-ta ``sma``)."""
+
+    def __init__(self, length: int):
+        self.length = length
+        self.window = deque(maxlen=length)
+        self.total = 0.0
+
+    def update(self, x: float) -> float:
+        if math.isnan(x):
+            return NAN
+        if len(self.window) == self.length:
+            self.total -= self.window[0]
+        self.window.append(x)
+        self.total += x
+        if len(self.window) < self.length:
+            return NAN
+        return self.total / self.length
+
+
+class _Ema:
+    """
+    EMA seeded with the SMA of the first ``length`` values, as pandas-ta's
+    ``ema`` does with ``presma=True`` and ``adjust=False``.
+    """
+
+    def __init__(self, length: int):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.seed = []
+        self.value = NAN
+
+    def update(self, x: float) -> float:
+        if math.isnan(x):
+            return self.value
+        if len(self.seed) < self.length:
+            self.seed.append(x)
+            if len(self.seed) == self.length:
+                self.value = sum(self.seed) / self.length
+            return self.value
+        self.value = self.alpha * x + (1.0 - self.alpha) * self.value
+        return self.value
+
+
+class _Rma:
+    """
+    Wilder's moving average, matching pandas-ta's ``rma``
+    (``ewm(alpha=1/length, min_periods=length)`` with ``adjust=True``).
+
+    The adjusted EWM is kept as a running weighted sum and a running weight
+    so each update is O(1).
+    """
+
+    def __init__(self, length: int):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        self.weighted_sum = 0.0
+        self.weight = 0.0
+        self.observations = 0
+
+    def update(self, x: float) -> float:
+        self.weighted_sum *= self.decay
+        self.weight *= self.decay
+        if not math.isnan(x):
+            self.weighted_sum += x
+            self.weight += 1.0
+            self.observations += 1
+        if self.observations < self.length:
+            return NAN
+        return self.weighted_sum / self.weight
+
+
+class _RollingExtreme:
+    """Rolling max (or min) using a monotonic deque, amortised O(1)."""
+
+    def __init__(self, length: int, maximum: bool):
+        self.length = length
+        self.maximum = maximum
+        self.candidates = deque()
+        self.count = 0
+
+    def update(self, x: float) -> float:
+        index = self.count
+        self.count += 1
+        while self.candidates and (
+            self.candidates[-1][1] <= x if self.maximum
+            else self.candidates[-1][1] >= x
+        ):
+            self.candidates.pop()
+        self.candidates.append((index, x))
+        if self.candidates[0][0] <= index - self.length:
+            self.candidates.popleft()
+        if self.count < self.length:
+            return NAN
+        return self.candidates[0][1]
+
+
+class _MidPrice:
+    """(Rolling highest high + rolling lowest low) / 2 (pandas-ta ``midprice``)."""
+
+    def __init__(self, length: int):
+        self.highest = _RollingExtreme(length, maximum=True)
+        self.lowest = _RollingExtreme(length, maximum=False)
+
+    def update(self, high: float, low: float) -> float:
+        return 0.5 * (self.highest.update(high) + self.lowest.update(low))
+
+
+class _Psar:
+    """
+    Parabolic SAR, following the pandas-ta ``psar`` loop bar by bar.
+
+    Like pandas-ta, the SAR is seeded from the first close and the initial
+    trend from the first two bars. pandas-ta also reads ``high.iloc[-1]`` and
+    ``low.iloc[-1]`` (the *last* bar of the frame) as the bar before the
+    first when processing the second row, which a stream cannot know; this
+    implementation uses the first bar there. The two agree exactly when that
+    bound does not bind, and otherwise from the first reversal on; before it
+    the SAR may differ.
+    """
+
+    def __init__(self, af0: float = 0.02, af: float = 0.02,
+                 max_af: float = 0.2):
+        self.af0 = af0
+        self.af = af
+        self.max_af = max_af
+        self.highs = deque(maxlen=2)
+        self.lows = deque(maxlen=2)
+        self.falling = False
+        self.sar = NAN
+        self.ep = NAN
+
+    def update(self, high: float, low: float, close: float) -> tuple:
+        """Returns (long, short, af, reversal) for the new bar."""
+        if not self.highs:
+            self.highs.append(high)
+            self.lows.append(low)
+            self.sar = close
+            return NAN, NAN, self.af0, 0
+
+        if len(self.highs) == 1:
+            up = high - self.highs[0]
+            dn = self.lows[0] - low
+            self.falling = dn > up and dn > 0
+            self.ep = self.lows[0] if self.falling else self.highs[0]
+            prev_high = prev2_high = self.highs[0]
+            prev_low = prev2_low = self.lows[0]
+        else:
+            prev2_high, prev_high = self.highs
+            prev2_low, prev_low = self.lows
+
+        sar = self.sar + self.af * (self.ep - self.sar)
+        if self.falling:
+            reverse = high > sar
+            if low < self.ep:
+                self.ep = low
+                self.af = min(self.af + self.af0, self.max_af)
+            sar = max(prev_high, prev2_high, sar)
+        else:
+            reverse = low < sar
+            if high > self.ep:
+                self.ep = high
+                self.af = min(self.af + self.af0, self.max_af)
+            sar = min(prev_low, prev2_low, sar)
+
+        if reverse:
+            sar = self.ep
+            self.af = self.af0
+            self.falling = not self.falling
+            self.ep = low if self.falling else high
+
+        self.sar = sar
+        self.highs.append(high)
+        self.lows.append(low)
+        if self.falling:
+            return NAN, sar, self.af, int(reverse)
+        return sar, NAN, self.af, int(reverse)
+
+
+class StreamingIndicators:
+    """
+    Incremental version of ``data_fetcher.calculate_indicators``.
+
+    Keeps the running state of every indicator (Wilder smoothing, EMA state,
+    rolling windows) for a single symbol so that each new bar is processed in
+    O(1) instead of recomputing the whole frame. Column names and values match
+    pandas-ta's defaults for the same indicators.
+
+    ``ICS_26`` (the Chikou span) is the close 26 bars *ahead*, so it is always
+    NaN at the live edge; it is reported only for column parity.
+    """
+
+    def __init__(self):
+        self.last_timestamp: Optional[pd.Timestamp] = None
+        self.latest: Optional[Dict[str, float]] = None
+        self._prev_close = NAN
+        self._prev_high = NAN
+        self._prev_low = NAN
+        self._bars = 0
+
+        # RSI
+        self._rsi_pos = _Rma(14)
+        self._rsi_neg = _Rma(14)
+        # MACD
+        self._macd_fast = _Ema(12)
+        self._macd_slow = _Ema(26)
+        self._macd_signal = _Ema(9)
+        # ATR / ADX
+        self._atr = _Rma(14)
+        self._dmp = _Rma(14)
+        self._dmn = _Rma(14)
+        self._adx = _Rma(14)
+        # Bollinger Bands
+        self._bb_window = deque(maxlen=5)
+        # CCI
+        self._cci_window = deque(maxlen=14)
+        # Ichimoku
+        self._tenkan = _MidPrice(9)
+        self._kijun = _MidPrice(26)
+        self._senkou = _MidPrice(52)
+        self._span_a = deque(maxlen=27)
+        self._span_b = deque(maxlen=27)
+        # Moving averages
+        self._smas = {length: _Sma(length) for length in (20, 50, 200)}
+        self._emas = {length: _Ema(length) for length in (20, 50, 200)}
+        # OBV
+        self._obv = 0.0
+        # PSAR
+        self._psar = _Psar()
+        # Stochastic
+        self._stoch_high = _RollingExtreme(14, maximum=True)
+        self._stoch_low = _RollingExtreme(14, maximum=False)
+        self._stoch_k = _Sma(3)
+        self._stoch_d = _Sma(3)
+
+    def update(self, high: float, low: float, close: float,
+               volume: float) -> Dict[str, float]:
+        """
+        Consumes one closed bar and returns the indicator values for it.
+
+        Args:
+            high (float): Bar high.
+            low (float): Bar low.
+            close (float): Bar close.
+            volume (float): Bar volume.
+
+        Returns:
+            Dict[str, float]: Indicator values keyed by pandas-ta column name.
+        """
+        out: Dict[str, float] = {}
+        first = self._bars == 0
+
+        # RSI
+        change = NAN if first else close - self._prev_close
+        pos_avg = self._rsi_pos.update(max(change, 0.0) if not first else NAN)
+        neg_avg = self._rsi_neg.update(min(change, 0.0) if not first else NAN)
+        out["RSI_14"] = _ratio(100.0 * pos_avg, pos_avg + abs(neg_avg))
+
+        # MACD
+        fast = self._macd_fast.update(close)
+        slow = self._macd_slow.update(close)
+        macd = fast - slow
+        signal = self._macd_signal.update(macd)
+        out["MACD_12_26_9"] = macd
+        out["MACDh_12_26_9"] = macd - signal
+        out["MACDs_12_26_9"] = signal
+
+        # ADX / ATR
+        if first:
+            true_range = up = dn = NAN
+        else:
+            true_range = max(
+                abs(high - low),
+                abs(high - self._prev_close),
+                abs(self._prev_close - low),
+            )
+            up = high - self._prev_high
+            dn = self._prev_low - low
+        atr = self._atr.update(true_range)
+        if first:
+            plus_dm = minus_dm = NAN
+        else:
+            plus_dm = up if up > dn and up > 0 else 0.0
+            minus_dm = dn if dn > up and dn > 0 else 0.0
+        k = _ratio(100.0, atr)
+        dmp = k * self._dmp.update(plus_dm)
+        dmn = k * self._dmn.update(minus_dm)
+        dx = _ratio(100.0 * abs(dmp - dmn), dmp + dmn)
+        out["ADX_14"] = self._adx.update(dx)
+        out["DMP_14"] = dmp
+        out["DMN_14"] = dmn
+        out["ATRr_14"] = atr
+
+        # Bollinger Bands (length 5, 2 std, ddof=0)
+        self._bb_window.append(close)
+        if len(self._bb_window) == 5:
+            mid = sum(self._bb_window) / 5
+            std = math.sqrt(sum((x - mid) ** 2 for x in self._bb_window) / 5)
+            lower = mid - 2.0 * std
+            upper = mid + 2.0 * std
+            out["BBL_5_2.0"] = lower
+            out["BBM_5_2.0"] = mid
+            out["BBU_5_2.0"] = upper
+            out["BBB_5_2.0"] = _ratio(100.0 * (upper - lower), mid)
+            out["BBP_5_2.0"] = _ratio(close - lower, upper - lower)
+        else:
+            for column in ("BBL", "BBM", "BBU", "BBB", "BBP"):
+                out[f"{column}_5_2.0"] = NAN
+
+        # CCI (length 14, c=0.015)
+        typical = (high + low + close) / 3.0
+        self._cci_window.append(typical)
+        if len(self._cci_window) == 14:
+            mean = sum(self._cci_window) / 14
+            mad = sum(abs(x - mean) for x in self._cci_window) / 14
+            out["CCI_14_0.015"] = _ratio(typical - mean, 0.015 * mad)
+        else:
+            out["CCI_14_0.015"] = NAN
+
+        # Ichimoku (9, 26, 52); spans are shifted forward by 26 bars
+        tenkan = self._tenkan.update(high, low)
+        kijun = self._kijun.update(high, low)
+        self._span_a.append(0.5 * (tenkan + kijun))
+        self._span_b.append(self._senkou.update(high, low))
+        shifted = len(self._span_a) == self._span_a.maxlen
+        out["ISA_9"] = self._span_a[0] if shifted else NAN
+        out["ISB_26"] = self._span_b[0] if shifted else NAN
+        out["ITS_9"] = tenkan
+        out["IKS_26"] = kijun
+        out["ICS_26"] = NAN
+
+        # Moving averages
+        for length, sma in self._smas.items():
+            out[f"SMA_{length}"] = sma.update(close)
+        for length, ema in self._emas.items():
+            out[f"EMA_{length}"] = ema.update(close)
+
+        # OBV
+        if first or close > self._prev_close:
+            self._obv += volume
+        elif close < self._prev_close:
+            self._obv -= volume
+        out["OBV"] = self._obv
+
+        # PSAR
+        long, short, af, reversal = self._psar.update(high, low, close)
+        out["PSARl_0.02_0.2"] = long
+        out["PSARs_0.02_0.2"] = short
+        out["PSARaf_0.02_0.2"] = af
+        out["PSARr_0.02_0.2"] = reversal
+
+        # Stochastic (14, 3, 3)
+        highest = self._stoch_high.update(high)
+        lowest = self._stoch_low.update(low)
+        raw_k = _ratio(100.0 * (close - lowest), highest - lowest)
+        stoch_k = self._stoch_k.update(raw_k)
+        out["STOCHk_14_3_3"] = stoch_k
+        out["STOCHd_14_3_3"] = self._stoch_d.update(stoch_k)
+
+        self._prev_close = close
+        self._prev_high = high
+        self._prev_low = low
+        self._bars += 1
+        return out
+
+    def update_frame(self, data: pd.DataFrame) -> Optional[Dict[str, float]]:
+        """
+        Feeds every bar of ``data`` newer than the last processed timestamp.
+
+        ``data`` is a frame as returned by ``get_realtime_data``; OHLCV columns
+        are looked up by prefix (``close_btc-usd`` for ``close``), as
+        pandas-ta does. Only closed bars should be passed in.
+
+        Args:
+            data (pd.DataFrame): OHLCV bars indexed by timestamp.
+
+        Returns:
+            Optional[Dict[str, float]]: The latest bar's columns merged with
+                                        its indicators, like
+                                        ``data.iloc[-1].to_dict()`` after
+                                        ``calculate_indicators``, or None if
+                                        no bar has been processed yet.
+        """
+        if self.last_timestamp is not None:
+            data = data[data.index > self.last_timestamp]
+        if data.empty:
+            return self.latest
+
+        high = _column(data, "high")
+        low = _column(data, "low")
+        close = _column(data, "close")
+        volume = _column(data, "volume")
+        records = data.to_dict("records")
+        for i, row in enumerate(records):
+            indicators = self.update(
+                float(high[i]), float(low[i]), float(close[i]),
+                float(volume[i]),
+            )
+        row.update(indicators)
+        self.latest = row
+        self.last_timestamp = data.index[-1]
+        return self.latest
+
+
+def advance_engine(engine: StreamingIndicators, data: pd.DataFrame) -> Tuple[StreamingIndicators, Optional[Dict[str, float]]]:
+    """
+    Feeds ``data`` to ``engine`` and returns the engine with its snapshot.
+
+    Meant to run in an executor: a process pool works on a pickled copy of
+    the engine, so the updated engine has to travel back with the result.
+    """
+    snapshot = engine.update_frame(data)
+    return engine, snapshot
+
+
+def _column(data: pd.DataFrame, name: str):
+    if name in data.columns:
+        return data[name].to_numpy()
+    matches = [c for c in data.columns if str(c).lower().startswith(name)]
+    if not matches:
+        raise KeyError(f"'{name}' column not found in {data.columns.tolist()}")
+    return data[matches[0]].to_numpy()
+
+
+def _ratio(numerator: float, denominator: float) -> float:
+    if denominator == 0 or math.isnan(denominator):
+        return NAN
+    return numerator / denominator
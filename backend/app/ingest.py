@@ -0,0 +1,292 @@
+import asyncio
+import json
+import math
+import re
+import time
+from datetime import datetime
+from typing import (
+    TYPE_CHECKING, AsyncIterator, Callable, Dict, Iterable, List, NamedTuple,
+    Optional, Protocol, Tuple,
+)
+
+import numpy as np
+
+from app.ring import RingBuffer
+from app.utils import logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+BAR_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+class Trade(NamedTuple):
+    symbol: str
+    price: float
+    size: float
+    timestamp: float  # Epoch seconds
+
+
+class Bar(NamedTuple):
+    symbol: str
+    start: float  # Epoch seconds of the bar's open
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+class TradeSource(Protocol):
+    """Anything that yields trades as they happen, e.g. a websocket feed."""
+
+    def trades(self) -> AsyncIterator[Trade]:
+        ...
+
+
+_EXTRA_FRACTION = re.compile(r"(\.\d{6})\d+")
+
+
+def _parse_time(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    # RFC 3339 with up to nanosecond precision; datetime keeps microseconds
+    value = _EXTRA_FRACTION.sub(r"\1", value).replace("Z", "+00:00")
+    return datetime.fromisoformat(value).timestamp()
+
+
+def parse_alpaca_trades(message: str) -> List[Trade]:
+    """
+    Extracts trades from an Alpaca market data stream message.
+
+    Messages are JSON arrays of events; trade events have ``"T": "t"``.
+    Control messages (success, subscription) are ignored and errors logged.
+    """
+    events = json.loads(message)
+    if isinstance(events, dict):
+        events = [events]
+    trades = []
+    for event in events:
+        kind = event.get("T")
+        if kind == "t":
+            trades.append(Trade(
+                event["S"], float(event["p"]), float(event["s"]), _parse_time(event["t"]),
+            ))
+        elif kind == "error":
+            logger.error(f"Market stream: {event.get('code')} {event.get('msg')}")
+    return trades
+
+
+def alpaca_subscription(symbols: Iterable[str], key: str, secret: str) -> List[dict]:
+    """The auth and trade subscription messages for Alpaca's data stream."""
+    return [
+        {"action": "auth", "key": key, "secret": secret},
+        {"action": "subscribe", "trades": list(symbols)},
+    ]
+
+
+class WebSocketSource:
+    """
+    Trades from a websocket market data feed.
+
+    Sends ``subscribe`` messages after connecting, parses every message with
+    ``parse`` and renames stream symbols to tickers via ``symbols``.
+    Dropped connections are retried with exponential backoff. Needs the
+    optional ``websockets`` package.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        symbols: Dict[str, str],
+        subscribe: Optional[List[dict]] = None,
+        parse: Callable[[str], List[Trade]] = parse_alpaca_trades,
+        reconnect_seconds: float = 1.0,
+        max_reconnect_seconds: float = 30.0,
+    ):
+        self.url = url
+        self.symbols = symbols  # Stream symbol -> ticker
+        self.subscribe = subscribe or []
+        self.parse = parse
+        self.reconnect_seconds = reconnect_seconds
+        self.max_reconnect_seconds = max_reconnect_seconds
+
+    async def trades(self) -> AsyncIterator[Trade]:
+        import websockets
+
+        delay = self.reconnect_seconds
+        while True:
+            try:
+                async with websockets.connect(self.url) as connection:
+                    for message in self.subscribe:
+                        await connection.send(json.dumps(message))
+                    logger.info(f"Market stream: Connected to {self.url}")
+                    delay = self.reconnect_seconds
+                    async for message in connection:
+                        for trade in self.parse(message):
+                            ticker = self.symbols.get(trade.symbol)
+                            if ticker is not None:
+                                yield trade._replace(symbol=ticker)
+                logger.warning("Market stream: Connection closed by the server.")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Market stream: {e}; reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_seconds)
+
+
+class BarAggregator:
+    """
+    Aggregates trades into OHLCV bars of ``interval_seconds``.
+
+    A symbol's bar closes as soon as its first trade of the next interval
+    arrives, or when ``close_until`` is called for the boundary (so quiet
+    symbols still close on time). Trades for bars that already closed are
+    dropped and counted. Intervals without trades produce no bar.
+
+    Closed bars go into a preallocated ``RingBuffer`` of ``max_bars`` rows
+    per symbol. ``bars`` exposes them without copying, for immediate use;
+    ``frame`` copies them once, because its frames wait in the pipeline
+    queue while the ingest task keeps closing (and overwriting) bars.
+    """
+
+    def __init__(self, symbols: Iterable[str], interval_seconds: float = 60,
+                 max_bars: int = 1440, dtype="float64"):
+        self.interval_seconds = interval_seconds
+        self._open: Dict[str, list] = {}  # symbol -> [start, open, high, low, close, volume]
+        self._closed: Dict[str, RingBuffer] = {
+            symbol: RingBuffer(max_bars, BAR_FIELDS, dtype) for symbol in symbols
+        }
+        self._bar_closed = asyncio.Event()
+        self.trades = 0
+        self.late_trades = 0
+
+    def _start(self, timestamp: float) -> float:
+        return math.floor(timestamp / self.interval_seconds) * self.interval_seconds
+
+    def _last_end(self, symbol: str) -> Optional[float]:
+        closed = self._closed[symbol]
+        return closed.times(1)[0] + self.interval_seconds if closed.size else None
+
+    def _close(self, symbol: str) -> Bar:
+        bar = Bar(symbol, *self._open.pop(symbol))
+        self._closed[symbol].append(bar.start, dict(zip(BAR_FIELDS, bar[2:])))
+        self._bar_closed.set()
+        return bar
+
+    def add(self, trade: Trade) -> Optional[Bar]:
+        """Adds a trade and returns the bar it closed, if any."""
+        if trade.symbol not in self._closed:
+            return None
+        start = self._start(trade.timestamp)
+        current = self._open.get(trade.symbol)
+        if current is not None:
+            earliest = current[0]
+        else:
+            earliest = self._last_end(trade.symbol) or -math.inf
+        if start < earliest:
+            self.late_trades += 1
+            return None
+
+        self.trades += 1
+        bar = None
+        if current is not None and start > current[0]:
+            bar = self._close(trade.symbol)
+            current = None
+        if current is None:
+            self._open[trade.symbol] = [
+                start, trade.price, trade.price, trade.price, trade.price, trade.size,
+            ]
+        else:
+            current[2] = max(current[2], trade.price)
+            current[3] = min(current[3], trade.price)
+            current[4] = trade.price
+            current[5] += trade.size
+        return bar
+
+    def close_until(self, boundary: float) -> List[Bar]:
+        """Closes every open bar that ends at or before ``boundary``."""
+        return [
+            self._close(symbol) for symbol, bar in list(self._open.items())
+            if bar[0] + self.interval_seconds <= boundary
+        ]
+
+    def closed_through(self, boundary: float) -> bool:
+        """True once every symbol has closed its bar ending at ``boundary``."""
+        for symbol in self._closed:
+            current = self._open.get(symbol)
+            if current is not None:
+                if current[0] + self.interval_seconds <= boundary:
+                    return False
+            elif (self._last_end(symbol) or -math.inf) < boundary:
+                return False
+        return True
+
+    async def wait_closed(self, boundary: float, timeout: float) -> Dict[str, "pd.DataFrame"]:
+        """
+        Waits until every symbol has moved past ``boundary`` (or ``timeout``
+        expires), closes what is left and returns the closed bars.
+        """
+        deadline = time.monotonic() + timeout
+        while not self.closed_through(boundary):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._bar_closed.clear()
+            try:
+                await asyncio.wait_for(self._bar_closed.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+        self.close_until(boundary)
+        return self.frames()
+
+    def seed(self, symbol: str, data: "pd.DataFrame"):
+        """Fills an empty symbol with historical closed bars, e.g. from the bar cache."""
+        closed = self._closed.get(symbol)
+        if closed is None or closed.size or data is None or data.empty:
+            return
+        columns = {}
+        for field in BAR_FIELDS:
+            matches = [c for c in data.columns if str(c).lower().startswith(field)]
+            if matches:
+                columns[field] = data[matches[0]].to_numpy(dtype=float)
+        timestamps = data.index.as_unit("s").asi8
+        closed.extend(timestamps, columns)
+
+    def bars(self, symbol: str, last: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Zero-copy bar start times and ``(BAR_FIELDS, bars)`` values; only
+        valid until the next bar of ``symbol`` closes.
+        """
+        return self._closed[symbol].window(last)
+
+    def frame(self, symbol: str) -> "pd.DataFrame":
+        """Closed bars of ``symbol`` shaped like ``get_realtime_data`` output."""
+        import pandas as pd
+
+        timestamps, values = self.bars(symbol)
+        suffix = symbol.lower()
+        # One copy into the frame's own (rows, fields) block, detached from the ring
+        return pd.DataFrame(
+            np.array(values.T), columns=[f"{field}_{suffix}" for field in BAR_FIELDS],
+            index=pd.to_datetime(timestamps, unit="s", utc=True), copy=False,
+        )
+
+    def frames(self) -> Dict[str, "pd.DataFrame"]:
+        return {symbol: self.frame(symbol) for symbol in self._closed}
+
+    def stats(self) -> dict:
+        return {
+            "trades": self.trades,
+            "late_trades": self.late_trades,
+            "open_bars": len(self._open),
+            "closed_bars": {symbol: bars.size for symbol, bars in self._closed.items()},
+            "nbytes": sum(bars.nbytes for bars in self._closed.values()),
+        }
+
+
+async def ingest(source: TradeSource, aggregator: BarAggregator):
+    """Feeds every trade from ``source`` into ``aggregator`` until cancelled."""
+    async for trade in source.trades():
+        aggregator.add(trade)
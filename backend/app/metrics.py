@@ -0,0 +1,233 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+def _labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, optionally split by labels."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Latency histogram with fixed buckets, optionally split by labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (+Inf last), sum, count
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            series[0][index] += 1
+            series[1][0] += value
+            series[1][1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observes the duration of the ``with`` block, even if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[1][1] if series else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, (counts, (total, count)) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = _labels(self.labelnames, key, f'le="{_number(bound)}"')
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                labels = _labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_number(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Renders registered metrics in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "trading_stage_seconds",
+    "Latency of each trading loop stage.",
+    ("stage",),
+))
+TICK_SECONDS = REGISTRY.register(Histogram(
+    "trading_tick_seconds",
+    "Duration of a whole trading tick (all symbols).",
+))
+TICK_OVERRUNS = REGISTRY.register(Counter(
+    "trading_tick_overruns_total",
+    "Ticks that finished after their deadline.",
+))
+TICKS_SKIPPED = REGISTRY.register(Counter(
+    "trading_ticks_skipped_total",
+    "Ticks skipped or dropped because the loop was behind.",
+))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    "trading_stage_errors_total",
+    "Exceptions raised by trading loop stages.",
+    ("stage",),
+))
+DEEPSEEK_ERRORS = REGISTRY.register(Counter(
+    "deepseek_errors_total",
+    "Signals that ended in a DeepSeekErrorResponse, by error type.",
+    ("type",),
+))
+DEEPSEEK_TOKENS = REGISTRY.register(Counter(
+    "deepseek_tokens_total",
+    "DeepSeek token usage.",
+    ("kind",),
+))
+DEEPSEEK_REQUESTS = REGISTRY.register(Counter(
+    "deepseek_requests_total",
+    "DeepSeek completions that reported token usage.",
+))
+LEDGER_DRIFT = REGISTRY.register(Counter(
+    "ledger_drift_total",
+    "Reconciles where the local position ledger disagreed with the broker.",
+))
+ORDER_LATENCY = REGISTRY.register(Histogram(
+    "order_latency_seconds",
+    "Order latency by phase (signal_to_submit, submit_to_ack, submit_to_fill, signal_to_fill).",
+    ("phase",),
+))
+ORDER_SLIPPAGE_BPS = REGISTRY.register(Histogram(
+    "order_slippage_bps",
+    "Fill price versus the signal bar's close in basis points; positive is adverse.",
+    buckets=(-50, -20, -10, -5, -2, -1, 0, 1, 2, 5, 10, 20, 50),
+))
+RATE_LIMIT_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "rate_limit_queue_depth",
+    "Requests waiting for a rate limit slot, by provider.",
+    ("provider",),
+))
+RATE_LIMIT_IN_FLIGHT = REGISTRY.register(Gauge(
+    "rate_limit_in_flight",
+    "Requests holding a rate limit slot, by provider.",
+    ("provider",),
+))
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "rate_limit_wait_seconds",
+    "Time requests waited for a rate limit slot, by provider.",
+    ("provider",),
+))
+RATE_LIMIT_RETRIES = REGISTRY.register(Counter(
+    "rate_limit_retries_total",
+    "Requests retried after a 429 or 5xx response, by provider and status.",
+    ("provider", "status"),
+))
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional, Union
+from pydantic import BaseModel, ConfigDict, field_validator
+from typing import Any, Dict, List, Literal, Optional, Union
 
 
 class IndicatorValue(BaseModel):
@@ -20,12 +20,17 @@ class DeepSeekMessage(BaseModel):
     content: str
 
 
+class DeepSeekResponseFormat(BaseModel):
+    type: str = "text"
+
+
 class DeepSeekRequest(BaseModel):
     model: str = "deepseek-chat"
     messages: List[DeepSeekMessage]
     temperature: float = 0.7
     max_tokens: int = 150
     stream: bool = False
+    response_format: Optional[DeepSeekResponseFormat] = None
 
 
 class DeepSeekChoice(BaseModel):
@@ -49,6 +54,27 @@ class DeepSeekResponse(BaseModel):
     usage: DeepSeekUsage
 
 
+# Streaming (SSE) chunks: each "data:" line carries a delta of the reply
+class DeepSeekDelta(BaseModel):
+    role: Optional[str] = None
+    content: Optional[str] = None
+
+
+class DeepSeekStreamChoice(BaseModel):
+    index: int
+    delta: DeepSeekDelta
+    finish_reason: Optional[str] = None
+
+
+class DeepSeekStreamChunk(BaseModel):
+    id: str
+    object: str
+    created: int
+    model: str
+    choices: List[DeepSeekStreamChoice]
+    usage: Optional[DeepSeekUsage] = None
+
+
 class DeepSeekError(BaseModel):
     message: str
     type: str
@@ -60,4 +86,54 @@ class DeepSeekErrorResponse(BaseModel):
     error: DeepSeekError
 
 
+# Batched signal reply: {"signals": {"<symbol>": "buy" | "sell" | "hold"}}
+class BatchSignalResponse(BaseModel):
+    signals: Dict[str, Any]
+
+
+class BatchSignalEntry(BaseModel):
+    symbol: str
+    signal: Literal["buy", "sell", "hold"]
+
+    @field_validator("signal", mode="before")
+    @classmethod
+    def normalize_signal(cls, value):
+        return value.strip().lower() if isinstance(value, str) else value
+
+
+# Alpaca API Models
+# Alpaca returns numbers as strings; unknown fields are kept as extras.
+class AlpacaOrder(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    id: str
+    client_order_id: Optional[str] = None
+    symbol: str
+    qty: Optional[str] = None
+    side: str
+    type: str
+    time_in_force: Optional[str] = None
+    status: Optional[str] = None
+    filled_qty: Optional[str] = None
+    filled_avg_price: Optional[str] = None
+    submitted_at: Optional[str] = None
+    filled_at: Optional[str] = None
+
+
+class AlpacaPosition(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    symbol: str
+    qty: str
+    avg_entry_price: str
+    side: Optional[str] = None
+    market_value: Optional[str] = None
+
+
+class AlpacaAccount(BaseModel):
+    model_config = ConfigDict(extra="allow")
 
+    status: str
+    equity: str
+    buying_power: str
+    cash: Optional[str] = None
@@ -0,0 +1,381 @@
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.metrics import ORDER_LATENCY, ORDER_SLIPPAGE_BPS
+from app.models import AlpacaOrder
+from app.trader import AlpacaTrader
+from app.utils import logger
+
+ORDERS_DB = "orders.db"
+RETENTION_SECONDS = 7 * 24 * 3600
+PRUNE_EVERY = 256  # Saves between retention passes
+_PRUNE = "prune"  # Writer queue marker for a retention pass
+
+TERMINAL_STATUSES = frozenset({
+    "filled", "canceled", "expired", "rejected", "done_for_day", "replaced",
+})
+
+# Milliseconds between two recorded timestamps, keyed by phase name
+LATENCY_PHASES = {
+    "signal_to_submit": ("signal_time", "submitted_at"),
+    "submit_to_ack": ("submitted_at", "acked_at"),
+    "submit_to_fill": ("submitted_at", "filled_at"),
+    "signal_to_fill": ("signal_time", "filled_at"),
+}
+
+
+def client_order_id(symbol: str, side: str, bar_time: float) -> str:
+    """
+    The idempotency key of the order for ``symbol``'s ``side`` decision on
+    the bar at ``bar_time``; resubmitting the same decision reuses it.
+    """
+    return f"{symbol.replace('/', '')}-{side}-{int(bar_time)}"
+
+
+def _epoch(timestamp: Optional[str]) -> Optional[float]:
+    """Epoch seconds of an Alpaca RFC 3339 timestamp, None if missing or invalid."""
+    try:
+        return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def slippage_bps(side: str, expected: float, fill: float) -> float:
+    """Fill price versus the signal bar's close; positive means worse for us."""
+    signed = 1.0 if side == "buy" else -1.0
+    return signed * (fill - expected) / expected * 1e4
+
+
+class OrderTracker:
+    """
+    Submits orders and follows them until they reach a terminal status,
+    booking each fill in the trader's ledger as it is reported.
+
+    Every order gets a deterministic ``client_order_id`` and a polling task
+    that asks Alpaca for its status with exponential backoff. Fill price,
+    slippage against the signal bar and the signal -> submit -> fill
+    latencies are recorded on the order and observed in the metrics. Like
+    ``StateStore``, every change updates memory and is queued for a writer
+    thread that upserts the rows into a SQLite table (WAL mode), so the
+    event loop never waits on the disk. Orders still open when the process
+    stopped are picked up again by ``resume``. Finished orders older than
+    ``retention_seconds`` are deleted (by indexed status and submit time)
+    when the tracker opens and every ``PRUNE_EVERY`` saves, so memory and
+    ``summary`` cost stay bounded.
+    """
+
+    def __init__(
+        self,
+        trader: AlpacaTrader,
+        path: str = ORDERS_DB,
+        poll_seconds: float = 0.25,
+        max_poll_seconds: float = 5.0,
+        timeout_seconds: float = 120.0,
+        retention_seconds: float = RETENTION_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.trader = trader
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.max_poll_seconds = max_poll_seconds
+        self.timeout_seconds = timeout_seconds
+        self.retention_seconds = retention_seconds
+        self.clock = clock
+        self.on_fill: List[Callable[[dict], None]] = []
+        self._orders: Dict[str, dict] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._saves = 0
+        self._pending: queue.Queue = queue.Queue()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS orders ("
+            " client_order_id TEXT PRIMARY KEY,"
+            " symbol TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " status TEXT,"
+            " submitted_at REAL)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(orders)")}
+        if "status" not in columns:
+            # Tables from before the prune columns: add and backfill them once
+            self._db.execute("ALTER TABLE orders ADD COLUMN status TEXT")
+            self._db.execute("ALTER TABLE orders ADD COLUMN submitted_at REAL")
+            self._db.execute(
+                "UPDATE orders SET status = json_extract(data, '$.status'),"
+                " submitted_at = json_extract(data, '$.submitted_at')"
+            )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS orders_retention ON orders (status, submitted_at)"
+        )
+        self.prune()
+        for (data,) in self._db.execute("SELECT data FROM orders ORDER BY updated_at"):
+            record = json.loads(data)
+            self._orders[record["client_order_id"]] = record
+        self._writer = threading.Thread(target=self._write_loop, name="orders-db", daemon=True)
+        self._writer.start()
+
+    def prune(self) -> int:
+        """
+        Deletes finished orders submitted before the retention window.
+
+        Runs on the writer thread once the tracker is open.
+        """
+        cutoff = self.clock() - self.retention_seconds
+        finished = sorted(TERMINAL_STATUSES | {"failed"})
+        deleted = self._db.execute(
+            f"DELETE FROM orders WHERE status IN ({', '.join('?' * len(finished))})"
+            f" AND submitted_at < ?",
+            (*finished, cutoff),
+        ).rowcount
+        with self._lock:
+            for order_id, record in list(self._orders.items()):
+                if record["status"] in finished and record["submitted_at"] < cutoff:
+                    del self._orders[order_id]
+        if deleted:
+            logger.info(f"Orders: Pruned {deleted} order(s) past retention from {self.path}")
+        return deleted
+
+    def _save(self, record: dict):
+        """Updates the order in memory and queues its row for the writer thread."""
+        with self._lock:
+            self._orders[record["client_order_id"]] = record
+            self._pending.put((
+                record["client_order_id"], record["symbol"], json.dumps(record),
+                self.clock(), record["status"], record["submitted_at"],
+            ))
+            self._saves += 1
+            if self._saves % PRUNE_EVERY == 0:
+                self._pending.put(_PRUNE)
+
+    def _write_loop(self):
+        while True:
+            batch = [self._pending.get()]
+            while True:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if isinstance(row, tuple)]
+            try:
+                if rows:
+                    self._upsert(rows)
+                if _PRUNE in batch:
+                    self.prune()
+            except sqlite3.Error as e:
+                logger.error(f"Orders: Writing {len(rows)} order row(s) failed: {e}")
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+            if None in batch:  # ``aclose`` queued it last
+                return
+
+    def _upsert(self, rows):
+        self._db.execute("BEGIN")
+        try:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO orders"
+                " (client_order_id, symbol, data, updated_at, status, submitted_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.execute("COMMIT")
+        except sqlite3.Error:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def flush(self):
+        """Blocks until every queued row is written."""
+        self._pending.join()
+
+    async def submit(
+        self, symbol: str, qty: float, side: str, price: float,
+        bar_time: float, signal_time: Optional[float] = None,
+    ) -> Optional[AlpacaOrder]:
+        """
+        Places an order and starts tracking it.
+
+        Resubmitting a decision that was already acknowledged (same
+        ``client_order_id``) places nothing; the tracked order is returned.
+
+        Args:
+            symbol (str): Alpaca symbol.
+            qty (float): Quantity to trade.
+            side (str): "buy" or "sell".
+            price (float): Close of the signal bar, the expected fill price.
+            bar_time (float): Epoch seconds of the signal bar.
+            signal_time (Optional[float]): When the signal was received;
+                                           defaults to now.
+
+        Returns:
+            Optional[AlpacaOrder]: The acknowledged order, or None if it
+                                   could not be placed.
+        """
+        order_id = client_order_id(symbol, side, bar_time)
+        existing = self.get(order_id)
+        if existing is not None and existing.get("id"):
+            if existing["status"] not in TERMINAL_STATUSES:
+                self._track(existing)
+            return await self.trader.get_order(existing["id"])
+        if existing is not None:
+            # A failed earlier attempt keeps its signal and submit times
+            existing = {
+                key: value for key, value in existing.items()
+                if key != "acked_at" and not key.endswith("_ms")
+            }
+        record = dict(existing or {
+            "client_order_id": order_id,
+            "symbol": symbol,
+            "side": side,
+            "qty": qty,
+            "expected_price": price,
+            "bar_time": bar_time,
+            "signal_time": self.clock() if signal_time is None else signal_time,
+            "submitted_at": self.clock(),
+        }, status="submitting")
+        order = await self.trader.place_order(
+            symbol=symbol, qty=qty, side=side, client_order_id=order_id, book=False,
+        )
+        record["acked_at"] = self.clock()
+        if order is None:
+            record["status"] = "failed"
+        else:
+            record.update(id=order.id, status=order.status or "new")
+        self._update(record, order)
+        if order is not None and record["status"] not in TERMINAL_STATUSES:
+            self._track(record)
+        return order
+
+    def _track(self, record: dict):
+        order_id = record["client_order_id"]
+        if order_id not in self._tasks:
+            task = asyncio.create_task(self._poll(record))
+            self._tasks[order_id] = task
+            task.add_done_callback(lambda _: self._tasks.pop(order_id, None))
+
+    async def _poll(self, record: dict):
+        delay = self.poll_seconds
+        deadline = self.clock() + self.timeout_seconds
+        while record["status"] not in TERMINAL_STATUSES:
+            if self.clock() >= deadline:
+                logger.warning(
+                    f"Orders: {record['client_order_id']} still {record['status']} "
+                    f"after {self.timeout_seconds:.0f}s; no longer polling."
+                )
+                # Whatever happens next is only seen at the next reconcile
+                self.trader.ledger.stale = True
+                return
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_poll_seconds)
+            order = await self.trader.get_order(record["id"])
+            if order is not None and order.status != record["status"]:
+                record = dict(record, status=order.status)
+                self._update(record, order)
+                delay = self.poll_seconds
+
+    def _update(self, record: dict, order: Optional[AlpacaOrder]):
+        if order is not None:
+            if order.filled_qty is not None:
+                record["filled_qty"] = float(order.filled_qty)
+            if order.filled_avg_price is not None:
+                record["fill_price"] = float(order.filled_avg_price)
+            # The ledger holds what actually filled, at the price it filled at
+            record["booked_qty"], record["booked_notional"] = self.trader.book_fill(
+                record["symbol"], order,
+                record.get("booked_qty", 0.0), record.get("booked_notional", 0.0),
+            )
+        status = record["status"]
+        if status == "filled" and "filled_at" not in record:
+            # The broker's fill time, not when a (backed-off) poll noticed it
+            filled_at = _epoch(order.filled_at) if order is not None else None
+            record["filled_at"] = self.clock() if filled_at is None else filled_at
+            self._record_fill(record)
+        elif status in TERMINAL_STATUSES and status != "filled":
+            # Let the broker confirm what a partly filled order left behind
+            self.trader.ledger.stale = True
+        for phase, (start, end) in LATENCY_PHASES.items():
+            if start in record and end in record and phase + "_ms" not in record:
+                milliseconds = (record[end] - record[start]) * 1000
+                record[phase + "_ms"] = milliseconds
+                ORDER_LATENCY.observe(milliseconds / 1000, phase=phase)
+        self._save(record)
+        if status in TERMINAL_STATUSES or status == "failed":
+            logger.info(
+                f"Orders: {record['client_order_id']} {status}",
+                extra={"fields": {"order": record}},
+            )
+
+    def _record_fill(self, record: dict):
+        fill = record.get("fill_price")
+        if fill is None:
+            return
+        expected = record["expected_price"]
+        if expected:
+            record["slippage_bps"] = slippage_bps(record["side"], expected, fill)
+            ORDER_SLIPPAGE_BPS.observe(record["slippage_bps"])
+        for callback in self.on_fill:
+            try:
+                callback(record)
+            except Exception as e:
+                logger.error(f"Orders: on_fill callback failed: {e}")
+
+    def resume(self) -> int:
+        """Restarts polling for orders left open by a previous run."""
+        pending = [
+            record for record in self.recent(limit=None)
+            if record["status"] not in TERMINAL_STATUSES and record.get("id")
+        ]
+        for record in pending:
+            self._track(record)
+        if pending:
+            logger.info(f"Orders: Resumed tracking {len(pending)} open order(s).")
+        return len(pending)
+
+    def get(self, client_order_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._orders.get(client_order_id)
+
+    def recent(self, limit: Optional[int] = 50, symbol: Optional[str] = None) -> List[dict]:
+        """Tracked orders, newest first."""
+        with self._lock:
+            records = [
+                record for record in self._orders.values()
+                if symbol is None or record["symbol"] == symbol
+            ]
+        records.sort(key=lambda record: record["submitted_at"], reverse=True)
+        return records if limit is None else records[:limit]
+
+    def summary(self) -> dict:
+        """Counts by status plus p50/p95 slippage and latencies of fills."""
+        records = self.recent(limit=None)
+        statuses: Dict[str, int] = {}
+        for record in records:
+            statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+        summary = {"orders": len(records), "statuses": statuses, "open": len(self._tasks)}
+        for field in ["slippage_bps"] + [phase + "_ms" for phase in LATENCY_PHASES]:
+            values = [record[field] for record in records if field in record]
+            if values:
+                p50, p95 = np.percentile(values, [50, 95])
+                summary[field] = {"count": len(values), "p50": float(p50), "p95": float(p95)}
+        return summary
+
+    async def aclose(self):
+        """Stops polling and closes the database; open orders resume next run."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._pending.put(None)
+        await asyncio.to_thread(self._writer.join)
+        self._db.close()
@@ -0,0 +1,123 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+# Ordered by priority: columns at the end are dropped first when a prompt
+# goes over its token budget. "close" matches the ticker-suffixed column.
+DEFAULT_PROMPT_INDICATORS = [
+    "close",
+    "RSI_14",
+    "MACDh_12_26_9",
+    "ADX_14",
+    "STOCHk_14_3_3",
+    "BBP_5_2.0",
+    "CCI_14_0.015",
+    "EMA_20",
+    "EMA_50",
+    "EMA_200",
+    "ATRr_14",
+    "DMP_14",
+    "DMN_14",
+    "MACD_12_26_9",
+    "MACDs_12_26_9",
+    "STOCHd_14_3_3",
+    "SMA_200",
+    "OBV",
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for budgeting."""
+    return math.ceil(len(text) / 4)
+
+
+def format_value(value: float, significant_digits: int = 5) -> str:
+    """
+    Rounds a value to ``significant_digits`` without scientific notation,
+    e.g. 30123.456 -> "30123", 54.32187 -> "54.322", 0.0012345 -> "0.0012345".
+    """
+    if value == 0:
+        return "0"
+    integer_digits = math.floor(math.log10(abs(value))) + 1
+    decimals = max(0, significant_digits - integer_digits)
+    text = f"{value:.{decimals}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return text
+
+
+class PromptBuilder:
+    """
+    Builds compact indicator tables for the DeepSeek prompts.
+
+    Only the configured indicators are included, values are rounded to a
+    fixed number of significant digits, NaNs are dropped and the result is
+    encoded as CSV (a header row plus one row per symbol). Columns are
+    dropped from the end of the priority list until the table fits in
+    ``token_budget``.
+    """
+
+    def __init__(
+        self,
+        indicators: Optional[List[str]] = None,
+        significant_digits: int = 5,
+        token_budget: int = 400,
+    ):
+        self.indicators = indicators or DEFAULT_PROMPT_INDICATORS
+        self.significant_digits = significant_digits
+        self.token_budget = token_budget
+
+    def select(self, indicators: dict) -> Dict[str, float]:
+        """Picks the configured indicators, skipping missing and NaN values."""
+        selected = {}
+        for name in self.indicators:
+            value = indicators.get(name)
+            if value is None:
+                value = next(
+                    (v for k, v in indicators.items()
+                     if str(k).lower().startswith(f"{name.lower()}_")),
+                    None,
+                )
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            if math.isnan(value) or math.isinf(value):
+                continue
+            selected[name] = value
+        return selected
+
+    def table(self, indicators_by_symbol: Dict[Optional[str], dict]) -> Tuple[str, int]:
+        """
+        Encodes indicators as a CSV table that fits the token budget.
+
+        Args:
+            indicators_by_symbol (Dict[Optional[str], dict]): Indicators per
+                symbol; use a single ``None`` key for a symbol-less table.
+
+        Returns:
+            Tuple[str, int]: The table and its estimated token count.
+        """
+        rows = {
+            symbol: self.select(indicators)
+            for symbol, indicators in indicators_by_symbol.items()
+        }
+        columns = [
+            name for name in self.indicators
+            if any(name in row for row in rows.values())
+        ]
+        with_symbol = any(symbol is not None for symbol in rows)
+
+        while True:
+            header = (["symbol"] if with_symbol else []) + columns
+            lines = [",".join(header)]
+            for symbol, row in rows.items():
+                cells = [symbol] if with_symbol else []
+                cells += [
+                    format_value(row[name], self.significant_digits)
+                    if name in row else ""
+                    for name in columns
+                ]
+                lines.append(",".join(cells))
+            text = "\n".join(lines)
+            tokens = estimate_tokens(text)
+            if tokens <= self.token_budget or len(columns) <= 1:
+                return text, tokens
+            columns = columns[:-1]
@@ -0,0 +1,227 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.metrics import (
+    RATE_LIMIT_IN_FLIGHT,
+    RATE_LIMIT_QUEUE_DEPTH,
+    RATE_LIMIT_RETRIES,
+    RATE_LIMIT_WAIT_SECONDS,
+)
+from app.utils import logger
+
+# Lower runs first: order submission beats reads, which beat status polling
+HIGH, NORMAL, LOW = 0, 1, 2
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return max(0.0, float(response.headers["Retry-After"]))
+    except (KeyError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Async request scheduler for one provider.
+
+    Requests wait in a priority queue for a token from a bucket refilled at
+    ``rate`` per second (up to ``burst``) and for one of ``max_concurrency``
+    slots, so throughput stays at the provider's ceiling instead of
+    bouncing off it. ``request`` retries 429 and 5xx responses with full
+    jitter exponential backoff, honouring ``Retry-After``; a 429 also
+    pauses the whole limiter so queued requests do not pile onto it.
+
+    ``rate`` or ``max_concurrency`` of None means unlimited.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.5,
+        max_backoff_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep,
+        jitter: Callable[[], float] = random.random,
+    ):
+        self.provider = provider
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate or 1.0)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.clock = clock
+        self.sleep = sleep
+        self.jitter = jitter
+        self.tokens = self.burst
+        self.in_flight = 0
+        self.retries = 0
+        self._refilled = clock()
+        self._paused_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self, now: float):
+        if self.rate is not None:
+            self.tokens = min(self.burst, self.tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _wait_seconds(self, now: float) -> float:
+        wait = self._paused_until - now
+        if self.rate is not None and self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def _dispatch(self):
+        """Grants slots to queued requests in priority order while allowed."""
+        self._timer = None
+        while self._waiters:
+            if self.max_concurrency is not None and self.in_flight >= self.max_concurrency:
+                break  # ``release`` dispatches again
+            future = self._waiters[0][2]
+            if future.done():  # Cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            now = self.clock()
+            self._refill(now)
+            wait = self._wait_seconds(now)
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                break
+            heapq.heappop(self._waiters)
+            if self.rate is not None:
+                self.tokens -= 1
+            self.in_flight += 1
+            future.set_result(None)
+        RATE_LIMIT_QUEUE_DEPTH.set(self.queued, provider=self.provider)
+        RATE_LIMIT_IN_FLIGHT.set(self.in_flight, provider=self.provider)
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    async def acquire(self, priority: int = NORMAL):
+        """Waits for a token and a concurrency slot; pair with ``release``."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        if self._timer is None or self._timer.cancelled():
+            self._dispatch()
+        started = self.clock()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # Granted just as the caller gave up
+            raise
+        RATE_LIMIT_WAIT_SECONDS.observe(self.clock() - started, provider=self.provider)
+
+    def release(self):
+        self.in_flight -= 1
+        if self._timer is None:
+            self._dispatch()
+        else:
+            RATE_LIMIT_IN_FLIGHT.set(self.in_flight, provider=self.provider)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = NORMAL) -> AsyncIterator[None]:
+        """Holds a slot for the ``async with`` block, e.g. a streamed response."""
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def retry_delay(self, attempt: int, response: httpx.Response,
+                    retry_server_errors: bool = True) -> Optional[float]:
+        """
+        Seconds to wait before retrying ``response``, or None if it should
+        be returned as is (success, other errors, or out of retries).
+
+        A 429 means the request was not processed, so it is always safe to
+        retry; a 5xx is only retried if ``retry_server_errors``.
+        """
+        status = response.status_code
+        retryable = status == 429 or (retry_server_errors and status >= 500)
+        if not retryable or attempt >= self.max_retries:
+            return None
+        ceiling = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt)
+        delay = self.jitter() * ceiling
+        retry_after = _retry_after(response)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if status == 429:
+            # Everyone backs off, not just this request
+            self._paused_until = max(self._paused_until, self.clock() + delay)
+            self.tokens = min(self.tokens, 0.0)
+        self.retries += 1
+        RATE_LIMIT_RETRIES.inc(provider=self.provider, status=str(status))
+        logger.warning(
+            f"{self.provider}: HTTP {status}; retry {attempt + 1}/{self.max_retries} "
+            f"in {delay:.2f}s"
+        )
+        return delay
+
+    async def request(self, send: Callable[[], Awaitable[httpx.Response]],
+                      priority: int = NORMAL,
+                      retry_server_errors: bool = True) -> httpx.Response:
+        """
+        Sends ``send()`` under the limiter, retrying 429 and 5xx responses.
+
+        Pass ``retry_server_errors=False`` for requests that are not
+        idempotent: a 5xx may come after the request took effect.
+        Network errors are raised as usual; the last response is returned
+        once retries run out, for the caller's ``raise_for_status``.
+        """
+        attempt = 0
+        while True:
+            async with self.slot(priority):
+                response = await send()
+            delay = self.retry_delay(attempt, response, retry_server_errors)
+            if delay is None:
+                return response
+            attempt += 1
+            await self.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "max_concurrency": self.max_concurrency,
+            "tokens": self.tokens,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "retries": self.retries,
+        }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+
+
+def get_limiter(provider: str) -> RateLimiter:
+    """The shared limiter of ``provider``; unlimited until configured."""
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        limiter = _limiters[provider] = RateLimiter(provider)
+    return limiter
+
+
+def configure_limiter(provider: str, **options) -> RateLimiter:
+    """Replaces the shared limiter of ``provider`` (see ``RateLimiter``)."""
+    limiter = _limiters[provider] = RateLimiter(provider, **options)
+    return limiter
+
+
+def limiter_stats() -> Dict[str, dict]:
+    return {provider: limiter.stats() for provider, limiter in _limiters.items()}
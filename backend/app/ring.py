@@ -0,0 +1,116 @@
+from typing import Dict, Iterable, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+class RingBuffer:
+    """
+    Fixed-capacity columnar buffer of timestamped rows.
+
+    Storage is allocated once: an int64 timestamp array plus a
+    ``(columns, capacity)`` block of ``dtype`` values. A ``mirrored``
+    buffer writes every row twice, ``capacity`` apart, so the newest ``n``
+    rows are always one contiguous slice and ``times``, ``column`` and
+    ``window`` return read-only views instead of copies, at twice the
+    memory. Without mirroring, reads that wrap around the end of the
+    storage return copies. The footprint is ``nbytes`` =
+    ``copies * capacity * (8 + itemsize * columns)`` and only changes when
+    a new column is first seen.
+
+    Views alias the storage: a view of the newest ``n`` rows is
+    overwritten, oldest row first, after ``capacity - n`` more appends (a
+    full window by the very next one). Copy anything held across appends.
+    """
+
+    def __init__(self, capacity: int, columns: Iterable[str] = (), dtype="float64",
+                 mirrored: bool = True):
+        if capacity < 1:
+            raise ValueError(f"RingBuffer capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self.mirrored = mirrored
+        self._offsets = (0, capacity) if mirrored else (0,)
+        self.columns: Dict[str, int] = {}
+        self._times = np.zeros(len(self._offsets) * capacity, dtype=np.int64)
+        self._values = np.full((0, len(self._times)), np.nan, dtype=self.dtype)
+        self._next = 0
+        self.size = 0
+        self.add_columns(columns)
+
+    @property
+    def nbytes(self) -> int:
+        return self._times.nbytes + self._values.nbytes
+
+    def add_columns(self, names: Iterable[str]):
+        """Adds columns (NaN for existing rows); known names are ignored."""
+        new = [name for name in names if name not in self.columns]
+        if not new:
+            return
+        added = np.full((len(new), len(self._times)), np.nan, dtype=self.dtype)
+        self._values = np.concatenate([self._values, added])
+        for name in new:
+            self.columns[name] = len(self.columns)
+
+    def append(self, timestamp: int, values: Mapping[str, float]):
+        """Appends one row; missing columns are NaN, new ones are added."""
+        if len(values) > len(self.columns) or any(name not in self.columns for name in values):
+            self.add_columns(values)
+        row = [values.get(name, np.nan) for name in self.columns]
+        for offset in self._offsets:
+            self._times[self._next + offset] = timestamp
+            self._values[:, self._next + offset] = row
+        self._next = (self._next + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def extend(self, timestamps: np.ndarray, values: Mapping[str, np.ndarray]):
+        """Appends many rows at once; only the newest ``capacity`` are kept."""
+        count = min(len(timestamps), self.capacity)
+        if count == 0:
+            return
+        self.add_columns(values)
+        positions = (self._next + np.arange(count)) % self.capacity
+        for offset in self._offsets:
+            self._times[positions + offset] = timestamps[-count:]
+            for name, index in self.columns.items():
+                column = values.get(name)
+                self._values[index, positions + offset] = (
+                    column[-count:] if column is not None else np.nan
+                )
+        self._next = (self._next + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+
+    def _slice(self, last: Optional[int]) -> Union[slice, np.ndarray]:
+        """The newest rows as a slice, or positions if they wrap (unmirrored)."""
+        count = self.size if last is None else max(0, min(last, self.size))
+        end = self._next + self.capacity if self.mirrored else self._next or self.capacity
+        if count <= end:
+            return slice(end - count, end)
+        return np.arange(end - count, end) % self.capacity
+
+    def times(self, last: Optional[int] = None) -> np.ndarray:
+        """Timestamps of the newest ``last`` rows (all if None), oldest first."""
+        return _readonly(self._times[self._slice(last)])
+
+    def column(self, name: str, last: Optional[int] = None) -> np.ndarray:
+        """One column of the newest rows; empty if the column is unknown."""
+        index = self.columns.get(name)
+        if index is None:
+            return np.empty(0, dtype=self.dtype)
+        return _readonly(self._values[index, self._slice(last)])
+
+    def window(self, last: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Timestamps and ``(columns, rows)`` values of the newest rows."""
+        window = self._slice(last)
+        return _readonly(self._times[window]), _readonly(self._values[:, window])
+
+    def latest(self) -> Dict[str, float]:
+        """The newest row as a dict, or {} if the buffer is empty."""
+        if self.size == 0:
+            return {}
+        position = (self._next - 1) % self.capacity
+        return {name: self._values[index, position].item() for name, index in self.columns.items()}
@@ -0,0 +1,260 @@
+import math
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+SIGNALS = ("buy", "sell", "hold")
+
+
+def _column(columns: Mapping[str, Sequence[float]], name: str, n: int) -> np.ndarray:
+    """
+    Looks up an indicator column; ``close`` also matches the
+    ticker-suffixed ``close_<ticker>``. Missing columns are all NaN.
+    """
+    values = columns.get(name)
+    if values is None:
+        prefix = f"{name.lower()}_"
+        values = next(
+            (v for k, v in columns.items() if str(k).lower().startswith(prefix)), None
+        )
+    if values is None:
+        return np.full(n, np.nan)
+    return np.asarray(values, dtype=float)
+
+
+class RuleState:
+    """What the stateful rules remember about the last approved signal."""
+
+    def __init__(
+        self,
+        last_signal: Optional[str] = None,
+        last_values: Optional[Dict[str, float]] = None,
+        last_trade_time: Optional[float] = None,
+    ):
+        self.last_signal = last_signal
+        self.last_values = last_values or {}
+        self.last_trade_time = last_trade_time
+
+
+class Rule:
+    """
+    A declarative thinker rule.
+
+    Stateless rules (``stateful = False``) only look at the current tick
+    and implement ``mask``, which must work on whole arrays. Stateful rules
+    compare against the last approved signal and implement ``check``, which
+    is called per candidate tick in order. The base implementations block
+    nothing, so a rule only overrides the one it uses.
+    """
+
+    stateful = False
+    reason = ""
+    indicators: Tuple[str, ...] = ()
+
+    def mask(self, signals: np.ndarray, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """True where the rule blocks the tick."""
+        return np.zeros(len(signals), dtype=bool)
+
+    def check(self, signal: str, rows: Dict[str, list], i: int, time: float,
+              state: RuleState) -> Optional[str]:
+        """Why the rule blocks tick ``i``, or None to let it through."""
+        return None
+
+
+class DuplicateSignal(Rule):
+    """Skips a buy or sell identical to the last approved signal."""
+
+    stateful = True
+
+    def check(self, signal, rows, i, time, state):
+        if signal == state.last_signal and signal != "hold":
+            return "duplicate consecutive signal"
+        return None
+
+
+class IndicatorDelta(Rule):
+    """Skips ticks whose indicator moved less than ``min_change`` since the last approval."""
+
+    stateful = True
+
+    def __init__(self, indicator: str = "RSI_14", min_change: float = 0.5):
+        self.indicator = indicator
+        self.min_change = min_change
+        self.indicators = (indicator,)
+
+    def check(self, signal, rows, i, time, state):
+        current = rows[self.indicator][i]
+        last = state.last_values.get(self.indicator)
+        if last is None or math.isnan(current) or math.isnan(last):
+            return None
+        change = abs(current - last)
+        if change < self.min_change:
+            return (
+                f"{self.indicator} change ({change:.2f}) below threshold "
+                f"({self.min_change})"
+            )
+        return None
+
+
+class Cooldown(Rule):
+    """Skips a buy or sell within ``seconds`` of the last approved buy or sell."""
+
+    stateful = True
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def check(self, signal, rows, i, time, state):
+        if signal == "hold" or state.last_trade_time is None or math.isnan(time):
+            return None
+        elapsed = time - state.last_trade_time
+        if elapsed < self.seconds:
+            return f"cooldown ({elapsed:.0f}s of {self.seconds:.0f}s)"
+        return None
+
+
+class VolatilityGate(Rule):
+    """
+    Skips buys and sells while ``indicator`` (divided by ``relative_to``
+    if given, e.g. ATR as a fraction of the close) is outside
+    [``min_value``, ``max_value``]. Ticks where it is NaN pass.
+    """
+
+    def __init__(self, indicator: str = "ATRr_14", relative_to: Optional[str] = "close",
+                 max_value: Optional[float] = None, min_value: Optional[float] = None):
+        self.indicator = indicator
+        self.relative_to = relative_to
+        self.max_value = max_value
+        self.min_value = min_value
+        self.indicators = (indicator,) + ((relative_to,) if relative_to else ())
+        self.reason = f"{indicator} volatility gate"
+
+    def mask(self, signals, columns):
+        value = columns[self.indicator]
+        if self.relative_to:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                value = value / columns[self.relative_to]
+        blocked = np.zeros(len(value), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            if self.max_value is not None:
+                blocked |= value > self.max_value
+            if self.min_value is not None:
+                blocked |= value < self.min_value
+        return blocked & (signals != "hold")
+
+
+class ThinkerRules:
+    """
+    A rule set compiled into one evaluator.
+
+    Stateless gates are applied to all ticks at once with NumPy; only the
+    ticks that pass them go through the stateful rules, in order, each
+    approval becoming the new last approved signal. A single live tick is
+    evaluated as a batch of one, so live and backtest decisions are made by
+    the same code.
+    """
+
+    def __init__(self, rules: Sequence[Rule]):
+        self.rules = list(rules)
+        self.stateless = [rule for rule in self.rules if not rule.stateful]
+        self.stateful = [rule for rule in self.rules if rule.stateful]
+        self.indicators = sorted({name for rule in self.rules for name in rule.indicators})
+        self.tracked = sorted({
+            rule.indicator for rule in self.stateful if isinstance(rule, IndicatorDelta)
+        })
+
+    def evaluate_batch(
+        self,
+        signals: Sequence[Optional[str]],
+        columns: Mapping[str, Sequence[float]],
+        times: Optional[Sequence[float]] = None,
+        state: Optional[RuleState] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, RuleState]:
+        """
+        Evaluates a sequence of ticks.
+
+        Args:
+            signals (Sequence[Optional[str]]): Proposed signal per tick;
+                anything but buy/sell/hold is never approved.
+            columns (Mapping[str, Sequence[float]]): Indicator arrays.
+            times (Optional[Sequence[float]]): Tick times in seconds.
+            state (Optional[RuleState]): State before the first tick.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, RuleState]: Approval per tick, the
+            reason per blocked tick (None if approved), and the state after
+            the last tick.
+        """
+        signals = np.asarray(signals, dtype=object)
+        n = len(signals)
+        arrays = {name: _column(columns, name, n) for name in self.indicators}
+        times = np.full(n, np.nan) if times is None else np.asarray(times, dtype=float)
+        state = RuleState(
+            state.last_signal, dict(state.last_values), state.last_trade_time
+        ) if state is not None else RuleState()
+
+        reasons = np.full(n, None, dtype=object)
+        open_ = np.isin(signals, SIGNALS)
+        reasons[~open_] = "invalid signal"
+        for rule in self.stateless:
+            blocked = open_ & rule.mask(signals, arrays)
+            reasons[blocked] = rule.reason
+            open_ &= ~blocked
+
+        # Python lists index much faster than NumPy scalars in the scan below.
+        rows = {name: arrays[name].tolist() for name in self.indicators}
+        time_list = times.tolist()
+        approved = np.zeros(n, dtype=bool)
+        for i in np.flatnonzero(open_).tolist():
+            signal = signals[i]
+            for rule in self.stateful:
+                reason = rule.check(signal, rows, i, time_list[i], state)
+                if reason is not None:
+                    reasons[i] = reason
+                    break
+            else:
+                approved[i] = True
+                state.last_signal = signal
+                state.last_values = {name: rows[name][i] for name in self.tracked}
+                if signal != "hold":
+                    state.last_trade_time = time_list[i]
+        return approved, reasons, state
+
+    def evaluate(self, signal: str, indicators: Mapping[str, float],
+                 time: Optional[float] = None,
+                 state: Optional[RuleState] = None) -> Optional[str]:
+        """Why a single live tick is blocked, or None if it is approved."""
+        columns = {
+            name: [value] for name, value in indicators.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+        _, reasons, _ = self.evaluate_batch(
+            [signal], columns, [math.nan if time is None else time], state
+        )
+        return reasons[0]
+
+
+def default_rules(
+    min_rsi_change: Optional[float] = 0.5,
+    cooldown_seconds: float = 0.0,
+    max_volatility: Optional[float] = None,
+) -> ThinkerRules:
+    """
+    The standard thinker rule set.
+
+    Args:
+        min_rsi_change (Optional[float]): Minimum RSI_14 move since the last
+                                          approval; None disables the rule.
+        cooldown_seconds (float): Minimum time between approved buys/sells.
+        max_volatility (Optional[float]): Maximum ATRr_14 / close for buys
+                                          and sells; None disables the gate.
+    """
+    rules: List[Rule] = []
+    if max_volatility is not None:
+        rules.append(VolatilityGate("ATRr_14", relative_to="close", max_value=max_volatility))
+    rules.append(DuplicateSignal())
+    if min_rsi_change is not None:
+        rules.append(IndicatorDelta("RSI_14", min_rsi_change))
+    if cooldown_seconds:
+        rules.append(Cooldown(cooldown_seconds))
+    return ThinkerRules(rules)
@@ -0,0 +1,154 @@
+import asyncio
+import math
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from app.metrics import STAGE_ERRORS, TICK_OVERRUNS, TICK_SECONDS, TICKS_SKIPPED
+from app.utils import logger
+
+
+class TickScheduler:
+    """
+    Wakes the trading loop at bar boundaries and tracks tick deadlines.
+
+    Ticks are scheduled on absolute multiples of ``interval_seconds`` (plus
+    ``offset_seconds`` for the data provider to publish the closed bar), so
+    time spent fetching, calling the LLM or trading never accumulates into
+    drift. Boundaries missed while a tick overran are skipped and counted
+    rather than run back to back.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: float,
+        offset_seconds: float = 0.0,
+        deadline_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], Awaitable] = asyncio.sleep,
+    ):
+        self.interval_seconds = interval_seconds
+        self.offset_seconds = offset_seconds
+        self.deadline_seconds = deadline_seconds or interval_seconds
+        self.clock = clock
+        self.sleep = sleep
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.last_duration: Optional[float] = None
+        self.max_duration: Optional[float] = None
+        self.last_wake_lag: Optional[float] = None
+        self._last_tick: Optional[float] = None
+
+    def next_tick(self, now: Optional[float] = None) -> float:
+        """The first bar boundary (plus offset) strictly after ``now``."""
+        now = self.clock() if now is None else now
+        boundary = math.floor((now - self.offset_seconds) / self.interval_seconds) + 1
+        return boundary * self.interval_seconds + self.offset_seconds
+
+    async def wait_for_tick(self) -> float:
+        """Sleeps until the next boundary and returns its scheduled time."""
+        tick = self.next_tick()
+        if self._last_tick is not None:
+            missed = round((tick - self._last_tick) / self.interval_seconds) - 1
+            if missed > 0:
+                self.skipped += missed
+                TICKS_SKIPPED.inc(missed)
+                logger.warning(f"Scheduler: Skipped {missed} tick(s) after an overrun.")
+        while (remaining := tick - self.clock()) > 0:
+            await self.sleep(remaining)
+        self.last_wake_lag = self.clock() - tick
+        self._last_tick = tick
+        return tick
+
+    def deadline(self, tick: float) -> float:
+        return tick + self.deadline_seconds
+
+    def finish(self, tick: float, started: float):
+        """Records a finished tick and reports it if it missed its deadline."""
+        finished = self.clock()
+        duration = finished - started
+        self.ticks += 1
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration or 0.0, duration)
+        TICK_SECONDS.observe(duration)
+        if finished > self.deadline(tick):
+            self.overruns += 1
+            TICK_OVERRUNS.inc()
+            logger.warning(
+                f"Scheduler: Tick overran its deadline by "
+                f"{finished - self.deadline(tick):.2f}s (took {duration:.2f}s)."
+            )
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "deadline_seconds": self.deadline_seconds,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "last_duration": self.last_duration,
+            "max_duration": self.max_duration,
+            "last_wake_lag": self.last_wake_lag,
+        }
+
+
+async def run_pipelined(
+    scheduler: TickScheduler,
+    fetch: Callable[[float], Awaitable[Any]],
+    process: Callable[[float, Any], Awaitable[None]],
+    run_immediately: bool = True,
+):
+    """
+    Runs fetch and process as two pipelined stages driven by ``scheduler``.
+
+    The fetch stage wakes at every boundary and hands its data to the
+    process stage through a one-slot buffer, so the next tick's data is
+    downloaded while the current tick is still waiting on the LLM. If the
+    process stage is still busy when newer data arrives, the stale tick is
+    dropped in favour of the newest one. Errors in either stage are logged
+    and the stage waits for the next boundary instead of retrying.
+
+    Args:
+        scheduler (TickScheduler): Provides tick times and deadlines.
+        fetch (Callable): ``await fetch(tick)`` returns the tick's data.
+        process (Callable): ``await process(tick, data)`` handles it.
+        run_immediately (bool): Run a first tick at start-up instead of
+                                waiting for the first boundary.
+    """
+    ready: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    async def fetch_stage():
+        tick = scheduler.clock() if run_immediately else await scheduler.wait_for_tick()
+        while True:
+            try:
+                data = await fetch(tick)
+            except Exception as e:
+                logger.error(f"An error occurred while fetching data: {e}")
+                STAGE_ERRORS.inc(stage="fetch")
+            else:
+                if ready.full():
+                    ready.get_nowait()
+                    scheduler.skipped += 1
+                    TICKS_SKIPPED.inc()
+                    logger.warning("Scheduler: Dropped a stale tick; processing is behind.")
+                ready.put_nowait((tick, data))
+            tick = await scheduler.wait_for_tick()
+
+    async def process_stage():
+        while True:
+            tick, data = await ready.get()
+            started = scheduler.clock()
+            try:
+                await process(tick, data)
+            except Exception as e:
+                logger.error(f"An error occurred in the main loop: {e}")
+                STAGE_ERRORS.inc(stage="process")
+            scheduler.finish(tick, started)
+
+    stages = [asyncio.create_task(fetch_stage()), asyncio.create_task(process_stage())]
+    try:
+        await asyncio.gather(*stages)
+    finally:
+        for stage in stages:
+            stage.cancel()
+        await asyncio.gather(*stages, return_exceptions=True)
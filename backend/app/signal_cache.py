@@ -0,0 +1,203 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar, Union
+
+from app.analyzer import get_trading_signal, get_trading_signals
+from app.metrics import STAGE_SECONDS
+from app.models import DeepSeekErrorResponse
+from app.prompt import DEFAULT_PROMPT_INDICATORS, PromptBuilder
+from app.utils import logger
+
+
+T = TypeVar("T")
+
+
+async def _timed_llm(call: Awaitable[T]) -> T:
+    # Only real DeepSeek calls count towards the "llm" stage, not cache hits
+    with STAGE_SECONDS.time(stage="llm"):
+        return await call
+
+
+def _relative_bucket(value: float, width: float) -> Tuple[int, int]:
+    """Sign and log-scale bucket of ``value``: buckets are ``width`` (relative) wide."""
+    if value == 0:
+        return 0, 0
+    return (1 if value > 0 else -1), math.floor(math.log(abs(value)) / math.log1p(width))
+
+
+class SignalCache:
+    """
+    LRU cache with a TTL for trading signals, keyed on quantized indicators.
+
+    The key is the symbol plus every indicator the prompt uses
+    (``indicators``, the prompt's list by default) and every one listed in
+    ``buckets``. A value with a bucket is quantized as
+    ``floor(value / bucket)``; any other value by its sign and a log-scale
+    bucket ``relative_bucket`` wide (0.002 = 0.2%), so a price move or a
+    MACD cross changes the key while indicator vectors that barely moved
+    map to the same key and reuse its signal. Missing, NaN and infinite
+    values are all keyed as None. Symbols never share entries, even with
+    identical indicators. Only successful signals are cached, never error
+    responses.
+    """
+
+    def __init__(
+        self,
+        buckets: Dict[str, float],
+        max_size: int = 1024,
+        ttl_seconds: float = 900,
+        clock: Callable[[], float] = time.monotonic,
+        indicators: Optional[List[str]] = None,
+        relative_bucket: float = 0.002,
+    ):
+        self.buckets = buckets
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.relative_bucket = relative_bucket
+        names = DEFAULT_PROMPT_INDICATORS if indicators is None else indicators
+        # Same lookup (ticker-suffixed "close", finite values only) as the prompt
+        self._selector = PromptBuilder(list(dict.fromkeys([*names, *sorted(buckets)])))
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, Tuple[str, float]]" = OrderedDict()
+
+    def key(self, indicators: dict, symbol: Optional[str] = None) -> Tuple:
+        """Quantizes the prompt's and the bucketed indicators into a hashable key."""
+        selected = self._selector.select(indicators)
+        key = [symbol]
+        for name in sorted(self._selector.indicators):
+            value = selected.get(name)
+            if value is None:
+                key.append((name, None))
+            elif name in self.buckets:
+                key.append((name, math.floor(value / self.buckets[name])))
+            else:
+                key.append((name, _relative_bucket(value, self.relative_bucket)))
+        return tuple(key)
+
+    def get(self, indicators: dict, symbol: Optional[str] = None) -> Optional[str]:
+        """Returns the cached signal for the symbol's indicators, or None."""
+        key = self.key(indicators, symbol)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > self.clock():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, indicators: dict, signal: str, symbol: Optional[str] = None):
+        """Stores a signal, evicting the least recently used entry if full."""
+        key = self.key(indicators, symbol)
+        self._entries[key] = (signal, self.clock() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "buckets": self.buckets,
+        }
+
+
+async def get_cached_trading_signal(
+    indicators: dict,
+    api_key: str,
+    cache: Optional[SignalCache],
+    stream: bool = False,
+    symbol: Optional[str] = None,
+) -> Union[str, DeepSeekErrorResponse]:
+    """
+    ``get_trading_signal`` with a ``SignalCache`` in front of it.
+
+    Args:
+        indicators (dict): A dictionary of technical indicators.
+        api_key (str): Your DeepSeek API key.
+        cache (Optional[SignalCache]): The cache to consult; calls straight
+                                       through if None.
+        stream (bool): Stream the DeepSeek reply on a cache miss.
+        symbol (Optional[str]): The symbol the indicators belong to; part
+                                of the cache key.
+
+    Returns:
+        Union[str, DeepSeekErrorResponse]: The trading signal ("buy", "sell",
+                                          "hold") or an error response.
+    """
+    if cache is None:
+        return await _timed_llm(get_trading_signal(
+            indicators=indicators, api_key=api_key, stream=stream
+        ))
+
+    signal = cache.get(indicators, symbol)
+    if signal is not None:
+        logger.debug("SignalCache: Hit, reusing signal '%s'.", signal)
+        return signal
+
+    signal = await _timed_llm(get_trading_signal(
+        indicators=indicators, api_key=api_key, stream=stream
+    ))
+    if isinstance(signal, str):
+        cache.put(indicators, signal, symbol)
+    return signal
+
+
+async def get_cached_trading_signals(
+    indicators_by_symbol: Dict[str, dict],
+    api_key: str,
+    cache: Optional[SignalCache],
+    batch_size: int = 10,
+    stream: bool = False,
+) -> Dict[str, Union[str, DeepSeekErrorResponse]]:
+    """
+    Batched ``get_cached_trading_signal`` for several symbols.
+
+    Symbols that hit the cache are answered locally; the rest are sent to
+    ``get_trading_signals`` in concurrent batches of ``batch_size``.
+
+    Args:
+        indicators_by_symbol (Dict[str, dict]): Indicators keyed by symbol.
+        api_key (str): Your DeepSeek API key.
+        cache (Optional[SignalCache]): The cache to consult, if any.
+        batch_size (int): Maximum symbols per DeepSeek request.
+        stream (bool): Stream any per-symbol fallback calls.
+
+    Returns:
+        Dict[str, Union[str, DeepSeekErrorResponse]]: Signal or error
+                                                      response per symbol.
+    """
+    results: Dict[str, Union[str, DeepSeekErrorResponse]] = {}
+    misses = {}
+    for symbol, indicators in indicators_by_symbol.items():
+        signal = cache.get(indicators, symbol) if cache is not None else None
+        if signal is not None:
+            logger.debug("SignalCache: Hit for %s, reusing signal '%s'.", symbol, signal)
+            results[symbol] = signal
+        else:
+            misses[symbol] = indicators
+
+    symbols = list(misses)
+    batches = [
+        {symbol: misses[symbol] for symbol in symbols[i:i + batch_size]}
+        for i in range(0, len(symbols), batch_size)
+    ]
+    for batch in await asyncio.gather(*(
+        _timed_llm(get_trading_signals(batch, api_key=api_key, stream=stream))
+        for batch in batches
+    )):
+        for symbol, signal in batch.items():
+            if cache is not None and isinstance(signal, str):
+                cache.put(misses[symbol], signal, symbol)
+            results[symbol] = signal
+    return {symbol: results[symbol] for symbol in indicators_by_symbol}
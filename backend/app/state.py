@@ -1,46 +1,215 @@
 import json
-from typing import Optional, Tuple
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
 
 from app.utils import logger
 
-STATE_FILE = "state.json"
+STATE_DB = "state.db"
+STATE_FILE = "state.json"  # Legacy snapshot, imported once into the journal
+COMPACT_EVERY = 1000  # Journal rows written between compactions
 
 
-def load_state() -> Tuple[Optional[str], Optional[dict]]:
+class StateStore:
     """
-    Loads the last executed signal and indicators from the state file.
+    In-memory bot state persisted through an append-only SQLite journal.
+
+    Reads are served from memory and ``put`` only updates memory and queues
+    the row, so callers on the event loop never wait on the disk. A writer
+    thread appends queued rows in one transaction per batch (WAL mode, so a
+    write never rewrites the whole state and a crash leaves either the old
+    or the new rows, never a torn file). On open the latest row per symbol
+    is replayed into memory; superseded rows are compacted away then and
+    every ``compact_every`` rows written.
+    """
+
+    def __init__(self, path: str = STATE_DB, legacy_file: Optional[str] = STATE_FILE,
+                 compact_every: int = COMPACT_EVERY):
+        self.path = path
+        self.compact_every = compact_every
+        self._states: Dict[Optional[str], dict] = {}
+        self._latest: Optional[str] = None
+        self._lock = threading.Lock()
+        self._pending: "queue.Queue[Optional[Tuple[Optional[str], str, float]]]" = queue.Queue()
+        self._written = 0
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Durable across process crashes; fsyncs only at WAL checkpoints.
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " symbol TEXT,"
+            " entry TEXT NOT NULL,"
+            " saved_at REAL NOT NULL)"
+        )
+        self._recover()
+        self._writer = threading.Thread(target=self._write_loop, name="state-journal", daemon=True)
+        self._writer.start()
+        if not self._states and legacy_file is not None:
+            self._import_legacy(legacy_file)
+
+    def _recover(self):
+        rows = self._db.execute(
+            "SELECT symbol, entry FROM journal WHERE seq IN"
+            " (SELECT MAX(seq) FROM journal GROUP BY symbol) ORDER BY seq"
+        ).fetchall()
+        for symbol, entry in rows:
+            self._states[symbol] = json.loads(entry)
+            self._latest = symbol
+        self._compact()
+        if rows:
+            logger.info(f"Recovered state for {len(rows)} symbol(s) from {self.path}")
+
+    def _compact(self) -> int:
+        """Deletes journal rows superseded by a later row of the same symbol."""
+        return self._db.execute(
+            "DELETE FROM journal WHERE seq NOT IN"
+            " (SELECT MAX(seq) FROM journal GROUP BY symbol)"
+        ).rowcount
+
+    def _write_loop(self):
+        while True:
+            batch = [self._pending.get()]
+            while True:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not None]
+            try:
+                if rows:
+                    self._append(rows)
+            except sqlite3.Error as e:
+                logger.error(f"State journal write failed for {len(rows)} row(s): {e}")
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+            if len(rows) < len(batch):  # ``close`` queued None
+                return
+
+    def _append(self, rows):
+        self._db.execute("BEGIN")
+        try:
+            self._db.executemany(
+                "INSERT INTO journal (symbol, entry, saved_at) VALUES (?, ?, ?)", rows,
+            )
+            self._db.execute("COMMIT")
+        except sqlite3.Error:
+            self._db.execute("ROLLBACK")
+            raise
+        before = self._written
+        self._written += len(rows)
+        if self._written // self.compact_every > before // self.compact_every:
+            deleted = self._compact()
+            logger.debug("Compacted %d superseded journal row(s)", deleted)
+
+    def _import_legacy(self, legacy_file: str):
+        try:
+            with open(legacy_file, "r") as f:
+                legacy = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        symbols = legacy.get("symbols") or {legacy.get("symbol"): legacy}
+        for symbol, entry in symbols.items():
+            self.put({key: entry.get(key) for key in (
+                "last_executed_signal", "last_indicators", "last_price", "last_updated"
+            )}, symbol)
+        logger.info(f"Imported legacy state from {legacy_file} into {self.path}")
+
+    def get(self, symbol: Optional[str] = None) -> dict:
+        """The state of ``symbol``, or the most recently saved one if None."""
+        with self._lock:
+            if symbol is None:
+                symbol = self._latest
+            return self._states.get(symbol, {})
+
+    def put(self, entry: dict, symbol: Optional[str] = None):
+        """Updates the in-memory state and queues it for the journal."""
+        row = json.dumps(entry)
+        with self._lock:
+            self._states[symbol] = entry
+            self._latest = symbol
+            self._pending.put((symbol, row, time.time()))
+
+    def flush(self):
+        """Blocks until every queued row is in the journal."""
+        self._pending.join()
+
+    def symbols(self) -> Dict[Optional[str], dict]:
+        """A snapshot of every symbol's state."""
+        with self._lock:
+            return dict(self._states)
+
+    def close(self):
+        """Writes the queued rows, stops the writer and closes the journal."""
+        self._pending.put(None)
+        self._writer.join()
+        self._db.close()
+
+
+_store: Optional[StateStore] = None
+
+
+def get_store() -> StateStore:
+    """The process-wide ``StateStore``, opened (and recovered) on first use."""
+    global _store
+    if _store is None:
+        _store = StateStore(STATE_DB, STATE_FILE if os.path.exists(STATE_FILE) else None)
+    return _store
+
+
+def close_store():
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
+
+
+def load_state(symbol: Optional[str] = None) -> Tuple[Optional[str], Optional[dict]]:
+    """
+    Loads the last executed signal and indicators from the state store.
+
+    Args:
+        symbol (Optional[str]): The symbol whose state to load. If omitted,
+                                the most recently saved state of any symbol
+                                is returned.
 
     Returns:
         Tuple[Optional[str], Optional[dict]]: A tuple containing the last
                                                executed signal and indicators.
     """
-    try:
-        with open(STATE_FILE, "r") as f:
-            state = json.load(f)
-            logger.info(f"Loaded state from {STATE_FILE}: {state}")
-            return state.get("last_executed_signal"), state.get("last_indicators")
-    except FileNotFoundError:
-        logger.info(f"{STATE_FILE} not found. Starting with a clean state.")
-        return None, None
-    except json.JSONDecodeError:
-        logger.error(f"Error decoding JSON from {STATE_FILE}. Starting fresh.")
-        return None, None
-
-
-def save_state(last_executed_signal: Optional[str], last_indicators: Optional[dict], last_price: Optional[float], last_updated: Optional[int]):
+    state = get_store().get(symbol)
+    return state.get("last_executed_signal"), state.get("last_indicators")
+
+
+def load_entry(symbol: Optional[str] = None) -> dict:
+    """The full saved state of ``symbol`` (or the most recent one), or {}."""
+    return get_store().get(symbol)
+
+
+def save_state(last_executed_signal: Optional[str], last_indicators: Optional[dict], last_price: Optional[float], last_updated: Optional[int], symbol: Optional[str] = None, last_trade_time: Optional[float] = None):
     """
-    Saves the last executed signal and indicators to the state file.
+    Saves the last executed signal and indicators to the state store.
 
     Args:
         last_executed_signal (Optional[str]): The last executed signal.
         last_indicators (Optional[dict]): The last indicators.
+        last_price (Optional[float]): The price the signal was executed at.
+        last_updated (Optional[int]): Timestamp of the bar the signal used.
+        symbol (Optional[str]): The symbol the state belongs to.
+        last_trade_time (Optional[float]): When the last buy or sell was
+                                           approved, for thinker cooldowns.
     """
-    state = {
+    entry = {
         "last_executed_signal": last_executed_signal,
         "last_indicators": last_indicators,
         "last_price": last_price,
         "last_updated": last_updated,
+        "last_trade_time": last_trade_time,
     }
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=4)
-    logger.info(f"Saved state to {STATE_FILE}: {state}")
\ No newline at end of file
+    get_store().put(entry, symbol)
+    logger.debug("Saved state for %s", symbol)
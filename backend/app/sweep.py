@@ -0,0 +1,160 @@
+import argparse
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.backtest import SignalSource, load_bars, prepare, rsi_signals, simulate
+from app.utils import logger
+
+# Summary metrics where a lower value ranks higher
+ASCENDING_METRICS = ("fills", "round_trips")
+
+
+class SharedArrays:
+    """
+    Copies NumPy arrays into shared memory blocks once so worker processes
+    can map them by name instead of receiving pickled copies per task.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.blocks = []
+        self.specs: Dict[str, Tuple[str, tuple, str]] = {}
+        for name, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            self.blocks.append(block)
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        """Releases and removes the shared memory blocks."""
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+# Per-worker views onto the shared arrays, set up by ``_attach``
+_worker_blocks: List[shared_memory.SharedMemory] = []
+_worker_arrays: Dict[str, np.ndarray] = {}
+
+
+def _attach(specs: Dict[str, Tuple[str, tuple, str]]):
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks.append(block)
+        _worker_arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def _evaluate(params: dict) -> dict:
+    columns = {name: array for name, array in _worker_arrays.items() if name != "signals"}
+    result = simulate(columns, _worker_arrays["signals"], **params)
+    return {**params, **result.summary()}
+
+
+def grid(space: Dict[str, Sequence]) -> List[dict]:
+    """Every combination of the given parameter values."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+def random_search(space: Dict[str, Tuple[float, float]], samples: int,
+                  seed: Optional[int] = None) -> List[dict]:
+    """``samples`` parameter sets drawn uniformly from (low, high) ranges."""
+    rng = random.Random(seed)
+    return [
+        {name: rng.uniform(low, high) for name, (low, high) in space.items()}
+        for _ in range(samples)
+    ]
+
+
+def run_sweep(
+    bars: pd.DataFrame,
+    signal_source: SignalSource,
+    parameter_sets: List[dict],
+    indicators: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+    metric: str = "total_return",
+    max_workers: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Backtests many thinker/sizing parameter sets in parallel and ranks them.
+
+    Indicators and signals are computed once; the resulting price, rule
+    indicator and signal arrays are placed in shared memory and every
+    worker of a process pool (one per core by default) maps them instead of
+    unpickling its own copy. Only the parameter dicts and summary dicts
+    cross process borders.
+
+    Args:
+        bars (pd.DataFrame): OHLCV bars with lower-case column names.
+        signal_source (SignalSource): Produces one signal per bar.
+        parameter_sets (List[dict]): Keyword arguments for ``simulate``,
+            e.g. from ``grid`` or ``random_search``.
+        indicators (Optional[Callable]): Vectorized indicator function;
+            defaults to ``rule_indicators``.
+        metric (str): Summary metric to rank by (best first).
+        max_workers (Optional[int]): Pool size; all cores if None.
+
+    Returns:
+        pd.DataFrame: One row per parameter set with its summary, ranked.
+    """
+    started = time.perf_counter()
+    _, columns, signal_codes = prepare(bars, signal_source, indicators)
+    shared = SharedArrays({**columns, "signals": signal_codes})
+    max_workers = max_workers or os.cpu_count() or 1
+    try:
+        with ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_attach, initargs=(shared.specs,)
+        ) as pool:
+            chunksize = max(1, len(parameter_sets) // (max_workers * 4))
+            results = list(pool.map(_evaluate, parameter_sets, chunksize=chunksize))
+    finally:
+        shared.close()
+
+    ranked = pd.DataFrame(results)
+    if not ranked.empty:
+        ranked = ranked.sort_values(
+            metric, ascending=metric in ASCENDING_METRICS, na_position="last"
+        ).reset_index(drop=True)
+    logger.info(
+        f"Sweep: {len(parameter_sets)} parameter sets on {len(signal_codes)} bars "
+        f"with {max_workers} workers in {time.perf_counter() - started:.2f}s"
+    )
+    return ranked
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep thinker and sizing parameters.")
+    parser.add_argument("bars", help="CSV or Parquet file of 1-minute OHLCV bars")
+    parser.add_argument("--thresholds", type=float, nargs="+",
+                        default=[0.0, 0.25, 0.5, 1.0, 2.0, 5.0])
+    parser.add_argument("--allocations", type=float, nargs="+",
+                        default=[0.2, 0.4, 0.6, 0.8, 1.0])
+    parser.add_argument("--random", type=int, default=0,
+                        help="Draw this many random sets from the value ranges instead")
+    parser.add_argument("--metric", default="total_return")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.random:
+        parameter_sets = random_search({
+            "min_rsi_change_threshold": (min(args.thresholds), max(args.thresholds)),
+            "allocation": (min(args.allocations), max(args.allocations)),
+        }, args.random)
+    else:
+        parameter_sets = grid({
+            "min_rsi_change_threshold": args.thresholds,
+            "allocation": args.allocations,
+        })
+    ranked = run_sweep(
+        load_bars(args.bars), rsi_signals(), parameter_sets,
+        metric=args.metric, max_workers=args.workers,
+    )
+    print(ranked.head(args.top).to_string())
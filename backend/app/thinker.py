@@ -1,5 +1,6 @@
-import asyncio
 from typing import Optional
+
+from app.rules import SIGNALS, RuleState, ThinkerRules, default_rules
 from app.utils import logger
 
 
@@ -11,6 +12,9 @@ async def should_execute_trade(
     last_indicators: Optional[dict] = None,
     last_price: Optional[float] = None,
     last_updated: Optional[int] = None,
+    rules: Optional[ThinkerRules] = None,
+    last_trade_time: Optional[float] = None,
+    now: Optional[float] = None,
 ) -> bool:
     """
     Implements the "Think Twice" logic to decide if a trade should be executed.
@@ -22,42 +26,41 @@ async def should_execute_trade(
                                               actually executed.
         min_rsi_change_threshold (Optional[float]): Minimum RSI change
                                                     required to execute a trade.
+                                                    Ignored if ``rules`` is given.
         current_indicators (Optional[dict]): The current technical indicators.
         last_indicators (Optional[dict]): The previous technical indicators.
+        rules (Optional[ThinkerRules]): The compiled rule set to apply;
+                                        ``default_rules`` if None.
+        last_trade_time (Optional[float]): When the last buy/sell was
+                                           approved, for cooldowns.
+        now (Optional[float]): The current tick's time, for cooldowns.
 
     Returns:
         bool: True if the trade should be executed, False otherwise.
     """
-    logger.info(f"Thinker: Proposed signal: {proposed_signal}")
-    logger.info(f"Thinker: Last executed signal: {last_executed_signal}")
-    logger.info(f"Thinker: Last price: {last_price}")
+    logger.debug(
+        "Thinker: Proposed signal: %s, last executed signal: %s, last price: %s",
+        proposed_signal, last_executed_signal, last_price,
+    )
 
-    if proposed_signal not in ["buy", "sell", "hold"]:
+    if proposed_signal not in SIGNALS:
         logger.error(f"Thinker: Invalid proposed signal: {proposed_signal}. Must be 'buy', 'sell', or 'hold'.")
         return False
 
-    logger.info("Thinker: Simulating reasoning delay...")
-    await asyncio.sleep(1)
-
-    if proposed_signal == last_executed_signal and proposed_signal != "hold":
-        logger.info("Thinker: Skipping trade - duplicate consecutive signal.")
+    if rules is None:
+        rules = default_rules(min_rsi_change=min_rsi_change_threshold)
+    state = RuleState(
+        last_signal=last_executed_signal,
+        last_values={
+            name: last_indicators[name] for name in rules.tracked
+            if last_indicators is not None and last_indicators.get(name) is not None
+        },
+        last_trade_time=last_trade_time,
+    )
+    reason = rules.evaluate(proposed_signal, current_indicators or {}, now, state)
+    if reason is not None:
+        logger.debug("Thinker: Skipping trade - %s.", reason)
         return False
 
-    if (
-        min_rsi_change_threshold is not None
-        and current_indicators is not None
-        and last_indicators is not None
-    ):
-        current_rsi = current_indicators.get("RSI_14")
-        last_rsi = last_indicators.get("RSI_14")
-        if current_rsi is not None and last_rsi is not None:
-            rsi_change = abs(current_rsi - last_rsi)
-            if rsi_change < min_rsi_change_threshold:
-                logger.info(
-                    f"Thinker: Skipping trade - RSI change ({rsi_change:.2f}) "
-                    f"below threshold ({min_rsi_change_threshold})."
-                )
-                return False
-
-    logger.info("Thinker: Proceeding with trade execution.")
-    return True
\ No newline at end of file
+    logger.debug("Thinker: Proceeding with trade execution.")
+    return True
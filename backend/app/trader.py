@@ -1,23 +1,160 @@
-from alpaca_trade_api.rest import REST
-from alpaca_trade_api.common import URL
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
 
 from app.config import settings
+from app.metrics import LEDGER_DRIFT, STAGE_ERRORS, STAGE_SECONDS
+from app.models import AlpacaAccount, AlpacaOrder, AlpacaPosition
+from app.ratelimit import HIGH, LOW, NORMAL, RateLimiter, get_limiter
 from app.utils import logger
 
 
+class PositionLedger:
+    """
+    Local view of cash, buying power and positions, updated from the fills
+    the broker reports for our orders. Orders are sized from ``buying_power`` (which differs from cash
+    on margin and crypto accounts), exactly as when it came from the broker.
+
+    The trading loop sizes orders and gates buys/sells from here instead
+    of asking the broker on every decision. ``AlpacaTrader.reconcile``
+    replaces it with the broker's view on a schedule, or on the next tick
+    after something made it ``stale`` (a failed order, a failed sync).
+    """
+
+    def __init__(self, tolerance: float = 1e-6):
+        self.tolerance = tolerance
+        self.cash: Optional[float] = None
+        self.buying_power: Optional[float] = None
+        self.positions: Dict[str, float] = {}
+        self.synced_at: Optional[float] = None
+        self.stale = True
+
+    def position(self, symbol: str) -> float:
+        """The held quantity of ``symbol`` (0.0 if flat)."""
+        return self.positions.get(symbol, 0.0)
+
+    def apply_fill(self, symbol: str, side: str, qty: float, price: Optional[float]):
+        """Books a fill; without a price only the position is updated."""
+        signed = qty if side == "buy" else -qty
+        held = self.position(symbol) + signed
+        if abs(held) <= self.tolerance:
+            self.positions.pop(symbol, None)
+        else:
+            self.positions[symbol] = held
+        if price is None:
+            self.stale = True
+        else:
+            self.adjust_cash(-signed * price)
+
+    def adjust_cash(self, amount: float):
+        """Moves cash and buying power by ``amount`` until the next reconcile."""
+        if self.cash is not None:
+            self.cash += amount
+        if self.buying_power is not None:
+            self.buying_power += amount
+
+    def reconcile(self, cash: float, positions: Dict[str, float],
+                  now: Optional[float] = None,
+                  buying_power: Optional[float] = None) -> List[str]:
+        """
+        Replaces the local view with the broker's.
+
+        ``buying_power`` defaults to ``cash`` when the broker reports none.
+
+        Returns:
+            List[str]: What drifted ("cash" and/or symbols), empty if the
+                       ledger matched the broker.
+        """
+        drifted = []
+        if self.synced_at is not None:
+            if self.cash is not None and abs(self.cash - cash) > max(self.tolerance, 0.01):
+                drifted.append("cash")
+            for symbol in sorted(set(self.positions) | set(positions)):
+                if abs(self.position(symbol) - positions.get(symbol, 0.0)) > self.tolerance:
+                    drifted.append(symbol)
+        self.cash = cash
+        self.buying_power = cash if buying_power is None else buying_power
+        self.positions = {symbol: qty for symbol, qty in positions.items() if qty}
+        self.synced_at = time.time() if now is None else now
+        self.stale = False
+        return drifted
+
+    def due(self, interval_seconds: float, now: Optional[float] = None) -> bool:
+        """True if the ledger is stale or was last synced too long ago."""
+        now = time.time() if now is None else now
+        return self.stale or self.synced_at is None or now - self.synced_at >= interval_seconds
+
+    def snapshot(self) -> dict:
+        return {
+            "cash": self.cash,
+            "buying_power": self.buying_power,
+            "positions": dict(self.positions),
+            "synced_at": self.synced_at,
+            "stale": self.stale,
+        }
+
+
 class AlpacaTrader:
-    def __init__(self):
-        self.api = REST(
-            settings.ALPACA_API_KEY,
-            settings.ALPACA_SECRET_KEY,
-            URL(settings.APCA_API_BASE_URL)
+    """
+    Non-blocking Alpaca trading client.
+
+    All calls go through one pooled, keep-alive ``httpx.AsyncClient`` so many
+    position or account queries can run in parallel without blocking the
+    event loop. Requests are scheduled by the shared "alpaca" ``RateLimiter``:
+    orders go first, status polls last. Call ``aclose`` when done.
+    """
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None,
+                 limiter: Optional[RateLimiter] = None):
+        self.client = client or httpx.AsyncClient(
+            base_url=settings.APCA_API_BASE_URL,
+            headers={
+                "APCA-API-KEY-ID": settings.ALPACA_API_KEY,
+                "APCA-API-SECRET-KEY": settings.ALPACA_SECRET_KEY,
+            },
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(
+                max_connections=settings.ALPACA_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.ALPACA_MAX_CONNECTIONS,
+            ),
         )
+        self.limiter = limiter or get_limiter("alpaca")
+        self.ledger = PositionLedger()
         logger.info("AlpacaTrader initialized with paper trading account.")
 
+    async def aclose(self):
+        """Closes the pooled HTTP client."""
+        await self.client.aclose()
+
+    def book_fill(self, symbol: str, order: AlpacaOrder, booked_qty: float = 0.0,
+                  booked_notional: float = 0.0) -> Tuple[float, float]:
+        """
+        Books the part of ``order`` filled beyond ``booked_qty`` (which cost
+        ``booked_notional``) in the ledger, at the broker's fill prices.
+
+        Returns:
+            Tuple[float, float]: Quantity and notional booked for the order
+                                 so far.
+        """
+        filled = float(order.filled_qty or 0)
+        if filled <= booked_qty:
+            return booked_qty, booked_notional
+        if order.filled_avg_price is None:
+            self.ledger.apply_fill(symbol, order.side, filled - booked_qty, None)
+            return filled, booked_notional
+        notional = filled * float(order.filled_avg_price)
+        # The average covers every fill so far; price only the new ones
+        price = (notional - booked_notional) / (filled - booked_qty)
+        self.ledger.apply_fill(symbol, order.side, filled - booked_qty, price)
+        return filled, notional
+
     async def place_order(
         self, symbol: str, qty: float, side: str, type: str = "market",
-        time_in_force: str = "gtc"
-    ):
+        time_in_force: str = "gtc", client_order_id: Optional[str] = None,
+        book: bool = True,
+    ) -> Optional[AlpacaOrder]:
         """
         Places a trade order with Alpaca.
 
@@ -27,32 +164,97 @@ class AlpacaTrader:
             side (str): 'buy' or 'sell'.
             type (str): Order type (e.g., 'market', 'limit').
             time_in_force (str): Time in force (e.g., 'gtc', 'day').
+            client_order_id (Optional[str]): Idempotency key. If the request
+                                             fails, the order is looked up by
+                                             it in case it reached Alpaca; a
+                                             found order is returned without
+                                             booking it.
+            book (bool): Book whatever the acknowledgement reports as filled
+                         and mark the ledger stale if that is not all of it.
+                         ``OrderTracker`` passes False and books fills as it
+                         sees them.
 
         Returns:
-            Order: The placed order object.
+            Optional[AlpacaOrder]: The placed order, or None on failure.
         """
         try:
-            logger.info(
-                f"Alpaca: Attempting to place {side} order for {qty} of "
-                f"{symbol}..."
-            )
-            order = self.api.submit_order(
-                symbol=symbol,
-                qty=qty,
-                side=side,
-                type=type,
-                time_in_force=time_in_force
-            )
+            logger.debug("Alpaca: Attempting to place %s order for %s of %s...", side, qty, symbol)
+            payload = {
+                "symbol": symbol,
+                "qty": str(qty),
+                "side": side,
+                "type": type,
+                "time_in_force": time_in_force,
+            }
+            if client_order_id is not None:
+                payload["client_order_id"] = client_order_id
+            with STAGE_SECONDS.time(stage="order"):
+                # Without a client_order_id a retried 5xx could place the
+                # order twice; with one, Alpaca rejects the duplicate.
+                response = await self.limiter.request(
+                    lambda: self.client.post("/v2/orders", json=payload), HIGH,
+                    retry_server_errors=client_order_id is not None,
+                )
+            response.raise_for_status()
+            order = AlpacaOrder(**response.json())
             logger.info(
                 f"Alpaca: Placed {side} order for {qty} of {symbol}. "
                 f"Order ID: {order.id}"
             )
+        except Exception as e:
+            order = None
+            if client_order_id is not None:
+                order = await self.get_order_by_client_id(client_order_id)
+            if order is None:
+                logger.error(f"Alpaca: Error placing order for {symbol}: {e}")
+                STAGE_ERRORS.inc(stage="order")
+                # The order may or may not have reached the broker
+                self.ledger.stale = True
+                return None
+            logger.info(f"Alpaca: Order {client_order_id} was already submitted ({e}).")
+            # It may or may not have been booked by an earlier attempt
+            self.ledger.stale = True
             return order
+        if book:
+            self.book_fill(symbol, order)
+            if order.status != "filled":
+                # The rest of the fill is only seen at the next reconcile
+                self.ledger.stale = True
+        return order
+
+    async def get_order(self, order_id: str) -> Optional[AlpacaOrder]:
+        """
+        Fetches an order's current status.
+
+        Args:
+            order_id (str): Alpaca's order ID.
+
+        Returns:
+            Optional[AlpacaOrder]: The order, or None on failure.
+        """
+        try:
+            response = await self.limiter.request(
+                lambda: self.client.get(f"/v2/orders/{order_id}"), LOW,
+            )
+            response.raise_for_status()
+            return AlpacaOrder(**response.json())
         except Exception as e:
-            logger.error(f"Alpaca: Error placing order for {symbol}: {e}")
+            logger.warning(f"Alpaca: Error fetching order {order_id}: {e}")
             return None
 
-    async def get_position(self, symbol: str):
+    async def get_order_by_client_id(self, client_order_id: str) -> Optional[AlpacaOrder]:
+        """Fetches an order by our ``client_order_id``; None if unknown."""
+        try:
+            response = await self.limiter.request(lambda: self.client.get(
+                "/v2/orders:by_client_order_id",
+                params={"client_order_id": client_order_id},
+            ), HIGH)
+            response.raise_for_status()
+            return AlpacaOrder(**response.json())
+        except Exception:
+            return None
+
+    async def get_position(self, symbol: str) -> Optional[AlpacaPosition]:
         """
         Checks the current position for a given symbol.
 
@@ -60,27 +262,101 @@ class AlpacaTrader:
             symbol (str): The trading symbol.
 
         Returns:
-            Position: The position object if found, None otherwise.
+            Optional[AlpacaPosition]: The position if found, None otherwise.
         """
         try:
-            logger.info(f"Alpaca: Checking position for {symbol}...")
-            position = self.api.get_position(symbol)
-            logger.info(
-                f"Alpaca: Current position for {symbol}: {position.qty} shares, "
-                f"avg price {position.avg_entry_price}"
+            logger.debug("Alpaca: Checking position for %s...", symbol)
+            with STAGE_SECONDS.time(stage="position"):
+                response = await self.limiter.request(
+                    lambda: self.client.get(f"/v2/positions/{symbol}"), NORMAL,
+                )
+            response.raise_for_status()
+            position = AlpacaPosition(**response.json())
+            logger.debug(
+                "Alpaca: Current position for %s: %s shares, avg price %s",
+                symbol, position.qty, position.avg_entry_price,
             )
             return position
         except Exception as e:
-            logger.info(f"Alpaca: No position found for {symbol} or error: {e}")
+            logger.debug("Alpaca: No position found for %s or error: %s", symbol, e)
+            return None
+
+    async def get_positions(self, symbols: List[str]) -> Dict[str, Optional[AlpacaPosition]]:
+        """
+        Checks the positions for several symbols in parallel.
+
+        Args:
+            symbols (List[str]): The trading symbols.
+
+        Returns:
+            Dict[str, Optional[AlpacaPosition]]: Position (or None) per symbol.
+        """
+        positions = await asyncio.gather(
+            *(self.get_position(symbol) for symbol in symbols)
+        )
+        return dict(zip(symbols, positions))
+
+    async def get_all_positions(self) -> Optional[List[AlpacaPosition]]:
+        """
+        Lists every open position in one request.
+
+        Returns:
+            Optional[List[AlpacaPosition]]: The positions, or None on failure.
+        """
+        try:
+            with STAGE_SECONDS.time(stage="position"):
+                response = await self.limiter.request(
+                    lambda: self.client.get("/v2/positions"), NORMAL,
+                )
+            response.raise_for_status()
+            return [AlpacaPosition(**position) for position in response.json()]
+        except Exception as e:
+            logger.error(f"Alpaca: Error listing positions: {e}")
+            STAGE_ERRORS.inc(stage="position")
             return None
 
-    async def get_account_info(self):
+    async def reconcile(self) -> bool:
+        """
+        Syncs the ledger with the broker's cash and positions.
+
+        Returns:
+            bool: True if the ledger was synced, False if a request failed
+                  (the ledger stays stale and is retried next time).
+        """
+        account, positions = await asyncio.gather(
+            self.get_account_info(), self.get_all_positions()
+        )
+        if account is None or positions is None:
+            self.ledger.stale = True
+            return False
+        drifted = self.ledger.reconcile(
+            float(account.cash if account.cash is not None else account.buying_power),
+            {position.symbol: float(position.qty) for position in positions},
+            buying_power=float(account.buying_power),
+        )
+        if drifted:
+            LEDGER_DRIFT.inc()
+            logger.warning(f"Alpaca: Ledger drifted from the broker ({', '.join(drifted)}); resynced.")
+        return True
+
+    async def maybe_reconcile(self, interval_seconds: float) -> bool:
+        """Reconciles if the ledger is stale or ``interval_seconds`` old."""
+        if self.ledger.due(interval_seconds):
+            return await self.reconcile()
+        return False
+
+    async def get_account_info(self) -> Optional[AlpacaAccount]:
         """
         Retrieves account information.
         """
         try:
-            logger.info("Alpaca: Fetching account information...")
-            account = self.api.get_account()
+            logger.debug("Alpaca: Fetching account information...")
+            with STAGE_SECONDS.time(stage="account"):
+                response = await self.limiter.request(
+                    lambda: self.client.get("/v2/account"), NORMAL,
+                )
+            response.raise_for_status()
+            account = AlpacaAccount(**response.json())
             logger.info(
                 f"Alpaca: Account Status: {account.status}, Equity: {account.equity}, "
                 f"Buying Power: {account.buying_power}"
@@ -88,4 +364,5 @@ class AlpacaTrader:
             return account
         except Exception as e:
             logger.error(f"Alpaca: Error getting account info: {e}")
+            STAGE_ERRORS.inc(stage="account")
             return None
@@ -1,14 +1,130 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler()
-        # logging.FileHandler('trading_board.log')
-    ]
-)
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as one JSON object per line.
+
+    Structured data passed as ``extra={"fields": {...}}`` is merged into the
+    object, so a whole tick can be emitted as a single record.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records with only their message merged.
+
+    The stock ``prepare`` formats the whole record, traceback included, on
+    the calling thread and folds it into the message. Merging just the
+    arguments keeps the message as it was at the call, while the traceback
+    stays in ``exc_info`` for the listener's formatter.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(level: str = "INFO", log_format: str = "json"):
+    """
+    Routes all logging through a queue drained by a background thread.
+
+    Callers merge the message arguments and enqueue the record; formatting
+    (tracebacks and JSON encoding of structured fields) and the blocking
+    write to stderr happen on the listener thread, off the event loop.
+
+    Args:
+        level (str): Root log level, e.g. "INFO" or "DEBUG".
+        log_format (str): "json" for one JSON object per line, or "text".
+    """
+    global _listener
+    _stop_listener()
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+    )
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.handlers = [_DeferredQueueHandler(log_queue)]
+    root.setLevel(level.upper())
+
+
+@atexit.register
+def _stop_listener():
+    # Flushes records still queued, e.g. when the process exits
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class LogSampler:
+    """
+    Rate-limits records per key (e.g. per symbol).
+
+    At most one record per ``interval_seconds`` passes for each key; forced
+    records (trades, errors) always pass. Suppressed records are counted so
+    the next emitted one can report how many were dropped.
+    """
+
+    def __init__(self, interval_seconds: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.interval_seconds = interval_seconds
+        self.clock = clock
+        self._last: Dict[Hashable, float] = {}
+        self._suppressed: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def sample(self, key: Hashable, force: bool = False) -> Optional[int]:
+        """
+        Returns None if the record for ``key`` should be dropped, otherwise
+        the number of records dropped for it since the last one emitted.
+        """
+        now = self.clock()
+        with self._lock:
+            last = self._last.get(key)
+            if not force and last is not None and now - last < self.interval_seconds:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return None
+            self._last[key] = now
+            return self._suppressed.pop(key, 0)
+
+
+# Configure logging; entry points re-run this with the configured settings
+setup_logging()
 
 # Get a logger instance
 logger = logging.getLogger(__name__)
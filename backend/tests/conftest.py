@@ -0,0 +1,22 @@
+import pytest
+
+from app import ratelimit
+from app.config import get_settings
+
+
+@pytest.fixture(autouse=True)
+def shared_limiters(monkeypatch):
+    # Limiters hold futures and timers of the loop they ran on, and each
+    # test gets its own event loop, so every test starts with fresh ones.
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+
+
+@pytest.fixture(autouse=True)
+def test_settings(monkeypatch):
+    # Settings requires credentials, so the suite runs with dummy ones, and
+    # each test resolves a fresh instance that fixtures may modify freely.
+    for name in ("DEEPSEEK_API_KEY", "ALPACA_API_KEY", "ALPACA_SECRET_KEY"):
+        monkeypatch.setenv(name, "test")
+    get_settings.cache_clear()
+    yield
+    get_settings.cache_clear()
@@ -1,11 +1,39 @@
 import pytest
+import pytest_asyncio
 import respx  # noqa: F401
 import httpx
 from respx import MockRouter
 
-from app.analyzer import get_trading_signal
+from app import analyzer, ratelimit
+import json
+
+from app.analyzer import ConnectionStats, get_trading_signal, get_trading_signals
 from app.models import DeepSeekErrorResponse
 
+DEEPSEEK_OK = {
+    "id": "chatcmpl-123",
+    "object": "chat.completion",
+    "created": 1678886400,
+    "model": "deepseek-chat",
+    "choices": [{
+        "index": 0,
+        "message": {"role": "assistant", "content": "hold"},
+        "finish_reason": "stop"
+    }],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 1,
+              "total_tokens": 11}
+}
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def shared_client(monkeypatch):
+    # Each test gets its own event loop, so the shared client must not leak.
+    monkeypatch.setitem(
+        ratelimit._limiters, "deepseek", ratelimit.RateLimiter("deepseek", backoff_seconds=0.0)
+    )
+    yield
+    await analyzer.close_client()
+
 
 @pytest.mark.asyncio
 async def test_get_trading_signal_buy(respx_mock: MockRouter):
@@ -177,3 +205,302 @@ async def test_get_trading_signal_empty_message_content(respx_mock: MockRouter):
     assert isinstance(response, DeepSeekErrorResponse)
     assert response.error.type == "parsing_error"
     assert "No signal found in DeepSeek response." in response.error.message
+
+
+@pytest.mark.asyncio
+async def test_get_trading_signal_timeout(respx_mock: MockRouter):
+    respx_mock.post("https://api.deepseek.com/chat/completions").mock(
+        side_effect=httpx.ConnectTimeout("Timed out")
+    )
+
+    response = await get_trading_signal(indicators={"RSI_14": 50.0},
+                                        api_key="test_key")
+    assert isinstance(response, DeepSeekErrorResponse)
+    assert response.error.type == "network_error"
+
+
+@pytest.mark.asyncio
+async def test_get_trading_signal_reuses_shared_client(respx_mock: MockRouter):
+    route = respx_mock.post("https://api.deepseek.com/chat/completions").mock(
+        return_value=httpx.Response(200, json=DEEPSEEK_OK)
+    )
+    client = analyzer.init_client(max_connections=4, connect_timeout=1.0,
+                                  read_timeout=2.0)
+
+    assert await get_trading_signal(indicators={}, api_key="k") == "hold"
+    assert await get_trading_signal(indicators={}, api_key="k") == "hold"
+
+    assert analyzer.get_client() is client
+    assert route.call_count == 2
+    assert client.timeout.connect == 1.0
+    assert client.timeout.read == 2.0
+
+
+def test_init_client_http2_falls_back_without_h2(monkeypatch):
+    monkeypatch.setattr(analyzer.importlib.util, "find_spec", lambda name: None)
+    client = analyzer.init_client(http2=True)
+    assert client._transport._pool._http2 is False
+
+
+@pytest.mark.asyncio
+async def test_connection_stats_credit_reused_connections():
+    stats = ConnectionStats()
+
+    trace = stats.tracer()
+    await trace("connection.connect_tcp.started", {})
+    await trace("connection.start_tls.complete", {})
+    assert trace.finish().startswith("new connection")
+
+    trace = stats.tracer()
+    assert "saved" in trace.finish()
+
+    assert stats.new_connections == 1
+    assert stats.reused_connections == 1
+    assert stats.saved_ms == stats.last_handshake_ms
+
+
+def completion(content: str) -> dict:
+    return {**DEEPSEEK_OK, "choices": [{
+        "index": 0,
+        "message": {"role": "assistant", "content": content},
+        "finish_reason": "stop",
+    }]}
+
+
+@pytest.mark.asyncio
+async def test_get_trading_signals_single_batched_request(respx_mock: MockRouter):
+    route = respx_mock.post("https://api.deepseek.com/chat/completions").mock(
+        return_value=httpx.Response(200, json=completion(
+            '{"signals": {"BTC-USD": "buy", "ETH-USD": " SELL "}}'
+        ))
+    )
+
+    signals = await get_trading_signals(
+        {"BTC-USD": {"RSI_14": 30.0}, "ETH-USD": {"RSI_14": 70.0}},
+        api_key="test_key",
+    )
+
+    assert signals == {"BTC-USD": "buy", "ETH-USD": "sell"}
+    assert route.call_count == 1
+    body = json.loads(route.calls.last.request.content)
+    assert body["response_format"] == {"type": "json_object"}
+    assert "BTC-USD" in body["messages"][1]["content"]
+
+
+@pytest.mark.asyncio
+async def test_get_trading_signals_falls_back_for_invalid_entries(respx_mock: MockRouter):
+    route = respx_mock.post("https://api.deepseek.com/chat/completions").mock(
+        side_effect=[
+            httpx.Response(200, json=completion(
+                '{"signals": {"BTC-USD": "buy", "ETH-USD": "moon"}}'
+            )),
+            httpx.Response(200, json=completion("hold")),
+        ]
+    )
+
+    signals = await get_trading_signals(
+        {"BTC-USD": {"RSI_14": 30.0}, "ETH-USD": {"RSI_14": 70.0}},
+        api_key="test_key",
+    )
+
+    assert signals == {"BTC-USD": "buy", "ETH-USD": "hold"}
+    assert route.call_count == 2
+    retry = json.loads(route.calls.last.request.content)
+    assert "response_format" not in retry
+
+
+@pytest.mark.asyncio
+async def test_get_trading_signals_falls_back_when_reply_is_not_json(respx_mock: MockRouter):
+    route = respx_mock.post("https://api.deepseek.com/chat/completions").mock(
+        side_effect=[
+            httpx.Response(200, json=completion("buy everything")),
+            httpx.Response(200, json=completion("sell")),
+            httpx.Response(200, json=completion("sell")),
+        ]
+    )
+
+    signals = await get_trading_signals(
+        {"BTC-USD": {}, "ETH-USD": {}}, api_key="test_key",
+    )
+
+    assert signals == {"BTC-USD": "sell", "ETH-USD": "sell"}
+    assert route.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_get_trading_signals_does_not_fan_out_when_the_batch_request_fails(
+    respx_mock: MockRouter,
+):
+    route = respx_mock.post("https://api.deepseek.com/chat/completions").mock(
+        return_value=httpx.Response(429, json={"error": "rate limited"})
+    )
+
+    signals = await get_trading_signals(
+        {"BTC-USD": {}, "ETH-USD": {}, "SOL-USD": {}}, api_key="test_key",
+    )
+
+    # Retries of the one batch request only, never one request per symbol
+    assert route.call_count == ratelimit.get_limiter("deepseek").max_retries + 1
+    assert set(signals) == {"BTC-USD", "ETH-USD", "SOL-USD"}
+    for signal in signals.values():
+        assert isinstance(signal, DeepSeekErrorResponse)
+        assert signal.error.type == "http_error"
+
+
+@pytest.mark.asyncio
+async def test_get_trading_signal_sends_compact_prompt_and_records_usage(respx_mock: MockRouter):
+    route = respx_mock.post("https://api.deepseek.com/chat/completions").mock(
+        return_value=httpx.Response(200, json=DEEPSEEK_OK)
+    )
+    calls_before = analyzer.token_usage.calls
+
+    await get_trading_signal(
+        indicators={"RSI_14": 54.32187, "ISA_9": 1.0, "ADX_14": float("nan")},
+        api_key="test_key",
+    )
+
+    prompt = json.loads(route.calls.last.request.content)["messages"][1]["content"]
+    assert "RSI_14\n54.322" in prompt
+    assert "ISA_9" not in prompt
+    assert "nan" not in prompt
+    assert analyzer.token_usage.calls == calls_before + 1
+    assert analyzer.token_usage.last_prompt_tokens == 10
+
+
+def sse(*contents: str) -> list:
+    return [
+        "data: " + json.dumps({
+            "id": "chatcmpl-123", "object": "chat.completion.chunk",
+            "created": 1678886400, "model": "deepseek-chat",
+            "choices": [{"index": 0, "delta": {"content": content}}],
+        }) + "\n\n"
+        for content in contents
+    ] + ["data: [DONE]\n\n"]
+
+
+class RecordingStream(httpx.AsyncByteStream):
+    def __init__(self, events: list):
+        self.events = events
+        self.sent = 0
+
+    async def __aiter__(self):
+        for event in self.events:
+            self.sent += 1
+            yield event.encode()
+
+
+@pytest.mark.asyncio
+async def test_get_trading_signal_stream_stops_at_first_signal(respx_mock: MockRouter):
+    body = RecordingStream(sse("b", "uy", " because", " RSI", " is", " low"))
+    route = respx_mock.post("https://api.deepseek.com/chat/completions").mock(
+        return_value=httpx.Response(
+            200, headers={"Content-Type": "text/event-stream"}, stream=body
+        )
+    )
+
+    signal = await get_trading_signal(
+        indicators={"RSI_14": 30.0}, api_key="test_key", stream=True
+    )
+
+    assert signal == "buy"
+    assert body.sent == 2
+    assert json.loads(route.calls.last.request.content)["stream"] is True
+
+
+@pytest.mark.asyncio
+async def test_stream_cut_short_records_estimated_usage(respx_mock: MockRouter):
+    respx_mock.post("https://api.deepseek.com/chat/completions").mock(
+        return_value=httpx.Response(
+            200, stream=RecordingStream(sse("buy", " because", " RSI", " is", " low"))
+        )
+    )
+    usage = analyzer.token_usage
+    calls, estimated, prompt_tokens = usage.calls, usage.estimated_calls, usage.prompt_tokens
+
+    await get_trading_signal(indicators={"RSI_14": 30.0}, api_key="test_key", stream=True)
+
+    assert usage.calls == calls + 1
+    assert usage.estimated_calls == estimated + 1
+    assert usage.last_prompt_tokens > 0
+    assert usage.prompt_tokens == prompt_tokens + usage.last_prompt_tokens
+
+
+@pytest.mark.asyncio
+async def test_stream_read_to_the_end_records_reported_usage(respx_mock: MockRouter):
+    events = sse()
+    events.insert(-1, "data: " + json.dumps({
+        "id": "chatcmpl-123", "object": "chat.completion.chunk",
+        "created": 1678886400, "model": "deepseek-chat", "choices": [],
+        "usage": {"prompt_tokens": 42, "completion_tokens": 1, "total_tokens": 43},
+    }) + "\n\n")
+    respx_mock.post("https://api.deepseek.com/chat/completions").mock(
+        return_value=httpx.Response(200, stream=RecordingStream(events))
+    )
+    usage = analyzer.token_usage
+    calls, estimated = usage.calls, usage.estimated_calls
+
+    await get_trading_signal(indicators={"RSI_14": 30.0}, api_key="test_key", stream=True)
+
+    assert usage.calls == calls + 1
+    assert usage.estimated_calls == estimated
+    assert usage.last_prompt_tokens == 42
+
+
+@pytest.mark.asyncio
+async def test_get_trading_signal_stream_unexpected_text(respx_mock: MockRouter):
+    respx_mock.post("https://api.deepseek.com/chat/completions").mock(
+        return_value=httpx.Response(200, stream=RecordingStream(sse("maybe")))
+    )
+
+    signal = await get_trading_signal(
+        indicators={"RSI_14": 30.0}, api_key="test_key", stream=True
+    )
+
+    assert isinstance(signal, DeepSeekErrorResponse)
+    assert signal.error.type == "parsing_error"
+    assert "maybe" in signal.error.message
+
+
+@pytest.mark.asyncio
+async def test_get_trading_signal_stream_without_content(respx_mock: MockRouter):
+    respx_mock.post("https://api.deepseek.com/chat/completions").mock(
+        return_value=httpx.Response(200, stream=RecordingStream(sse()))
+    )
+
+    signal = await get_trading_signal(
+        indicators={"RSI_14": 30.0}, api_key="test_key", stream=True
+    )
+
+    assert isinstance(signal, DeepSeekErrorResponse)
+    assert signal.error.message == "No signal found in DeepSeek response."
+
+
+@pytest.mark.asyncio
+async def test_get_trading_signal_stream_http_error(respx_mock: MockRouter):
+    route = respx_mock.post("https://api.deepseek.com/chat/completions").mock(
+        return_value=httpx.Response(429, json={"error": "rate limited"})
+    )
+
+    signal = await get_trading_signal(
+        indicators={"RSI_14": 30.0}, api_key="test_key", stream=True
+    )
+
+    assert isinstance(signal, DeepSeekErrorResponse)
+    assert signal.error.type == "http_error"
+    assert "429" in signal.error.message
+    assert route.call_count == 4  # First attempt plus three retries
+
+
+@pytest.mark.asyncio
+async def test_get_trading_signal_retries_rate_limited_requests(respx_mock: MockRouter):
+    route = respx_mock.post("https://api.deepseek.com/chat/completions").mock(side_effect=[
+        httpx.Response(429, json={"error": "rate limited"}, headers={"Retry-After": "0"}),
+        httpx.Response(503, json={"error": "overloaded"}),
+        httpx.Response(200, json=DEEPSEEK_OK),
+    ])
+
+    signal = await get_trading_signal(indicators={"RSI_14": 30.0}, api_key="test_key")
+
+    assert signal == "hold"
+    assert route.call_count == 3
+    assert ratelimit.get_limiter("deepseek").retries == 2
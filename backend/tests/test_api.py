@@ -0,0 +1,45 @@
+import pytest
+from fastapi import HTTPException
+
+from app import state
+from app.api.main import get_signal, get_state
+from app.config import settings
+from app.state import save_state
+
+
+@pytest.fixture(autouse=True)
+def state_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(state, "STATE_DB", str(tmp_path / "state.db"))
+    monkeypatch.setattr(state, "STATE_FILE", str(tmp_path / "state.json"))
+    yield
+    state.close_store()
+
+
+def test_state_is_returned_for_the_requested_symbol():
+    settings.SYMBOLS = {"BTC-USD": "BTCUSD", "ETH-USD": "ETHUSD"}
+    save_state("buy", {"RSI_14": 30.0}, 100.0, 1, symbol="BTC-USD")
+    save_state("sell", {"RSI_14": 70.0}, 200.0, 2, symbol="ETH-USD")
+
+    assert get_signal("BTC-USD") == {"signal": "buy"}
+    assert get_state("BTC-USD") == {
+        "last_executed_signal": "buy",
+        "last_indicators": {"RSI_14": 30.0},
+    }
+    assert get_signal("ETH-USD") == {"signal": "sell"}
+
+
+def test_symbol_defaults_to_the_only_configured_one():
+    settings.SYMBOLS = {"BTC-USD": "BTCUSD"}
+    save_state("buy", {"RSI_14": 30.0}, 100.0, 1, symbol="BTC-USD")
+    save_state("sell", {"RSI_14": 70.0}, 200.0, 2, symbol="ETH-USD")
+
+    assert get_signal() == {"signal": "buy"}
+    assert get_state()["last_indicators"] == {"RSI_14": 30.0}
+
+
+def test_symbol_is_required_with_several_configured():
+    settings.SYMBOLS = {"BTC-USD": "BTCUSD", "ETH-USD": "ETHUSD"}
+
+    with pytest.raises(HTTPException) as excinfo:
+        get_state()
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,213 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app import background
+from app.background import SymbolPipeline, trading_loop
+from app.broadcast import Broadcaster
+from app.history import IndicatorHistory
+from app.models import AlpacaOrder, AlpacaPosition
+from app.trader import PositionLedger
+
+
+@pytest.fixture(autouse=True)
+def indicator_history(monkeypatch, tmp_path):
+    history = IndicatorHistory()
+    monkeypatch.setattr(background, "indicator_history", history)
+    monkeypatch.setattr(background.settings, "HISTORY_FILE", None)
+    monkeypatch.setattr(background.settings, "ORDERS_DB", str(tmp_path / "orders.db"))
+    return history
+
+
+@pytest.fixture(autouse=True)
+def broadcaster(monkeypatch):
+    broadcaster = Broadcaster()
+    monkeypatch.setattr(background, "broadcaster", broadcaster)
+    return broadcaster
+
+
+def bars(ticker: str, n: int = 60) -> pd.DataFrame:
+    close = 100 + np.arange(n, dtype=float)
+    index = pd.date_range("2025-07-01", periods=n, freq="1min", tz="UTC")
+    suffix = ticker.lower()
+    return pd.DataFrame({
+        f"close_{suffix}": close,
+        f"high_{suffix}": close + 1,
+        f"low_{suffix}": close - 1,
+        f"open_{suffix}": close,
+        f"volume_{suffix}": 10.0,
+    }, index=index)
+
+
+@pytest.mark.asyncio
+async def test_pipeline_places_buy_order(monkeypatch, indicator_history, broadcaster):
+    monkeypatch.setattr(background, "load_entry", lambda symbol: {})
+    save = MagicMock()
+    monkeypatch.setattr(background, "save_state", save)
+    monkeypatch.setattr(background, "get_cached_trading_signal",
+                        AsyncMock(return_value="buy"))
+    monkeypatch.setattr(background, "should_execute_trade",
+                        AsyncMock(return_value=True))
+    trader = MagicMock(ledger=PositionLedger())
+    # A margin account: orders are sized from buying power, not cash
+    trader.ledger.reconcile(500.0, {}, buying_power=1000.0)
+    trader.place_order = AsyncMock(return_value=AlpacaOrder(
+        id="order-1", symbol="ETHUSD", side="buy", type="market", status="accepted",
+    ))
+
+    pipeline = SymbolPipeline("ETH-USD", "ETHUSD")
+    await pipeline.run_once(bars("ETH-USD"), trader)
+
+    # The last (forming) bar is ignored, so the price is the 59th close.
+    trader.place_order.assert_awaited_once()
+    kwargs = trader.place_order.await_args.kwargs
+    assert kwargs["symbol"] == "ETHUSD"
+    assert kwargs["qty"] == pytest.approx(1000 * 0.60 / 158.0)
+    trader.get_position.assert_not_called()  # Gated by the local ledger
+    trader.get_account_info.assert_not_called()
+    assert save.call_args.kwargs["symbol"] == "ETH-USD"
+    assert indicator_history.query("ETH-USD", "close_eth-usd")[-1][1] == 158.0
+    state = broadcaster._state["ETH-USD"]
+    assert state["signal"] == "buy"
+    assert state["order"]["id"] == "order-1"
+
+
+@pytest.mark.asyncio
+async def test_sell_is_capped_at_the_broker_position(monkeypatch):
+    monkeypatch.setattr(background, "load_entry", lambda symbol: {})
+    save = MagicMock()
+    monkeypatch.setattr(background, "save_state", save)
+    monkeypatch.setattr(background, "get_cached_trading_signal",
+                        AsyncMock(return_value="sell"))
+    monkeypatch.setattr(background, "should_execute_trade",
+                        AsyncMock(return_value=True))
+    trader = MagicMock(ledger=PositionLedger())
+    trader.ledger.reconcile(0.0, {"ETHUSD": 2.0})
+    # The buy fee came out of the quantity received
+    trader.get_position = AsyncMock(return_value=AlpacaPosition(
+        symbol="ETHUSD", qty="1.99", avg_entry_price="100",
+    ))
+    trader.place_order = AsyncMock(return_value=AlpacaOrder(
+        id="order-2", symbol="ETHUSD", side="sell", type="market", status="accepted",
+    ))
+
+    await SymbolPipeline("ETH-USD", "ETHUSD").run_once(bars("ETH-USD"), trader)
+
+    assert trader.place_order.await_args.kwargs["qty"] == 1.99
+    assert trader.ledger.stale
+    assert save.call_args.args[0] == "sell"
+    assert save.call_args.kwargs["last_trade_time"] is not None
+
+
+@pytest.mark.asyncio
+async def test_failed_order_is_not_saved_as_executed(monkeypatch, broadcaster):
+    monkeypatch.setattr(background, "load_entry", lambda symbol: {})
+    save = MagicMock()
+    monkeypatch.setattr(background, "save_state", save)
+    monkeypatch.setattr(background, "get_cached_trading_signal",
+                        AsyncMock(return_value="buy"))
+    monkeypatch.setattr(background, "should_execute_trade",
+                        AsyncMock(return_value=True))
+    trader = MagicMock(ledger=PositionLedger())
+    trader.ledger.reconcile(1000.0, {})
+    trader.place_order = AsyncMock(return_value=None)
+
+    await SymbolPipeline("ETH-USD", "ETHUSD").run_once(bars("ETH-USD"), trader)
+
+    # The next "buy" is a retry, not a duplicate of an executed signal
+    save.assert_not_called()
+    assert "last_executed_signal" not in broadcaster._state.get("ETH-USD", {})
+
+
+@pytest.mark.asyncio
+async def test_trading_loop_cleans_up_when_the_first_reconcile_fails(monkeypatch):
+    executors = [MagicMock(), MagicMock()]
+    monkeypatch.setattr(background, "create_executor", MagicMock(side_effect=executors))
+    trader = MagicMock(reconcile=AsyncMock(side_effect=RuntimeError("broker down")),
+                       aclose=AsyncMock())
+
+    with patch.object(background, "AlpacaTrader", return_value=trader), \
+            pytest.raises(RuntimeError):
+        await trading_loop()
+
+    trader.aclose.assert_awaited_once()
+    for executor in executors:
+        executor.shutdown.assert_called_once()
+    assert background.ledger is None
+    assert background.order_tracker is None
+
+
+@pytest.mark.asyncio
+async def test_trading_loop_runs_symbols_concurrently(monkeypatch):
+    symbols = {"BTC-USD": "BTCUSD", "ETH-USD": "ETHUSD", "SOL-USD": "SOLUSD"}
+    monkeypatch.setattr(background.settings, "SYMBOLS", symbols)
+    monkeypatch.setattr(background, "load_entry", lambda symbol: {})
+    monkeypatch.setattr("app.data_fetcher.get_realtime_data_batch",
+                        lambda tickers, cache: {t: bars(t) for t in tickers})
+
+    async def slow_signal(indicators, api_key, cache, stream, symbol):
+        await asyncio.sleep(0.2)
+        return "hold"
+
+    thinker = AsyncMock(return_value=False)
+    monkeypatch.setattr(background, "get_cached_trading_signal", slow_signal)
+    monkeypatch.setattr(background, "should_execute_trade", thinker)
+    monkeypatch.setattr(background.settings, "TRADE_INTERVAL_SECONDS", 60)
+    monkeypatch.setattr(background.settings, "DEEPSEEK_BATCH_SIZE", 1)
+    trader = MagicMock(reconcile=AsyncMock(), maybe_reconcile=AsyncMock(),
+                       aclose=AsyncMock())
+
+    # Three 0.2s signal calls overlap instead of taking 0.6s back to back.
+    with patch.object(background, "AlpacaTrader", return_value=trader), \
+            pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(trading_loop(), timeout=0.45)
+    assert thinker.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_trading_loop_batches_signal_requests(monkeypatch):
+    symbols = {"BTC-USD": "BTCUSD", "ETH-USD": "ETHUSD"}
+    monkeypatch.setattr(background.settings, "SYMBOLS", symbols)
+    monkeypatch.setattr(background.settings, "DEEPSEEK_BATCH_SIZE", 10)
+    monkeypatch.setattr(background.settings, "TRADE_INTERVAL_SECONDS", 60)
+    monkeypatch.setattr(background, "load_entry", lambda symbol: {})
+    monkeypatch.setattr("app.data_fetcher.get_realtime_data_batch",
+                        lambda tickers, cache: {t: bars(t) for t in tickers})
+    batch = AsyncMock(return_value={"BTC-USD": "hold", "ETH-USD": "hold"})
+    thinker = AsyncMock(return_value=False)
+    monkeypatch.setattr(background, "get_cached_trading_signals", batch)
+    monkeypatch.setattr(background, "should_execute_trade", thinker)
+    trader = MagicMock(reconcile=AsyncMock(), maybe_reconcile=AsyncMock(),
+                       aclose=AsyncMock())
+
+    with patch.object(background, "AlpacaTrader", return_value=trader), \
+            pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(trading_loop(), timeout=0.3)
+
+    batch.assert_awaited_once()
+    assert list(batch.await_args.args[0]) == ["BTC-USD", "ETH-USD"]
+    assert thinker.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_pipeline_logs_one_sampled_record_per_tick(monkeypatch, caplog):
+    monkeypatch.setattr(background, "load_entry", lambda symbol: {})
+    monkeypatch.setattr(background, "save_state", MagicMock())
+    monkeypatch.setattr(background, "get_cached_trading_signal",
+                        AsyncMock(return_value="hold"))
+    monkeypatch.setattr(background, "tick_log_sampler", background.LogSampler(60))
+    trader = MagicMock(ledger=PositionLedger())
+
+    pipeline = SymbolPipeline("ETH-USD", "ETHUSD")
+    with caplog.at_level("INFO"):
+        await pipeline.run_once(bars("ETH-USD"), trader)
+        await pipeline.run_once(bars("ETH-USD", n=61), trader)
+
+    records = [record for record in caplog.records if hasattr(record, "fields")]
+    assert len(records) == 1  # The second routine tick is sampled away
+    assert records[0].fields["action"] == "hold"
+    assert records[0].fields["indicators"]["close_eth-usd"] == 158.0
+    assert not [record for record in caplog.records if record.getMessage().startswith("  ")]
@@ -0,0 +1,119 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.backtest import (
+    load_bars, recorded_signals, rsi_signals, rule_indicators, run_backtest,
+)
+from app.indicators import StreamingIndicators
+
+
+def bars(close) -> pd.DataFrame:
+    close = np.asarray(close, dtype=float)
+    return pd.DataFrame(
+        {"open": close, "high": close, "low": close, "close": close,
+         "volume": np.ones(len(close))},
+        index=pd.date_range("2024-01-01", periods=len(close), freq="1min"),
+    )
+
+
+def test_run_backtest_applies_thinker_rules_and_tracks_pnl():
+    data = bars([100, 100, 110, 90, 120, 90])
+    data["RSI_14"] = [30.0, 30.2, 40.0, 50.0, 60.0, 70.0]
+    signals = ["buy", "sell", "buy", "buy", "sell", "buy"]
+
+    result = run_backtest(
+        data, lambda frame: signals, indicators=lambda frame: frame,
+        allocation=0.5, initial_cash=1000.0,
+    )
+
+    # The first sell is below the RSI threshold, the later buys are duplicates.
+    assert list(result.fills["side"]) == ["buy", "sell", "buy"]
+    assert list(result.fills.index) == [data.index[0], data.index[4], data.index[5]]
+    assert result.fills["pnl"].iloc[1] == pytest.approx(100.0)
+    assert list(result.equity) == pytest.approx([1000, 1000, 1050, 950, 1100, 1100])
+    assert result.drawdown.min() == pytest.approx(950 / 1050 - 1)
+    summary = result.summary()
+    assert summary["round_trips"] == 1
+    assert summary["win_rate"] == 1.0
+    assert summary["total_return"] == pytest.approx(0.1)
+
+
+def test_run_backtest_charges_fees_and_slippage():
+    data = bars([100, 100])
+    data["RSI_14"] = [30.0, 40.0]
+
+    result = run_backtest(
+        data, lambda frame: ["buy", "sell"], indicators=lambda frame: frame,
+        allocation=1.0, initial_cash=1000.0, fee_bps=10, slippage_bps=100,
+    )
+
+    buy, sell = result.fills.iloc[0], result.fills.iloc[1]
+    assert buy["price"] == pytest.approx(101.0)
+    assert buy["qty"] == pytest.approx(999.0 / 101.0)
+    assert sell["price"] == pytest.approx(99.0)
+    assert sell["pnl"] < 0
+
+
+def test_recorded_signals_skip_bars_without_a_record():
+    data = bars([100, 100, 100])
+    data["RSI_14"] = [30.0, 40.0, 50.0]
+    recorded = pd.Series([" BUY", "sell"], index=[data.index[0], data.index[2]])
+
+    result = run_backtest(
+        data, recorded_signals(recorded), indicators=lambda frame: frame,
+    )
+
+    assert list(result.fills.index) == [data.index[0], data.index[2]]
+
+
+def test_load_bars_strips_ticker_suffix(tmp_path):
+    path = tmp_path / "bars.csv"
+    frame = bars([1, 2, 3]).iloc[::-1]
+    frame.columns = [f"{c.capitalize()}_BTC-USD" for c in frame.columns]
+    frame.to_csv(path)
+
+    loaded = load_bars(str(path))
+
+    assert list(loaded.columns) == ["open", "high", "low", "close", "volume"]
+    assert loaded.index.is_monotonic_increasing
+
+
+def year_of_minute_closes() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return 30000 * np.exp(np.cumsum(rng.normal(0, 0.001, 365 * 24 * 60)))
+
+
+def test_rule_indicators_match_the_streaming_engine():
+    rng = np.random.default_rng(1)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 500)))
+    data = bars(close)
+    data["high"], data["low"] = close * 1.005, close * 0.995
+    engine = StreamingIndicators()
+    expected = [
+        engine.update(row.high, row.low, row.close, row.volume)
+        for row in data.itertuples()
+    ]
+
+    frame = rule_indicators(data.copy())
+
+    for name in ("RSI_14", "ATRr_14"):
+        np.testing.assert_allclose(
+            frame[name].to_numpy(), [values[name] for values in expected], rtol=1e-9,
+        )
+
+
+def test_replay_of_a_year_of_minute_bars_runs_in_seconds():
+    rng = np.random.default_rng(0)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.001, 365 * 24 * 60)))
+
+    # Default indicators: every column the rules and rsi_signals read
+    started = time.perf_counter()
+    result = run_backtest(bars(close), rsi_signals())
+    elapsed = time.perf_counter() - started
+
+    assert len(result.equity) == len(close)
+    assert len(result.fills) > 100
+    assert elapsed < 5
@@ -0,0 +1,190 @@
+import pandas as pd
+import pytest
+from unittest.mock import patch
+
+from app.bar_cache import BarCache
+
+
+def yf_frame(start: str, periods: int, first_close: float = 100.0,
+             tickers=("BTC-USD",)) -> pd.DataFrame:
+    """Builds a frame shaped like yfinance's MultiIndex download output."""
+    index = pd.date_range(start, periods=periods, freq="1min", tz="UTC")
+    closes = [first_close + i for i in range(periods)]
+    columns = pd.MultiIndex.from_product(
+        [["Close", "High", "Low", "Open", "Volume"], list(tickers)]
+    )
+    values = [
+        [v for v in (c, c + 1, c - 1, c, 10.0) for _ in tickers]
+        for c in closes
+    ]
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+NOW = pd.Timestamp("2025-07-01 00:05", tz="UTC")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return BarCache(
+        cache_dir=str(tmp_path), lookback=pd.Timedelta(minutes=10),
+        flush_seconds=None, clock=lambda: NOW,
+    )
+
+
+def test_first_fetch_downloads_full_window(cache: BarCache):
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-01 00:00", 5)) as download:
+        data = cache.get("BTC-USD")
+
+    # The configured lookback, not a fixed period
+    download.assert_called_once_with(
+        ["BTC-USD"], interval="1m", start=NOW - pd.Timedelta(minutes=10)
+    )
+    assert list(data.columns) == [
+        "close_btc-usd", "high_btc-usd", "low_btc-usd", "open_btc-usd",
+        "volume_btc-usd",
+    ]
+    assert len(data) == 5
+
+
+def test_second_fetch_only_downloads_delta(cache: BarCache):
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-01 00:00", 5)):
+        first = cache.get("BTC-USD")
+
+    # The delta re-delivers the last (possibly partial) bar with a new close.
+    delta = yf_frame("2025-07-01 00:04", 3, first_close=500.0)
+    with patch("app.bar_cache.yf.download", return_value=delta) as download:
+        data = cache.get("BTC-USD")
+
+    download.assert_called_once_with(
+        ["BTC-USD"], interval="1m", start=first.index[-1]
+    )
+    assert len(data) == 7
+    assert data["close_btc-usd"].iloc[4] == 500.0
+    assert data.index.is_monotonic_increasing
+
+
+def test_bars_outside_lookback_are_dropped(cache: BarCache):
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-01 00:00", 5)):
+        cache.get("BTC-USD")
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-01 00:04", 20)):
+        data = cache.get("BTC-USD")
+
+    assert data.index[-1] - data.index[0] == pd.Timedelta(minutes=10)
+
+
+def test_fetches_do_not_write_until_flushed(tmp_path):
+    cache = BarCache(cache_dir=str(tmp_path / "bars"), flush_seconds=None, clock=lambda: NOW)
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-01 00:00", 5)):
+        cache.get("BTC-USD")
+        cache.get("BTC-USD")
+
+    assert not (tmp_path / "bars").exists()
+    assert cache.flush() == 1
+    assert cache.flush() == 0  # Nothing changed since
+    assert len(list((tmp_path / "bars").iterdir())) == 1
+
+
+def test_cache_persists_across_instances(tmp_path):
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-01 00:00", 5)):
+        first = BarCache(cache_dir=str(tmp_path), clock=lambda: NOW)
+        first.get("BTC-USD")
+        first.flush()  # As at shutdown
+
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-01 00:05", 1)) as download:
+        data = BarCache(cache_dir=str(tmp_path), clock=lambda: NOW).get("BTC-USD")
+
+    assert "start" in download.call_args.kwargs
+    assert len(data) == 6
+
+
+def test_empty_delta_returns_cached_bars(cache: BarCache):
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-01 00:00", 5)):
+        first = cache.get("BTC-USD")
+    with patch("app.bar_cache.yf.download", return_value=pd.DataFrame()):
+        data = cache.get("BTC-USD")
+
+    pd.testing.assert_frame_equal(data, first)
+
+
+def test_get_many_uses_one_batched_download(cache: BarCache):
+    tickers = ["BTC-USD", "ETH-USD"]
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-01 00:00", 5,
+                                     tickers=tickers)) as download:
+        frames = cache.get_many(tickers)
+
+    download.assert_called_once_with(
+        tickers, interval="1m", start=NOW - pd.Timedelta(minutes=10)
+    )
+    assert list(frames["ETH-USD"].columns) == [
+        "close_eth-usd", "high_eth-usd", "low_eth-usd", "open_eth-usd",
+        "volume_eth-usd",
+    ]
+
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-01 00:04", 2,
+                                     tickers=tickers)) as download:
+        frames = cache.get_many(tickers)
+
+    download.assert_called_once()
+    assert download.call_args.args[0] == tickers
+    assert all(len(frame) == 6 for frame in frames.values())
+
+
+def test_changed_keys_are_flushed_periodically(tmp_path):
+    cache = BarCache(cache_dir=str(tmp_path), flush_seconds=0.0, clock=lambda: NOW)
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-01 00:00", 5)):
+        cache.get("BTC-USD")
+
+    # Written by the fetch itself, so a crash does not lose the cache
+    assert len(list(tmp_path.iterdir())) == 1
+    assert cache.flush() == 0
+
+
+def test_stale_pickle_is_refetched_in_full(tmp_path):
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-01 00:00", 5)):
+        old = BarCache(cache_dir=str(tmp_path), lookback=pd.Timedelta(minutes=10),
+                       clock=lambda: NOW)
+        old.get("BTC-USD")
+        old.flush()
+
+    later = NOW + pd.Timedelta(days=3)
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-04 00:00", 5, first_close=900.0)) as download:
+        data = BarCache(cache_dir=str(tmp_path), lookback=pd.Timedelta(minutes=10),
+                        clock=lambda: later).get("BTC-USD")
+
+    download.assert_called_once_with(
+        ["BTC-USD"], interval="1m", start=later - pd.Timedelta(minutes=10)
+    )
+    assert data["close_btc-usd"].iloc[0] == 900.0
+    assert len(data) == 5
+
+
+def test_each_ticker_fetches_its_own_delta(cache: BarCache):
+    tickers = ["BTC-USD", "AAPL"]
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-01 00:00", 5, tickers=tickers)):
+        cache.get_many(tickers)
+    # The market closed for AAPL: its last bar stays at 00:02
+    cache._frames[("AAPL", "1m")] = cache._frames[("AAPL", "1m")].iloc[:3]
+
+    with patch("app.bar_cache.yf.download",
+               return_value=yf_frame("2025-07-01 00:04", 2, tickers=tickers)) as download:
+        cache.get_many(tickers)
+
+    starts = {tuple(call.args[0]): call.kwargs["start"] for call in download.call_args_list}
+    assert starts == {
+        ("BTC-USD",): pd.Timestamp("2025-07-01 00:04", tz="UTC"),
+        ("AAPL",): pd.Timestamp("2025-07-01 00:02", tz="UTC"),
+    }
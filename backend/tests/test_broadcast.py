@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import pytest
+
+from app.broadcast import Broadcaster
+
+
+def parse(payload: bytes):
+    fields = dict(
+        line.split(": ", 1) for line in payload.decode().strip().split("\n")
+    )
+    return int(fields["id"]), fields["event"], json.loads(fields["data"])
+
+
+def test_publish_sends_only_changes():
+    broadcaster = Broadcaster()
+    broadcaster.publish("BTC-USD", {"signal": "buy", "indicators": {"RSI_14": 30.0, "ADX_14": 20.0}})
+    broadcaster.publish("BTC-USD", {"signal": "buy", "indicators": {"RSI_14": 31.0, "ADX_14": 20.0}})
+    broadcaster.publish("BTC-USD", {"signal": "buy"})  # Nothing changed
+
+    assert broadcaster.seq == 2
+    _, event, data = parse(broadcaster._buffer[-1][1])
+    assert event == "diff"
+    assert data == {"BTC-USD": {"indicators": {"RSI_14": 31.0}}}
+    _, event, data = parse(broadcaster.snapshot())
+    assert event == "snapshot"
+    assert data["BTC-USD"]["indicators"] == {"RSI_14": 31.0, "ADX_14": 20.0}
+
+
+def test_nan_is_sent_as_null():
+    broadcaster = Broadcaster()
+    broadcaster.publish("BTC-USD", {"indicators": {"ICS_26": float("nan")}})
+
+    _, _, data = parse(broadcaster._buffer[-1][1])
+    assert data == {"BTC-USD": {"indicators": {"ICS_26": None}}}
+
+
+@pytest.mark.asyncio
+async def test_stream_fans_out_snapshot_then_diffs():
+    broadcaster = Broadcaster()
+    broadcaster.publish("BTC-USD", {"signal": "hold"})
+    clients = [broadcaster.stream(), broadcaster.stream()]
+
+    for client in clients:
+        _, event, data = parse(await client.__anext__())
+        assert event == "snapshot"
+        assert data == {"BTC-USD": {"signal": "hold"}}
+    assert broadcaster.clients == 2
+
+    pending = [asyncio.ensure_future(client.__anext__()) for client in clients]
+    await asyncio.sleep(0)
+    broadcaster.publish("BTC-USD", {"signal": "buy"})
+    for payload in await asyncio.wait_for(asyncio.gather(*pending), timeout=1):
+        assert parse(payload) == (2, "diff", {"BTC-USD": {"signal": "buy"}})
+
+    for client in clients:
+        await client.aclose()
+    assert broadcaster.clients == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_client_is_resynced_with_a_snapshot():
+    broadcaster = Broadcaster(buffer_size=4)
+    client = broadcaster.stream()
+    await client.__anext__()
+
+    for i in range(10):  # The client reads nothing meanwhile
+        broadcaster.publish("BTC-USD", {"last_price": float(i)})
+
+    seq, event, data = parse(await client.__anext__())
+    assert (seq, event) == (10, "snapshot")
+    assert data == {"BTC-USD": {"last_price": 9.0}}
+    assert broadcaster.stats()["resyncs"] == 1
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_resumes_from_last_event_id():
+    broadcaster = Broadcaster()
+    for signal in ("buy", "hold", "sell"):
+        broadcaster.publish("BTC-USD", {"signal": signal})
+
+    client = broadcaster.stream(last_event_id=1)
+    assert [parse(await client.__anext__())[0] for _ in range(2)] == [2, 3]
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_after_a_server_restart_gets_a_snapshot():
+    broadcaster = Broadcaster()  # Restarted: seq is back at 0
+    broadcaster.publish("BTC-USD", {"signal": "buy"})
+
+    client = broadcaster.stream(last_event_id=500)
+    seq, event, data = parse(await client.__anext__())
+    assert (seq, event) == (1, "snapshot")
+    assert data == {"BTC-USD": {"signal": "buy"}}
+
+    broadcaster.publish("BTC-USD", {"signal": "sell"})
+    assert parse(await client.__anext__())[:2] == (2, "diff")
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_idle_stream_sends_heartbeats():
+    broadcaster = Broadcaster(heartbeat_seconds=0.01)
+    client = broadcaster.stream()
+    await client.__anext__()
+
+    assert await client.__anext__() == b": keep-alive\n\n"
+    await client.aclose()
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import pytest
+
+from app.executor import create_executor, run_blocking
+from app.indicators import StreamingIndicators, advance_engine
+from tests.test_indicators import make_bars
+
+
+async def max_loop_lag(task: asyncio.Future, interval: float = 0.01) -> float:
+    """Measures how late a periodic timer fires while ``task`` runs."""
+    lag = 0.0
+    loop = asyncio.get_running_loop()
+    while not task.done():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(lag, loop.time() - start - interval)
+    return lag
+
+
+@pytest.mark.asyncio
+async def test_run_blocking_keeps_event_loop_responsive():
+    executor = create_executor("thread", max_workers=1)
+    try:
+        task = asyncio.ensure_future(run_blocking(executor, time.sleep, 0.3))
+        lag = await max_loop_lag(task)
+        await task
+    finally:
+        executor.shutdown()
+    # A blocking call on the loop itself would have delayed the timer 300ms.
+    assert lag < 0.1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["thread", "process"])
+async def test_advance_engine_in_executor_keeps_state(kind):
+    data = make_bars(300)
+    executor = create_executor(kind, max_workers=1)
+    try:
+        engine = StreamingIndicators()
+        engine, _ = await run_blocking(executor, advance_engine, engine, data.iloc[:200])
+        engine, snapshot = await run_blocking(executor, advance_engine, engine, data)
+    finally:
+        executor.shutdown()
+
+    expected = StreamingIndicators().update_frame(data)
+    assert engine.last_timestamp == data.index[-1]
+    for key, value in expected.items():
+        assert snapshot[key] == pytest.approx(value, nan_ok=True)
+
+
+def test_create_executor_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        create_executor("fiber")
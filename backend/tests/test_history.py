@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from app.history import IndicatorHistory, lttb, minmax
+
+
+def filled(rows: int, retention_seconds: int = 10**9) -> IndicatorHistory:
+    history = IndicatorHistory(retention_seconds=retention_seconds)
+    for i in range(rows):
+        history.append("BTC-USD", 60 * i, {"RSI_14": float(i), "label": "x"})
+    return history
+
+
+def test_append_and_range_query():
+    history = filled(3000)
+
+    points = history.query("BTC-USD", "RSI_14", start=60 * 10, end=60 * 12, method="none")
+
+    assert points == [(600, 10.0), (660, 11.0), (720, 12.0)]
+    assert history.indicators("BTC-USD") == ["RSI_14"]
+    assert history.query("ETH-USD", "RSI_14") == []
+    assert history.query("BTC-USD", "MISSING") == []
+
+
+def test_stale_ticks_and_nans_are_skipped():
+    history = IndicatorHistory()
+    history.append("BTC-USD", 60, {"RSI_14": 1.0})
+    history.append("BTC-USD", 60, {"RSI_14": 2.0})
+    history.append("BTC-USD", 120, {"RSI_14": float("nan"), "ADX_14": 5.0})
+    history.append("BTC-USD", 180, {"ADX_14": 6.0})
+
+    assert history.query("BTC-USD", "RSI_14") == [(60, 1.0)]
+    assert history.query("BTC-USD", "ADX_14") == [(120, 5.0), (180, 6.0)]
+
+
+def test_retention_expires_old_rows():
+    history = filled(5000, retention_seconds=60 * 100)
+
+    points = history.query("BTC-USD", "RSI_14", method="none")
+
+    assert len(points) == 101
+    assert points[0] == (60 * 4899, 4899.0)
+
+
+def test_downsampled_queries_are_bounded():
+    history = filled(10080)  # A week of 1-minute rows
+
+    for method in ("lttb", "minmax"):
+        points = history.query("BTC-USD", "RSI_14", max_points=500, method=method)
+        assert len(points) <= 500
+        assert points[0][0] == 0
+        assert [t for t, _ in points] == sorted(t for t, _ in points)
+
+    with pytest.raises(ValueError):
+        history.query("BTC-USD", "RSI_14", method="mean")
+
+
+def test_lttb_keeps_spikes_and_endpoints():
+    y = np.zeros(1000)
+    y[437] = 100.0
+    kept = lttb(np.arange(1000, dtype=float), y, 50)
+
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 999
+    assert 437 in kept
+
+
+def test_minmax_keeps_extremes():
+    y = np.sin(np.arange(1000) / 10.0)
+    y[10] = -5.0
+    y[900] = 5.0
+    kept = minmax(y, 40)
+
+    assert len(kept) <= 40
+    assert 10 in kept and 900 in kept
+
+
+def test_save_and_load_round_trip(tmp_path):
+    history = filled(2000, retention_seconds=60 * 1500)
+    path = str(tmp_path / "history.npz")
+    history.save(path)
+
+    restored = IndicatorHistory(retention_seconds=60 * 1500)
+    restored.load(path)
+    restored.load(str(tmp_path / "missing.npz"))
+
+    assert restored.query("BTC-USD", "RSI_14", method="none") == \
+        history.query("BTC-USD", "RSI_14", method="none")
+    restored.append("BTC-USD", 60 * 2000, {"RSI_14": 1.0})
+    assert restored.query("BTC-USD", "RSI_14", method="none")[-1] == (120000, 1.0)
+
+
+def test_per_symbol_memory_is_fixed_by_retention():
+    history = IndicatorHistory(retention_seconds=60 * 100, dtype="float32")
+    history.append("BTC-USD", 0, {"RSI_14": 1.0, "ADX_14": 2.0})
+    allocated = history.nbytes()["BTC-USD"]
+    for i in range(1, 1000):
+        history.append("BTC-USD", 60 * i, {"RSI_14": 1.0, "ADX_14": 2.0})
+
+    assert history.nbytes()["BTC-USD"] == allocated == 101 * (8 + 4 * 2)
+
+
+def test_unmirrored_queries_are_correct_after_wrapping():
+    history = IndicatorHistory(retention_seconds=60 * 4, max_rows=5)
+    for i in range(13):
+        history.append("BTC-USD", 60 * i, {"RSI_14": float(i)})
+
+    points = history.query("BTC-USD", "RSI_14", method="none")
+
+    assert points == [(60 * i, float(i)) for i in range(8, 13)]
@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.indicators import StreamingIndicators
+
+
+def make_bars(n: int = 600, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 25, n))
+    high = close + rng.uniform(1, 30, n)
+    low = close - rng.uniform(1, 30, n)
+    open_ = close + rng.normal(0, 5, n)
+    volume = rng.uniform(1, 100, n)
+    index = pd.date_range("2025-07-01", periods=n, freq="1min", tz="UTC")
+    return pd.DataFrame({
+        "close_btc-usd": close,
+        "high_btc-usd": high,
+        "low_btc-usd": low,
+        "open_btc-usd": open_,
+        "volume_btc-usd": volume,
+    }, index=index)
+
+
+def stream(data: pd.DataFrame) -> pd.DataFrame:
+    engine = StreamingIndicators()
+    rows = [
+        engine.update(h, low, c, v)
+        for h, low, c, v in zip(
+            data["high_btc-usd"], data["low_btc-usd"],
+            data["close_btc-usd"], data["volume_btc-usd"],
+        )
+    ]
+    return pd.DataFrame(rows, index=data.index)
+
+
+def reference_ema(series: pd.Series, length: int) -> pd.Series:
+    series = series.copy()
+    seed = series.iloc[:length].mean()
+    series.iloc[:length - 1] = np.nan
+    series.iloc[length - 1] = seed
+    return series.ewm(span=length, adjust=False).mean()
+
+
+def reference_rma(series: pd.Series, length: int) -> pd.Series:
+    return series.ewm(alpha=1.0 / length, min_periods=length).mean()
+
+
+def test_streaming_matches_reference_formulas():
+    data = make_bars()
+    result = stream(data)
+    close = data["close_btc-usd"]
+    high = data["high_btc-usd"]
+    low = data["low_btc-usd"]
+
+    diff = close.diff()
+    pos = reference_rma(diff.clip(lower=0), 14)
+    neg = reference_rma(diff.clip(upper=0), 14)
+    rsi = 100 * pos / (pos + neg.abs())
+
+    macd = reference_ema(close, 12) - reference_ema(close, 26)
+    signal = reference_ema(macd.loc[macd.first_valid_index():], 9)
+
+    prev_close = close.shift(1)
+    true_range = pd.concat(
+        [high - low, high - prev_close, prev_close - low], axis=1
+    ).abs().max(axis=1)
+    true_range.iloc[0] = np.nan
+    atr = reference_rma(true_range, 14)
+
+    mid = close.rolling(5).mean()
+    std = close.rolling(5).std(ddof=0)
+
+    expected = {
+        "RSI_14": rsi,
+        "MACD_12_26_9": macd,
+        "MACDs_12_26_9": signal.reindex(close.index),
+        "ATRr_14": atr,
+        "BBL_5_2.0": mid - 2 * std,
+        "BBU_5_2.0": mid + 2 * std,
+        "SMA_200": close.rolling(200).mean(),
+        "EMA_50": reference_ema(close, 50),
+        "ITS_9": 0.5 * (high.rolling(9).max() + low.rolling(9).min()),
+        "ISB_26": (0.5 * (high.rolling(52).max()
+                          + low.rolling(52).min())).shift(26),
+    }
+    for column, values in expected.items():
+        np.testing.assert_allclose(
+            result[column].to_numpy(), values.to_numpy(),
+            rtol=1e-9, atol=1e-6, equal_nan=True, err_msg=column,
+        )
+
+
+def reference_psar(high: pd.Series, low: pd.Series, close: pd.Series,
+                   af0: float = 0.02, max_af: float = 0.2) -> pd.DataFrame:
+    # The pandas-ta 0.3.14b ``psar`` loop, including its reads of
+    # ``iloc[row - 2]`` (the last bar) on the second row.
+    up = high.iloc[1] - high.iloc[0]
+    dn = low.iloc[0] - low.iloc[1]
+    falling = dn > up and dn > 0
+    sar = close.iloc[0]
+    ep = low.iloc[0] if falling else high.iloc[0]
+    af = af0
+
+    n = len(high)
+    long = np.full(n, np.nan)
+    short = np.full(n, np.nan)
+    afs = np.full(n, np.nan)
+    reversal = np.zeros(n, dtype=int)
+    afs[:2] = af0
+    for row in range(1, n):
+        high_, low_ = high.iloc[row], low.iloc[row]
+        _sar = sar + af * (ep - sar)
+        if falling:
+            reverse = high_ > _sar
+            if low_ < ep:
+                ep = low_
+                af = min(af + af0, max_af)
+            _sar = max(high.iloc[row - 1], high.iloc[row - 2], _sar)
+        else:
+            reverse = low_ < _sar
+            if high_ > ep:
+                ep = high_
+                af = min(af + af0, max_af)
+            _sar = min(low.iloc[row - 1], low.iloc[row - 2], _sar)
+        if reverse:
+            _sar = ep
+            af = af0
+            falling = not falling
+            ep = low_ if falling else high_
+        sar = _sar
+        if falling:
+            short[row] = sar
+        else:
+            long[row] = sar
+        afs[row] = af
+        reversal[row] = int(reverse)
+    return pd.DataFrame({
+        "PSARl_0.02_0.2": long,
+        "PSARs_0.02_0.2": short,
+        "PSARaf_0.02_0.2": afs,
+        "PSARr_0.02_0.2": reversal,
+    }, index=high.index)
+
+
+@pytest.mark.parametrize("seed", [7, 11, 23])
+def test_psar_matches_pandas_ta_loop(seed):
+    data = make_bars(300, seed=seed)
+    # pandas-ta bounds the second row by the frame's last bar; making it a
+    # copy of the first bar leaves that bound equal to the streaming one.
+    data.iloc[-1] = data.iloc[0]
+    expected = reference_psar(
+        data["high_btc-usd"], data["low_btc-usd"], data["close_btc-usd"]
+    )
+    result = stream(data)
+
+    assert expected["PSARr_0.02_0.2"].iloc[2:].any()
+    for column in expected.columns:
+        np.testing.assert_allclose(
+            result[column].to_numpy(), expected[column].to_numpy(),
+            rtol=0, atol=0, equal_nan=True, err_msg=column,
+        )
+
+
+def test_update_frame_only_consumes_new_bars():
+    data = make_bars(300)
+    engine = StreamingIndicators()
+    engine.update_frame(data.iloc[:250])
+    latest = engine.update_frame(data)
+
+    full = StreamingIndicators().update_frame(data)
+    assert engine.last_timestamp == data.index[-1]
+    assert latest["close_btc-usd"] == data["close_btc-usd"].iloc[-1]
+    for key, value in full.items():
+        assert latest[key] == pytest.approx(value, nan_ok=True)
+
+    # No new bars: the previous snapshot is returned unchanged.
+    assert engine.update_frame(data) is latest
+
+
+def test_update_frame_missing_column():
+    data = make_bars(10).drop(columns=["close_btc-usd"])
+    with pytest.raises(KeyError):
+        StreamingIndicators().update_frame(data)
+
+
+def test_streaming_matches_pandas_ta():
+    pytest.importorskip("pandas_ta")
+    from app.data_fetcher import calculate_indicators
+
+    data = make_bars()
+    expected = calculate_indicators(data.copy())
+    result = stream(data)
+
+    # Compare past every warm-up period and the first PSAR reversal.
+    tail = slice(-100, None)
+    for column in result.columns:
+        if column not in expected.columns or column == "ICS_26":
+            continue
+        np.testing.assert_allclose(
+            result[column].to_numpy()[tail],
+            expected[column].to_numpy()[tail].astype(float),
+            rtol=1e-6, atol=1e-6, equal_nan=True, err_msg=column,
+        )
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from app.background import SymbolPipeline
+from app.ingest import (
+    BarAggregator,
+    Trade,
+    WebSocketSource,
+    alpaca_subscription,
+    ingest,
+    parse_alpaca_trades,
+)
+
+T0 = 1751328000.0  # 2025-07-01 00:00:00 UTC, a minute boundary
+
+
+def alpaca_trade(symbol: str, price: float, size: float, timestamp: str) -> dict:
+    return {"T": "t", "S": symbol, "p": price, "s": size, "t": timestamp, "i": 1, "tks": "B"}
+
+
+def iso(timestamp: float) -> str:
+    seconds = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(timestamp))
+    return f"{seconds}.{int(timestamp % 1 * 1e6):06d}Z"
+
+
+def test_parse_alpaca_trades_handles_nanoseconds_and_control_messages():
+    message = json.dumps([
+        {"T": "success", "msg": "authenticated"},
+        alpaca_trade("BTC/USD", 100.5, 0.25, "2025-07-01T00:00:01.123456789Z"),
+    ])
+
+    assert parse_alpaca_trades(message) == [Trade("BTC/USD", 100.5, 0.25, T0 + 1.123456)]
+
+
+def test_aggregator_builds_ohlcv_and_closes_on_next_interval():
+    aggregator = BarAggregator(["BTC-USD"])
+    for offset, price, size in ((1, 100, 1), (20, 105, 2), (40, 98, 1), (59, 101, 3)):
+        assert aggregator.add(Trade("BTC-USD", price, size, T0 + offset)) is None
+
+    bar = aggregator.add(Trade("BTC-USD", 102, 1, T0 + 61))
+
+    assert (bar.start, bar.open, bar.high, bar.low, bar.close, bar.volume) == (
+        T0, 100, 105, 98, 101, 7,
+    )
+    assert aggregator.add(Trade("BTC-USD", 1, 1, T0 + 30)) is None  # Late
+    assert aggregator.late_trades == 1
+    assert aggregator.add(Trade("XRP-USD", 1, 1, T0)) is None  # Not subscribed
+
+
+def test_close_until_closes_quiet_symbols():
+    aggregator = BarAggregator(["BTC-USD", "ETH-USD"])
+    aggregator.add(Trade("BTC-USD", 100, 1, T0 + 5))
+    aggregator.add(Trade("ETH-USD", 10, 1, T0 + 5))
+    aggregator.add(Trade("BTC-USD", 101, 1, T0 + 60.5))
+    assert not aggregator.closed_through(T0 + 60)
+
+    closed = aggregator.close_until(T0 + 60)
+
+    assert [bar.symbol for bar in closed] == ["ETH-USD"]
+    assert aggregator.closed_through(T0 + 60)
+
+
+def test_seeded_frame_feeds_the_indicator_stage():
+    pd = pytest.importorskip("pandas")
+    aggregator = BarAggregator(["ETH-USD"])
+    index = pd.date_range("2025-06-30 23:00", periods=60, freq="1min", tz="UTC")
+    aggregator.seed("ETH-USD", pd.DataFrame({
+        "close_eth-usd": range(60), "high_eth-usd": range(1, 61),
+        "low_eth-usd": range(60), "open_eth-usd": range(60), "volume_eth-usd": 1.0,
+    }, index=index).astype(float))
+    aggregator.add(Trade("ETH-USD", 500, 1, T0 + 1))
+    aggregator.close_until(T0 + 60)
+
+    frame = aggregator.frame("ETH-USD")
+    assert list(frame.columns) == [
+        "open_eth-usd", "high_eth-usd", "low_eth-usd", "close_eth-usd", "volume_eth-usd",
+    ]
+    assert len(frame) == 61 and frame.index[-1] == pd.Timestamp(T0, unit="s", tz="UTC")
+
+    pipeline = SymbolPipeline("ETH-USD", "ETHUSD")
+    indicators = asyncio.run(pipeline.compute_indicators(frame, closed=True))
+    assert indicators["close_eth-usd"] == 500.0  # The streamed bar is not dropped
+
+
+def test_frames_survive_later_bars_overwriting_the_ring():
+    pytest.importorskip("pandas")
+    aggregator = BarAggregator(["BTC-USD"], max_bars=2)
+    for minute in range(2):
+        aggregator.add(Trade("BTC-USD", 100.0 + minute, 1, T0 + 60 * minute))
+    aggregator.close_until(T0 + 120)
+    frame = aggregator.frame("BTC-USD")  # Queued for the indicator stage
+
+    aggregator.add(Trade("BTC-USD", 999.0, 1, T0 + 120))
+    aggregator.close_until(T0 + 180)
+
+    assert frame["close_btc-usd"].tolist() == [100.0, 101.0]
+
+
+class ReplayServer:
+    """Replays recorded stream messages to every client that subscribes."""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.received = []
+
+    async def handler(self, connection, path=None):
+        self.received.append(json.loads(await connection.recv()))
+        self.received.append(json.loads(await connection.recv()))
+        for message, delay in self.messages:
+            await asyncio.sleep(delay)
+            await connection.send(json.dumps(message))
+        await connection.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_replayed_stream_closes_bars_within_milliseconds():
+    websockets = pytest.importorskip("websockets")
+    boundary = (time.time() // 60 + 1) * 60
+    server = ReplayServer([
+        ([{"T": "success", "msg": "authenticated"}], 0),
+        ([alpaca_trade("BTC/USD", 100, 1, iso(boundary - 30))], 0),
+        ([alpaca_trade("ETH/USD", 10, 1, iso(boundary - 20))], 0),
+        ([alpaca_trade("BTC/USD", 101, 1, iso(boundary + 0.1))], 0.05),
+        ([alpaca_trade("ETH/USD", 11, 1, iso(boundary + 0.2))], 0),
+    ])
+    async with websockets.serve(server.handler, "127.0.0.1", 0) as ws_server:
+        port = ws_server.sockets[0].getsockname()[1]
+        symbols = {"BTC/USD": "BTC-USD", "ETH/USD": "ETH-USD"}
+        aggregator = BarAggregator(symbols.values())
+        source = WebSocketSource(
+            f"ws://127.0.0.1:{port}", symbols,
+            subscribe=alpaca_subscription(symbols, "key", "secret"),
+        )
+        task = asyncio.create_task(ingest(source, aggregator))
+        try:
+            started = time.perf_counter()
+            frames = await aggregator.wait_closed(boundary, timeout=5)
+            waited = time.perf_counter() - started
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    assert server.received[0]["action"] == "auth"
+    assert server.received[1] == {"action": "subscribe", "trades": ["BTC/USD", "ETH/USD"]}
+    assert frames["BTC-USD"]["close_btc-usd"].tolist() == [100.0]
+    assert frames["ETH-USD"]["close_eth-usd"].tolist() == [10.0]
+    assert waited < 1.0  # Closed by the next trades, not by the timeout
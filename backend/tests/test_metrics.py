@@ -0,0 +1,72 @@
+import pytest
+
+from app.metrics import TICK_OVERRUNS, Counter, Histogram, Registry
+from app.scheduler import TickScheduler
+
+
+def test_counter_renders_labelled_series():
+    counter = Counter("errors_total", "Errors.", ("type",))
+    counter.inc(type="timeout")
+    counter.inc(2, type='bad "json"')
+
+    assert counter.value(type="timeout") == 1
+    assert counter.render() == [
+        "# HELP errors_total Errors.",
+        "# TYPE errors_total counter",
+        'errors_total{type="bad \\"json\\""} 2',
+        'errors_total{type="timeout"} 1',
+    ]
+
+
+def test_counter_rejects_unknown_labels():
+    counter = Counter("errors_total", "Errors.", ("type",))
+
+    with pytest.raises(ValueError):
+        counter.inc(stage="fetch")
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("stage_seconds", "Stages.", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, stage="llm")
+
+    lines = histogram.render()[2:]
+    assert lines == [
+        'stage_seconds_bucket{stage="llm",le="0.1"} 2',
+        'stage_seconds_bucket{stage="llm",le="1.0"} 3',
+        'stage_seconds_bucket{stage="llm",le="+Inf"} 4',
+        'stage_seconds_sum{stage="llm"} 3.65',
+        'stage_seconds_count{stage="llm"} 4',
+    ]
+
+
+def test_histogram_time_observes_failed_blocks():
+    histogram = Histogram("stage_seconds", "Stages.", ("stage",))
+
+    with pytest.raises(RuntimeError):
+        with histogram.time(stage="order"):
+            raise RuntimeError("rejected")
+
+    assert histogram.count(stage="order") == 1
+
+
+def test_registry_renders_all_metrics():
+    registry = Registry()
+    registry.register(Counter("a_total", "A."))
+    registry.register(Histogram("b_seconds", "B.")).observe(0.2)
+
+    text = registry.render()
+    assert "# TYPE a_total counter" in text
+    assert "b_seconds_count 1" in text
+    assert text.endswith("\n")
+
+
+def test_scheduler_overruns_are_counted():
+    now = [100.0]
+    scheduler = TickScheduler(60, deadline_seconds=10, clock=lambda: now[0])
+    before = TICK_OVERRUNS.value()
+
+    now[0] = 130.0
+    scheduler.finish(tick=100.0, started=100.0)
+
+    assert TICK_OVERRUNS.value() == before + 1
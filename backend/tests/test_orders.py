@@ -0,0 +1,270 @@
+import json
+import sqlite3
+import threading
+
+import httpx
+import pytest
+import pytest_asyncio
+import respx  # noqa: F401
+from respx import MockRouter
+
+from app.config import settings
+from app.metrics import ORDER_LATENCY
+from app.orders import OrderTracker, client_order_id, slippage_bps
+from app.ratelimit import RateLimiter
+from app.trader import AlpacaTrader
+
+ALPACA_API_BASE_URL = "https://paper-api.alpaca.markets"
+
+
+def order_json(status: str, **fields) -> dict:
+    return {
+        "id": "o1", "client_order_id": "BTCUSD-buy-60", "symbol": "BTCUSD",
+        "qty": "2", "side": "buy", "type": "market", "status": status, **fields,
+    }
+
+
+@pytest_asyncio.fixture
+async def trader():
+    settings.ALPACA_API_KEY = "test_key"
+    settings.ALPACA_SECRET_KEY = "test_secret"
+    settings.APCA_API_BASE_URL = ALPACA_API_BASE_URL
+    trader_instance = AlpacaTrader(limiter=RateLimiter("alpaca", backoff_seconds=0.0))
+    trader_instance.ledger.reconcile(1000.0, {})
+    yield trader_instance
+    await trader_instance.aclose()
+
+
+def test_client_order_id_is_deterministic():
+    assert client_order_id("BTC/USD", "buy", 60.7) == "BTCUSD-buy-60"
+    assert client_order_id("BTC/USD", "buy", 60.7) == client_order_id("BTC/USD", "buy", 60.0)
+    assert client_order_id("BTC/USD", "sell", 60.0) != client_order_id("BTC/USD", "buy", 60.0)
+
+
+def test_slippage_is_positive_when_adverse():
+    assert slippage_bps("buy", 100.0, 100.1) == pytest.approx(10.0)
+    assert slippage_bps("sell", 100.0, 100.1) == pytest.approx(-10.0)
+
+
+@pytest.mark.asyncio
+async def test_submit_polls_until_filled(trader, respx_mock: MockRouter, tmp_path):
+    respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(
+        return_value=httpx.Response(200, json=order_json("new"))
+    )
+    poll = respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/orders/o1").mock(side_effect=[
+        httpx.Response(200, json=order_json("new")),
+        httpx.Response(200, json=order_json(
+            "filled", filled_qty="2", filled_avg_price="100.5",
+            filled_at="1970-01-01T00:00:03.25Z",
+        )),
+    ])
+    clock = iter([10.0, 10.0, 10.5] + [99.0] * 100)  # Opened, submitted, acked, then later
+    tracker = OrderTracker(
+        trader, str(tmp_path / "orders.db"), poll_seconds=0.01, clock=lambda: next(clock),
+    )
+    fills = []
+    tracker.on_fill.append(fills.append)
+    fills_before = ORDER_LATENCY.count(phase="submit_to_fill")
+
+    order = await tracker.submit("BTCUSD", 2, "buy", 100.0, bar_time=60.0, signal_time=1.0)
+    assert order.id == "o1"
+    await tracker._tasks["BTCUSD-buy-60"]
+
+    record = tracker.get("BTCUSD-buy-60")
+    assert poll.call_count == 2
+    assert record["status"] == "filled"
+    assert record["fill_price"] == 100.5
+    assert record["slippage_bps"] == pytest.approx(50.0)
+    # Fill latencies use the broker's filled_at, not when the poll saw it
+    assert record["filled_at"] == 3.25
+    assert record["submit_to_ack_ms"] == pytest.approx(500.0)
+    assert record["signal_to_fill_ms"] == pytest.approx(2250.0)
+    assert ORDER_LATENCY.count(phase="submit_to_fill") == fills_before + 1
+    assert fills == [record]
+    # Nothing was booked on submit; the fill was booked at its own price
+    assert trader.ledger.position("BTCUSD") == 2.0
+    assert trader.ledger.cash == pytest.approx(1000.0 - 2 * 100.5)
+    assert tracker.summary()["slippage_bps"]["p50"] == pytest.approx(50.0)
+    await tracker.aclose()
+
+
+@pytest.mark.asyncio
+async def test_canceled_order_marks_ledger_stale(trader, respx_mock: MockRouter, tmp_path):
+    respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(
+        return_value=httpx.Response(200, json=order_json("new"))
+    )
+    respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/orders/o1").mock(
+        return_value=httpx.Response(200, json=order_json("canceled"))
+    )
+    tracker = OrderTracker(trader, str(tmp_path / "orders.db"), poll_seconds=0.01)
+
+    await tracker.submit("BTCUSD", 2, "buy", 100.0, bar_time=60.0)
+    await tracker._tasks["BTCUSD-buy-60"]
+
+    assert tracker.get("BTCUSD-buy-60")["status"] == "canceled"
+    assert trader.ledger.stale
+    await tracker.aclose()
+
+
+@pytest.mark.asyncio
+async def test_partial_fills_are_booked_as_they_are_reported(trader, respx_mock: MockRouter, tmp_path):
+    respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(
+        return_value=httpx.Response(200, json=order_json("new"))
+    )
+    respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/orders/o1").mock(side_effect=[
+        httpx.Response(200, json=order_json(
+            "partially_filled", filled_qty="0.5", filled_avg_price="100",
+        )),
+        httpx.Response(200, json=order_json(
+            "filled", filled_qty="2", filled_avg_price="101",
+        )),
+    ])
+    tracker = OrderTracker(trader, str(tmp_path / "orders.db"), poll_seconds=0.01)
+
+    await tracker.submit("BTCUSD", 2, "buy", 100.0, bar_time=60.0)
+    assert trader.ledger.position("BTCUSD") == 0.0  # Acknowledged, not filled
+    await tracker._tasks["BTCUSD-buy-60"]
+
+    assert trader.ledger.position("BTCUSD") == 2.0
+    assert trader.ledger.cash == pytest.approx(1000.0 - 2 * 101)
+    assert tracker.get("BTCUSD-buy-60")["booked_qty"] == 2.0
+    await tracker.aclose()
+
+
+@pytest.mark.asyncio
+async def test_failed_submit_is_recorded(trader, respx_mock: MockRouter, tmp_path):
+    respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(
+        return_value=httpx.Response(500, json={"message": "API error"})
+    )
+    respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/orders:by_client_order_id").mock(
+        return_value=httpx.Response(404, json={"message": "not found"})
+    )
+    tracker = OrderTracker(trader, str(tmp_path / "orders.db"))
+
+    assert await tracker.submit("BTCUSD", 2, "buy", 100.0, bar_time=60.0) is None
+    assert tracker.get("BTCUSD-buy-60")["status"] == "failed"
+    assert not tracker._tasks
+    await tracker.aclose()
+
+
+@pytest.mark.asyncio
+async def test_orders_persist_and_resume(trader, respx_mock: MockRouter, tmp_path):
+    path = str(tmp_path / "orders.db")
+    respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(
+        return_value=httpx.Response(200, json=order_json("new"))
+    )
+    poll = respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/orders/o1").mock(
+        return_value=httpx.Response(200, json=order_json("new"))
+    )
+    tracker = OrderTracker(trader, path, poll_seconds=10.0)
+    await tracker.submit("BTCUSD", 2, "buy", 100.0, bar_time=60.0)
+    await tracker.aclose()  # Stops before the first poll
+
+    poll.mock(return_value=httpx.Response(200, json=order_json(
+        "filled", filled_qty="2", filled_avg_price="99.0",
+    )))
+    reopened = OrderTracker(trader, path, poll_seconds=0.01)
+    assert reopened.get("BTCUSD-buy-60")["status"] == "new"
+    assert reopened.resume() == 1
+    await reopened._tasks["BTCUSD-buy-60"]
+
+    record = reopened.recent(symbol="BTCUSD")[0]
+    assert record["status"] == "filled"
+    assert record["slippage_bps"] == pytest.approx(-100.0)
+    await reopened.aclose()
+
+
+@pytest.mark.asyncio
+async def test_resubmitting_an_acknowledged_order_keeps_its_record(
+    trader, respx_mock: MockRouter, tmp_path
+):
+    filled = order_json("filled", filled_qty="2", filled_avg_price="100")
+    submit = respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(
+        return_value=httpx.Response(200, json=filled)
+    )
+    respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/orders/o1").mock(
+        return_value=httpx.Response(200, json=filled)
+    )
+    tracker = OrderTracker(trader, str(tmp_path / "orders.db"), poll_seconds=10.0)
+    await tracker.submit("BTCUSD", 2, "buy", 100.0, bar_time=60.0, signal_time=1.0)
+    first = dict(tracker.get("BTCUSD-buy-60"))
+
+    order = await tracker.submit("BTCUSD", 2, "buy", 100.0, bar_time=60.0, signal_time=5.0)
+
+    assert order.id == "o1"
+    assert submit.call_count == 1
+    assert tracker.get("BTCUSD-buy-60") == first
+    assert trader.ledger.position("BTCUSD") == 2  # Booked once
+    await tracker.aclose()
+
+
+@pytest.mark.asyncio
+async def test_finished_orders_past_retention_are_pruned(trader, respx_mock: MockRouter, tmp_path):
+    path = str(tmp_path / "orders.db")
+    respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(side_effect=[
+        httpx.Response(200, json=order_json("filled", filled_qty="2", filled_avg_price="100")),
+        httpx.Response(200, json=dict(order_json("new"), id="o2")),
+    ])
+    now = 1000.0
+    tracker = OrderTracker(trader, path, poll_seconds=10.0, clock=lambda: now)
+    await tracker.submit("BTCUSD", 2, "buy", 100.0, bar_time=60.0)
+    await tracker.submit("BTCUSD", 2, "sell", 100.0, bar_time=120.0)
+    await tracker.aclose()
+
+    now += 8 * 24 * 3600
+    reopened = OrderTracker(trader, path, retention_seconds=7 * 24 * 3600, clock=lambda: now)
+
+    # The filled order is gone; the open one is kept for resume
+    assert reopened.get("BTCUSD-buy-60") is None
+    assert reopened.get("BTCUSD-sell-120")["status"] == "new"
+    assert reopened.summary()["orders"] == 1
+    await reopened.aclose()
+
+
+@pytest.mark.asyncio
+async def test_rows_are_written_off_the_event_loop(trader, respx_mock: MockRouter, tmp_path, monkeypatch):
+    respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(
+        return_value=httpx.Response(200, json=order_json("filled", filled_qty="2", filled_avg_price="100"))
+    )
+    tracker = OrderTracker(trader, str(tmp_path / "orders.db"))
+    writers = []
+    upsert = tracker._upsert
+
+    def record(rows):
+        writers.append(threading.current_thread().name)
+        upsert(rows)
+
+    monkeypatch.setattr(tracker, "_upsert", record)
+    await tracker.submit("BTCUSD", 2, "buy", 100.0, bar_time=60.0)
+    tracker.flush()
+
+    assert writers and set(writers) == {"orders-db"}
+    status, = tracker._db.execute(
+        "SELECT status FROM orders WHERE client_order_id = 'BTCUSD-buy-60'"
+    ).fetchone()
+    assert status == "filled"
+    await tracker.aclose()
+
+
+@pytest.mark.asyncio
+async def test_tables_without_prune_columns_are_migrated(trader, tmp_path):
+    path = str(tmp_path / "orders.db")
+    old = {"client_order_id": "BTCUSD-buy-60", "symbol": "BTCUSD", "status": "filled",
+           "submitted_at": 1.0}
+    with sqlite3.connect(path) as db:
+        db.execute(
+            "CREATE TABLE orders (client_order_id TEXT PRIMARY KEY, symbol TEXT NOT NULL,"
+            " data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        db.execute("INSERT INTO orders VALUES (?, ?, ?, ?)",
+                   (old["client_order_id"], "BTCUSD", json.dumps(old), 1.0))
+    db.close()
+
+    tracker = OrderTracker(trader, path, retention_seconds=10.0, clock=lambda: 100.0)
+
+    assert tracker.get("BTCUSD-buy-60") is None  # Pruned through the new columns
+    plan = " ".join(str(row) for row in tracker._db.execute(
+        "EXPLAIN QUERY PLAN DELETE FROM orders WHERE status IN ('filled') AND submitted_at < 1"
+    ))
+    assert "orders_retention" in plan
+    await tracker.aclose()
@@ -0,0 +1,53 @@
+import math
+
+from app.prompt import PromptBuilder, estimate_tokens, format_value
+
+
+def test_format_value_rounds_to_significant_digits():
+    assert format_value(30123.456) == "30123"
+    assert format_value(54.32187) == "54.322"
+    assert format_value(0.0012345678) == "0.0012346"
+    assert format_value(-1.5) == "-1.5"
+    assert format_value(0.0) == "0"
+
+
+def test_select_keeps_configured_indicators_and_drops_nans():
+    builder = PromptBuilder(indicators=["close", "RSI_14", "ADX_14", "OBV"])
+    selected = builder.select({
+        "close_btc-usd": 30000.5,
+        "open_btc-usd": 29990.0,
+        "RSI_14": 55.5,
+        "ADX_14": math.nan,
+        "ISA_9": 1.0,
+    })
+    assert selected == {"close": 30000.5, "RSI_14": 55.5}
+
+
+def test_table_single_symbol_is_compact_csv():
+    builder = PromptBuilder(indicators=["close", "RSI_14"])
+    table, tokens = builder.table({None: {"close_btc-usd": 30123.456,
+                                          "RSI_14": 54.32187}})
+    assert table == "close,RSI_14\n30123,54.322"
+    assert tokens == estimate_tokens(table)
+
+
+def test_table_multiple_symbols_leaves_missing_cells_empty():
+    builder = PromptBuilder(indicators=["RSI_14", "ADX_14"])
+    table, _ = builder.table({
+        "BTC-USD": {"RSI_14": 30.0, "ADX_14": 20.0},
+        "ETH-USD": {"RSI_14": 70.0, "ADX_14": math.nan},
+    })
+    assert table == "symbol,RSI_14,ADX_14\nBTC-USD,30,20\nETH-USD,70,"
+
+
+def test_table_drops_lowest_priority_columns_to_fit_budget():
+    names = [f"IND_{i}" for i in range(20)]
+    indicators = {name: 12345.678 for name in names}
+    builder = PromptBuilder(indicators=names, token_budget=20)
+
+    table, tokens = builder.table({None: indicators})
+
+    header = table.splitlines()[0].split(",")
+    assert tokens <= 20
+    assert header == names[:len(header)]
+    assert len(header) < len(names)
@@ -0,0 +1,163 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.metrics import RATE_LIMIT_QUEUE_DEPTH, RATE_LIMIT_RETRIES
+from app.ratelimit import HIGH, LOW, NORMAL, RateLimiter
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_requests_to_the_rate():
+    limiter = RateLimiter("test-rate", rate=50.0, burst=1)
+    started = time.monotonic()
+
+    for _ in range(6):
+        async with limiter.slot():
+            pass
+
+    # One token up front, then one every 20ms
+    assert time.monotonic() - started >= 0.09
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_limits_requests_in_flight():
+    limiter = RateLimiter("test-concurrency", max_concurrency=2)
+    running = peak = 0
+
+    async def call():
+        nonlocal running, peak
+        async with limiter.slot():
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(call() for _ in range(8)))
+
+    assert peak == 2
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_requests_are_served_first():
+    limiter = RateLimiter("test-priority", max_concurrency=1)
+    served = []
+
+    async def call(name: str, priority: int):
+        async with limiter.slot(priority):
+            served.append(name)
+
+    await limiter.acquire()  # Occupy the only slot so the rest queue up
+    calls = [
+        asyncio.create_task(call("poll", LOW)),
+        asyncio.create_task(call("account", NORMAL)),
+        asyncio.create_task(call("order", HIGH)),
+    ]
+    await asyncio.sleep(0)
+    assert limiter.queued == 3
+    assert RATE_LIMIT_QUEUE_DEPTH.value(provider="test-priority") == 3
+
+    limiter.release()
+    await asyncio.gather(*calls)
+
+    assert served == ["order", "account", "poll"]
+    assert RATE_LIMIT_QUEUE_DEPTH.value(provider="test-priority") == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_up_its_place():
+    limiter = RateLimiter("test-cancel", max_concurrency=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    limiter.release()
+
+    assert limiter.queued == 0
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_request_retries_429_and_5xx_with_jittered_backoff():
+    delays = []
+
+    async def sleep(seconds):
+        delays.append(seconds)
+
+    limiter = RateLimiter(
+        "test-retry", backoff_seconds=0.01, sleep=sleep, jitter=lambda: 0.5,
+    )
+    responses = iter([
+        httpx.Response(503),
+        httpx.Response(429, headers={"Retry-After": "0.05"}),
+        httpx.Response(200),
+    ])
+
+    async def send():
+        return next(responses)
+
+    response = await limiter.request(send)
+
+    assert response.status_code == 200
+    # Half of 10ms, then Retry-After beats half of 20ms
+    assert delays == [0.005, 0.05]
+    assert RATE_LIMIT_RETRIES.value(provider="test-retry", status="429") == 1
+    assert RATE_LIMIT_RETRIES.value(provider="test-retry", status="503") == 1
+
+
+@pytest.mark.asyncio
+async def test_request_gives_up_after_max_retries_and_skips_client_errors():
+    calls = 0
+
+    async def sleep(seconds):
+        pass
+
+    async def send(status):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(status)
+
+    limiter = RateLimiter("test-give-up", max_retries=2, sleep=sleep)
+
+    assert (await limiter.request(lambda: send(500))).status_code == 500
+    assert calls == 3
+    calls = 0
+    assert (await limiter.request(lambda: send(422))).status_code == 422
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_429_pauses_every_queued_request():
+    limiter = RateLimiter("test-pause", rate=1000.0, jitter=lambda: 0.0)
+    limiter.retry_delay(0, httpx.Response(429, headers={"Retry-After": "0.05"}))
+    started = time.monotonic()
+
+    async with limiter.slot():
+        pass
+
+    assert time.monotonic() - started >= 0.04
+
+
+@pytest.mark.asyncio
+async def test_non_idempotent_requests_retry_only_429():
+    calls = []
+
+    async def sleep(seconds):
+        pass
+
+    async def send(status):
+        calls.append(status)
+        return httpx.Response(status)
+
+    limiter = RateLimiter("test-non-idempotent", max_retries=2, sleep=sleep, jitter=lambda: 0.0)
+
+    response = await limiter.request(lambda: send(500), retry_server_errors=False)
+    assert response.status_code == 500
+    assert calls == [500]
+    await limiter.request(lambda: send(429), retry_server_errors=False)
+    assert calls == [500, 429, 429, 429]
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from app.ring import RingBuffer
+
+
+def test_views_are_contiguous_oldest_first_after_wrapping():
+    ring = RingBuffer(4, ["close"])
+    for i in range(10):
+        ring.append(i, {"close": float(i)})
+
+    assert ring.size == 4
+    assert ring.times().tolist() == [6, 7, 8, 9]
+    assert ring.column("close", last=2).tolist() == [8.0, 9.0]
+    assert ring.latest() == {"close": 9.0}
+
+
+def test_views_share_memory_and_are_read_only():
+    ring = RingBuffer(8, ["open", "close"])
+    ring.append(1, {"open": 1.0, "close": 2.0})
+    timestamps, values = ring.window()
+
+    assert np.shares_memory(values, ring._values)
+    assert values.shape == (2, 1)
+    with pytest.raises(ValueError):
+        values[0, 0] = 5.0
+
+
+def test_new_and_missing_columns_are_nan():
+    ring = RingBuffer(4, ["close"])
+    ring.append(1, {"close": 1.0})
+    ring.append(2, {"RSI_14": 55.0})
+
+    assert np.isnan(ring.column("close")[-1])
+    assert np.isnan(ring.column("RSI_14")[0])
+    assert ring.column("missing").size == 0
+
+
+def test_extend_keeps_newest_rows():
+    ring = RingBuffer(3, dtype="float32")
+    ring.append(0, {"close": 0.0})
+    ring.extend(np.arange(1, 6), {"close": np.arange(1, 6, dtype=float)})
+
+    assert ring.times().tolist() == [3, 4, 5]
+    assert ring.column("close").dtype == np.float32
+
+
+def test_memory_is_preallocated_and_bounded():
+    ring = RingBuffer(1440, ["open", "high", "low", "close", "volume"], dtype="float32")
+    before = ring.nbytes
+    for i in range(5000):
+        ring.append(i, {"close": 1.0})
+
+    assert ring.nbytes == before == 2 * 1440 * (8 + 4 * 5)
+
+
+def test_a_full_window_is_overwritten_by_the_next_append():
+    ring = RingBuffer(3, ["close"])
+    for i in range(3):
+        ring.append(i, {"close": float(i)})
+    _, values = ring.window()
+    newest = ring.column("close", last=2)
+
+    ring.append(3, {"close": 3.0})
+
+    # Documented aliasing: the oldest row of a full view goes first
+    assert values[0].tolist() == [3.0, 1.0, 2.0]
+    assert newest.tolist() == [1.0, 2.0]
+
+
+@pytest.mark.parametrize("appended", range(1, 12))
+def test_unmirrored_buffer_matches_mirrored(appended):
+    mirrored, flat = RingBuffer(4, ["close"]), RingBuffer(4, ["close"], mirrored=False)
+    for i in range(appended):
+        mirrored.append(i, {"close": float(i)})
+        flat.append(i, {"close": float(i)})
+
+    assert flat.nbytes * 2 == mirrored.nbytes
+    for last in (None, 1, 3, 4):
+        assert flat.times(last).tolist() == mirrored.times(last).tolist()
+        assert flat.window(last)[1].tolist() == mirrored.window(last)[1].tolist()
+    assert flat.latest() == mirrored.latest()
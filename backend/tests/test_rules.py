@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from app.rules import (
+    Cooldown,
+    DuplicateSignal,
+    IndicatorDelta,
+    Rule,
+    RuleState,
+    ThinkerRules,
+    VolatilityGate,
+    default_rules,
+)
+from app.thinker import should_execute_trade
+
+
+def test_duplicate_and_delta_rules_track_the_last_approval():
+    rules = default_rules(min_rsi_change=1.0)
+    signals = ["buy", "buy", "sell", "sell", "hold", "hold", "moon"]
+    rsi = [30.0, 40.0, 30.5, 35.0, 35.2, 50.0, 60.0]
+
+    approved, reasons, state = rules.evaluate_batch(signals, {"RSI_14": rsi})
+
+    assert approved.tolist() == [True, False, False, True, False, True, False]
+    assert reasons[1] == "duplicate consecutive signal"
+    assert reasons[2].startswith("RSI_14 change (0.50)")
+    assert reasons[6] == "invalid signal"
+    assert state.last_signal == "hold"
+    assert state.last_values == {"RSI_14": 50.0}
+
+
+def test_cooldown_only_applies_to_trades():
+    rules = ThinkerRules([Cooldown(seconds=300)])
+    times = [0, 60, 120, 400, 450]
+
+    approved, _, state = rules.evaluate_batch(
+        ["buy", "hold", "sell", "sell", "buy"], {}, times
+    )
+
+    assert approved.tolist() == [True, True, False, True, False]
+    assert state.last_trade_time == 400
+
+
+def test_volatility_gate_blocks_trades_outside_the_band():
+    rules = ThinkerRules([VolatilityGate("ATRr_14", relative_to="close", max_value=0.01)])
+    columns = {"ATRr_14": [0.5, 2.0, 2.0, np.nan], "close_btc-usd": [100.0] * 4}
+
+    approved, reasons, _ = rules.evaluate_batch(["buy", "buy", "hold", "sell"], columns)
+
+    assert approved.tolist() == [True, False, True, True]
+    assert reasons[1] == "ATRr_14 volatility gate"
+
+
+def test_base_rule_blocks_nothing():
+    rules = ThinkerRules([Rule()])
+
+    approved, reasons, _ = rules.evaluate_batch(["buy", "hold", "sell"], {})
+
+    assert approved.tolist() == [True, True, True]
+    assert Rule().check("buy", {}, 0, 0.0, RuleState()) is None
+
+
+def test_scalar_and_batch_evaluation_agree():
+    rng = np.random.default_rng(3)
+    n = 2000
+    signals = rng.choice(["buy", "sell", "hold"], n)
+    columns = {
+        "RSI_14": rng.uniform(0, 100, n),
+        "ATRr_14": rng.uniform(0, 3, n),
+        "close": np.full(n, 100.0),
+    }
+    times = np.arange(n) * 60.0
+    rules = ThinkerRules([
+        VolatilityGate(max_value=0.02), DuplicateSignal(),
+        IndicatorDelta("RSI_14", 5.0), Cooldown(600),
+    ])
+
+    batch, _, _ = rules.evaluate_batch(signals, columns, times)
+
+    state = RuleState()
+    scalar = []
+    for i in range(n):
+        indicators = {name: values[i] for name, values in columns.items()}
+        ok = rules.evaluate(signals[i], indicators, times[i], state) is None
+        if ok:
+            state = RuleState(signals[i], {"RSI_14": indicators["RSI_14"]},
+                              times[i] if signals[i] != "hold" else state.last_trade_time)
+        scalar.append(ok)
+    assert batch.tolist() == scalar
+
+
+@pytest.mark.asyncio
+async def test_should_execute_trade_uses_compiled_rules():
+    rules = ThinkerRules([Cooldown(seconds=300)])
+
+    assert await should_execute_trade(
+        "buy", last_executed_signal="sell", rules=rules,
+        last_trade_time=1000.0, now=1100.0,
+    ) is False
+    assert await should_execute_trade(
+        "buy", last_executed_signal="sell", rules=rules,
+        last_trade_time=1000.0, now=1400.0,
+    ) is True
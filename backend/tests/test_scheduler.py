@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from app.scheduler import TickScheduler, run_pipelined
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+def test_next_tick_is_bar_aligned_with_offset():
+    scheduler = TickScheduler(60, offset_seconds=2, clock=FakeClock(0))
+
+    assert scheduler.next_tick(now=119.0) == 122.0
+    assert scheduler.next_tick(now=122.0) == 182.0
+    assert scheduler.next_tick(now=1.0) == 2.0
+
+
+@pytest.mark.asyncio
+async def test_wait_for_tick_compensates_drift_and_counts_skips():
+    clock = FakeClock(1000.5)
+    scheduler = TickScheduler(60, clock=clock, sleep=clock.sleep)
+
+    assert await scheduler.wait_for_tick() == 1020.0
+    clock.now += 17.3  # Work done during the tick does not shift the next one
+    assert await scheduler.wait_for_tick() == 1080.0
+    clock.now += 130.0  # Overran two boundaries
+    assert await scheduler.wait_for_tick() == 1260.0
+    assert scheduler.skipped == 2
+    assert scheduler.last_wake_lag == 0.0
+
+
+def test_finish_reports_overruns():
+    clock = FakeClock(100.0)
+    scheduler = TickScheduler(60, deadline_seconds=10, clock=clock)
+
+    clock.now = 105.0
+    scheduler.finish(tick=100.0, started=100.0)
+    clock.now = 125.0
+    scheduler.finish(tick=100.0, started=101.0)
+
+    stats = scheduler.stats()
+    assert stats["ticks"] == 2
+    assert stats["overruns"] == 1
+    assert stats["max_duration"] == 24.0
+
+
+@pytest.mark.asyncio
+async def test_next_fetch_overlaps_a_slow_process_stage():
+    clock = FakeClock(0.0)
+    boundaries: asyncio.Queue = asyncio.Queue()
+
+    async def sleep(seconds: float):
+        await boundaries.get()  # The test decides when each boundary arrives
+        clock.now += seconds
+
+    scheduler = TickScheduler(60, clock=clock, sleep=sleep)
+    events = []
+    fetched: asyncio.Queue = asyncio.Queue()
+    processed: asyncio.Queue = asyncio.Queue()
+    release = asyncio.Event()
+
+    async def fetch(tick):
+        events.append(("fetch", tick))
+        fetched.put_nowait(tick)
+        return tick
+
+    async def process(tick, data):
+        events.append(("process", data))
+        if data == 0.0:
+            await release.wait()  # A slow LLM call
+        processed.put_nowait(data)
+
+    task = asyncio.create_task(run_pipelined(scheduler, fetch, process))
+    assert await fetched.get() == 0.0
+    # Two more ticks are fetched while the first one is still processing
+    boundaries.put_nowait(None)
+    assert await fetched.get() == 60.0
+    boundaries.put_nowait(None)
+    assert await fetched.get() == 120.0
+    assert scheduler.skipped == 1  # The stale 60s tick was dropped, newest kept
+
+    release.set()
+    assert await processed.get() == 0.0
+    assert await processed.get() == 120.0
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert events == [
+        ("fetch", 0.0), ("process", 0.0),
+        ("fetch", 60.0), ("fetch", 120.0),
+        ("process", 120.0),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_fetch_errors_wait_for_the_next_tick():
+    scheduler = TickScheduler(0.05)
+    calls = []
+
+    async def fetch(tick):
+        calls.append(tick)
+        raise RuntimeError("network down")
+
+    async def process(tick, data):
+        raise AssertionError("nothing to process")
+
+    task = asyncio.create_task(run_pipelined(scheduler, fetch, process))
+    await asyncio.sleep(0.12)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert 2 <= len(calls) <= 4  # No busy retry
@@ -0,0 +1,162 @@
+import math
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.metrics import STAGE_SECONDS
+from app.models import DeepSeekErrorResponse
+from app.signal_cache import (
+    SignalCache,
+    get_cached_trading_signal,
+    get_cached_trading_signals,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(clock):
+    return SignalCache(buckets={"RSI_14": 2.0, "ADX_14": 5.0}, max_size=2,
+                       ttl_seconds=60, clock=clock, indicators=["close", "RSI_14"])
+
+
+def test_key_quantizes_configured_indicators(cache: SignalCache):
+    a = cache.key({"RSI_14": 50.1, "ADX_14": 21.0, "close_btc-usd": 30000.0})
+    b = cache.key({"RSI_14": 51.9, "ADX_14": 24.9, "close_btc-usd": 30010.0})
+    c = cache.key({"RSI_14": 52.0, "ADX_14": 21.0, "close_btc-usd": 30000.0})
+    assert a == b
+    assert a != c
+    assert cache.key({"RSI_14": math.nan}) == (
+        None, ("ADX_14", None), ("RSI_14", None), ("close", None),
+    )
+
+
+def test_key_covers_every_prompt_indicator(clock):
+    cache = SignalCache(buckets={"RSI_14": 2.0}, clock=clock)  # Default prompt list
+    base = {"RSI_14": 50.0, "close_btc-usd": 30000.0, "MACDh_12_26_9": 0.5}
+
+    assert cache.key(base) == cache.key(dict(base, **{"close_btc-usd": 30001.0}))
+    # A large price move or a MACD cross is a different prompt
+    assert cache.key(base) != cache.key(dict(base, **{"close_btc-usd": 30600.0}))
+    assert cache.key(base) != cache.key(dict(base, MACDh_12_26_9=-0.5))
+
+
+def test_non_finite_values_are_keyed_like_nan(cache: SignalCache):
+    nan = cache.key({"RSI_14": math.nan, "close": 1.0})
+
+    assert cache.key({"RSI_14": math.inf, "close": 1.0}) == nan
+    assert cache.key({"RSI_14": -math.inf, "close": 1.0}) == nan
+
+
+def test_symbols_do_not_share_entries(cache: SignalCache):
+    indicators = {"RSI_14": 30.0, "ADX_14": 20.0}
+    cache.put(indicators, "buy", symbol="BTC-USD")
+
+    assert cache.get(indicators, symbol="ETH-USD") is None
+    assert cache.get(indicators, symbol="BTC-USD") == "buy"
+
+
+def test_get_and_put_count_hits_and_misses(cache: SignalCache):
+    assert cache.get({"RSI_14": 50.0}) is None
+    cache.put({"RSI_14": 50.0}, "buy")
+    assert cache.get({"RSI_14": 51.0}) == "buy"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_entries_expire_after_ttl(cache: SignalCache, clock: FakeClock):
+    cache.put({"RSI_14": 50.0}, "sell")
+    clock.now = 61.0
+    assert cache.get({"RSI_14": 50.0}) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(cache: SignalCache):
+    cache.put({"RSI_14": 10.0}, "buy")
+    cache.put({"RSI_14": 20.0}, "hold")
+    cache.get({"RSI_14": 10.0})  # Touch so 20.0 becomes the oldest
+    cache.put({"RSI_14": 30.0}, "sell")
+    assert cache.get({"RSI_14": 20.0}) is None
+    assert cache.get({"RSI_14": 10.0}) == "buy"
+
+
+@pytest.mark.asyncio
+async def test_cached_signal_skips_network_round_trip(cache: SignalCache):
+    with patch("app.signal_cache.get_trading_signal",
+               AsyncMock(return_value="buy")) as analyzer:
+        first = await get_cached_trading_signal({"RSI_14": 30.0}, "key", cache)
+        second = await get_cached_trading_signal({"RSI_14": 31.0}, "key", cache)
+
+    assert first == second == "buy"
+    analyzer.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_only_cache_misses_are_timed_as_llm_calls(cache: SignalCache):
+    before = STAGE_SECONDS.count(stage="llm")
+    with patch("app.signal_cache.get_trading_signal", AsyncMock(return_value="buy")):
+        for rsi in (30.0, 31.0, 30.5):
+            await get_cached_trading_signal({"RSI_14": rsi}, "key", cache)
+
+    assert STAGE_SECONDS.count(stage="llm") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached(cache: SignalCache):
+    error = DeepSeekErrorResponse(error={"message": "boom", "type": "http_error"})
+    with patch("app.signal_cache.get_trading_signal",
+               AsyncMock(return_value=error)) as analyzer:
+        await get_cached_trading_signal({"RSI_14": 30.0}, "key", cache)
+        await get_cached_trading_signal({"RSI_14": 30.0}, "key", cache)
+
+    assert analyzer.await_count == 2
+    assert cache.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_batched_signals_only_request_cache_misses(cache: SignalCache):
+    cache.put({"RSI_14": 30.0}, "buy", symbol="BTC-USD")
+
+    async def fake_batch(indicators_by_symbol, api_key, stream):
+        return {symbol: "sell" for symbol in indicators_by_symbol}
+
+    with patch("app.signal_cache.get_trading_signals",
+               AsyncMock(side_effect=fake_batch)) as batch:
+        signals = await get_cached_trading_signals(
+            {"BTC-USD": {"RSI_14": 30.0}, "ETH-USD": {"RSI_14": 70.0},
+             "SOL-USD": {"RSI_14": 90.0}},
+            "key", cache, batch_size=1,
+        )
+
+    assert signals == {"BTC-USD": "buy", "ETH-USD": "sell", "SOL-USD": "sell"}
+    assert batch.await_count == 2  # Two misses, one symbol per batch
+    assert cache.get({"RSI_14": 70.0}, symbol="ETH-USD") == "sell"
+
+
+@pytest.mark.asyncio
+async def test_batched_symbols_with_equal_indicators_get_their_own_signals(cache: SignalCache):
+    cache.put({"RSI_14": 30.0}, "buy", symbol="BTC-USD")
+
+    async def fake_batch(indicators_by_symbol, api_key, stream):
+        return {symbol: "sell" for symbol in indicators_by_symbol}
+
+    with patch("app.signal_cache.get_trading_signals",
+               AsyncMock(side_effect=fake_batch)) as batch:
+        signals = await get_cached_trading_signals(
+            {"BTC-USD": {"RSI_14": 30.0}, "ETH-USD": {"RSI_14": 30.0}}, "key", cache,
+        )
+
+    assert signals == {"BTC-USD": "buy", "ETH-USD": "sell"}
+    assert batch.await_args.args[0] == {"ETH-USD": {"RSI_14": 30.0}}
@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+# Cold import of the API; fastapi itself accounts for most of it.
+IMPORT_BUDGET_SECONDS = 2.0
+HEAVY_MODULES = ("pandas", "pandas_ta", "yfinance", "alpaca_trade_api")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.api.main
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "seconds": elapsed,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def import_api() -> dict:
+    env = {
+        name: value for name, value in os.environ.items()
+        if name not in ("DEEPSEEK_API_KEY", "ALPACA_API_KEY", "ALPACA_SECRET_KEY")
+    }
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=backend, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_api_imports_without_credentials_or_heavy_dependencies():
+    probe = import_api()
+
+    assert probe["loaded"] == []
+
+
+def test_api_import_stays_within_budget():
+    # Best of three, so a busy machine does not fail the budget
+    seconds = min(import_api()["seconds"] for _ in range(3))
+
+    assert seconds < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,118 @@
+import json
+import threading
+
+import pytest
+
+from app import state
+from app.state import StateStore, load_state, save_state
+
+
+@pytest.fixture(autouse=True)
+def state_db(tmp_path, monkeypatch):
+    path = tmp_path / "state.db"
+    monkeypatch.setattr(state, "STATE_DB", str(path))
+    monkeypatch.setattr(state, "STATE_FILE", str(tmp_path / "state.json"))
+    yield path
+    state.close_store()
+
+
+def test_load_state_empty_store():
+    assert load_state() == (None, None)
+    assert load_state("BTC-USD") == (None, None)
+
+
+def test_save_and_load_state_per_symbol():
+    save_state("buy", {"RSI_14": 30.0}, 100.0, 1, symbol="BTC-USD")
+    save_state("sell", {"RSI_14": 70.0}, 200.0, 2, symbol="ETH-USD")
+
+    assert load_state("BTC-USD") == ("buy", {"RSI_14": 30.0})
+    assert load_state("ETH-USD") == ("sell", {"RSI_14": 70.0})
+    # Without a symbol the most recent save is returned.
+    assert load_state() == ("sell", {"RSI_14": 70.0})
+
+
+def test_loads_are_served_from_memory(state_db):
+    save_state("buy", {"RSI_14": 30.0}, 100.0, 1, symbol="BTC-USD")
+    state_db.unlink()  # Reads must not touch the journal
+
+    assert load_state("BTC-USD") == ("buy", {"RSI_14": 30.0})
+
+
+def test_state_is_recovered_and_journal_compacted(state_db):
+    store = StateStore(str(state_db), legacy_file=None)
+    for i in range(5):
+        store.put({"last_executed_signal": "buy", "last_price": float(i)}, "BTC-USD")
+    store.put({"last_executed_signal": "sell", "last_price": 9.0}, "ETH-USD")
+    store.close()  # Simulates a restart
+
+    recovered = StateStore(str(state_db), legacy_file=None)
+
+    assert recovered.get("BTC-USD")["last_price"] == 4.0
+    assert recovered.get()["last_executed_signal"] == "sell"
+    rows = recovered._db.execute("SELECT COUNT(*) FROM journal").fetchone()[0]
+    assert rows == 2
+    recovered.close()
+
+
+def test_journal_is_written_off_the_calling_thread(state_db, monkeypatch):
+    store = StateStore(str(state_db), legacy_file=None)
+    writers = []
+    append = store._append
+
+    def record(rows):
+        writers.append((threading.current_thread().name, len(rows)))
+        append(rows)
+
+    monkeypatch.setattr(store, "_append", record)
+    store.put({"last_executed_signal": "buy"}, "BTC-USD")
+    store.flush()
+
+    assert writers == [("state-journal", 1)]
+    rows = store._db.execute("SELECT COUNT(*) FROM journal").fetchone()[0]
+    assert rows == 1
+    store.close()
+
+
+def test_journal_is_compacted_every_n_writes(state_db):
+    store = StateStore(str(state_db), legacy_file=None, compact_every=4)
+    for i in range(3):
+        store.put({"last_price": float(i)}, "BTC-USD")
+        store.flush()
+    rows = store._db.execute("SELECT COUNT(*) FROM journal").fetchone()[0]
+    assert rows == 3
+
+    store.put({"last_price": 3.0}, "BTC-USD")
+    store.flush()
+
+    rows = store._db.execute("SELECT entry FROM journal").fetchall()
+    assert [json.loads(entry)["last_price"] for (entry,) in rows] == [3.0]
+    store.close()
+
+
+def test_legacy_state_file_is_imported_once(tmp_path, state_db):
+    legacy = tmp_path / "state.json"
+    legacy.write_text(json.dumps({
+        "last_executed_signal": "sell",
+        "last_indicators": {"RSI_14": 70.0},
+        "symbol": "ETH-USD",
+        "symbols": {
+            "BTC-USD": {"last_executed_signal": "buy", "last_indicators": {"RSI_14": 30.0}},
+            "ETH-USD": {"last_executed_signal": "sell", "last_indicators": {"RSI_14": 70.0}},
+        },
+    }))
+
+    store = StateStore(str(state_db), legacy_file=str(legacy))
+
+    assert store.get("BTC-USD")["last_executed_signal"] == "buy"
+    assert store.get("ETH-USD")["last_indicators"] == {"RSI_14": 70.0}
+    store.close()
+
+
+def test_corrupt_legacy_file_starts_clean(tmp_path, state_db):
+    legacy = tmp_path / "state.json"
+    legacy.write_text("{not json")
+
+    store = StateStore(str(state_db), legacy_file=str(legacy))
+
+    assert store.get("BTC-USD") == {}
+    store.close()
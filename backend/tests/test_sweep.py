@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.backtest import run_backtest
+from app.sweep import (
+    SharedArrays,
+    _attach,
+    _worker_arrays,
+    _worker_blocks,
+    grid,
+    random_search,
+    run_sweep,
+)
+
+
+def bars(n: int = 2000) -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    data = pd.DataFrame(
+        {"open": close, "high": close, "low": close, "close": close,
+         "volume": np.ones(n)},
+        index=pd.date_range("2024-01-01", periods=n, freq="1min"),
+    )
+    data["RSI_14"] = 50 + 40 * np.sin(np.arange(n) / 15)
+    return data
+
+
+def rsi_signals(frame: pd.DataFrame) -> np.ndarray:
+    rsi = frame["RSI_14"].to_numpy()
+    return np.where(rsi < 25, "buy", np.where(rsi > 75, "sell", "hold"))
+
+
+def identity(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame
+
+
+def test_grid_and_random_search():
+    assert grid({"a": [1, 2], "b": [3]}) == [{"a": 1, "b": 3}, {"a": 2, "b": 3}]
+    samples = random_search({"allocation": (0.2, 0.8)}, samples=5, seed=0)
+    assert len(samples) == 5
+    assert all(0.2 <= s["allocation"] <= 0.8 for s in samples)
+    assert samples == random_search({"allocation": (0.2, 0.8)}, samples=5, seed=0)
+
+
+def test_shared_arrays_are_mapped_not_copied():
+    shared = SharedArrays({"close": np.arange(5.0)})
+    try:
+        _attach(shared.specs)
+        shared_view = np.ndarray((5,), dtype=float, buffer=shared.blocks[0].buf)
+        shared_view[0] = 42.0
+        assert _worker_arrays["close"][0] == 42.0
+    finally:
+        del shared_view
+        _worker_arrays.clear()
+        for block in _worker_blocks:
+            block.close()
+        _worker_blocks.clear()
+        shared.close()
+
+
+def test_run_sweep_matches_serial_backtests_and_ranks():
+    data = bars()
+    parameter_sets = grid({
+        "min_rsi_change_threshold": [0.5, 5.0, 60.0],
+        "allocation": [0.3, 0.9],
+    })
+
+    ranked = run_sweep(data, rsi_signals, parameter_sets,
+                       indicators=identity, max_workers=2)
+
+    assert len(ranked) == len(parameter_sets)
+    assert ranked["total_return"].is_monotonic_decreasing
+    for row in ranked.itertuples():
+        serial = run_backtest(
+            data, rsi_signals, indicators=identity,
+            min_rsi_change_threshold=row.min_rsi_change_threshold,
+            allocation=row.allocation,
+        ).summary()
+        assert row.total_return == pytest.approx(serial["total_return"])
+        assert row.fills == serial["fills"]
@@ -1,102 +1,292 @@
+import asyncio
+import json
+
+import httpx
 import pytest
-from unittest.mock import MagicMock
+import pytest_asyncio
+import respx  # noqa: F401
+from respx import MockRouter
 
-from app.trader import AlpacaTrader
+from app.ratelimit import RateLimiter
+from app.trader import AlpacaTrader, PositionLedger
 from app.config import settings
 
-# Mock Alpaca API base URL (not directly used for mocking SDK methods, but good for context)
+# Mock Alpaca API base URL; requests are intercepted by respx
 ALPACA_API_BASE_URL = "https://paper-api.alpaca.markets"
 
 
-@pytest.fixture
-def trader():
-    # Create a mock for the Alpaca REST API client
-    mock_alpaca_api = MagicMock()
-
-    # Mock the methods that AlpacaTrader will call
-    # These methods are synchronous in the actual alpaca-trade-api client
-    mock_alpaca_api.submit_order = MagicMock()
-    mock_alpaca_api.get_account = MagicMock()
-    mock_alpaca_api.get_position = MagicMock()
-
-    # Temporarily set API keys for testing (though they won't be used by the mocked client)
+@pytest_asyncio.fixture
+async def trader():
+    # Temporarily set API keys for testing (requests never leave respx)
     settings.ALPACA_API_KEY = "test_key"
     settings.ALPACA_SECRET_KEY = "test_secret"
+    settings.APCA_API_BASE_URL = ALPACA_API_BASE_URL
 
-    # Create an instance of AlpacaTrader and inject the mocked API client
-    trader_instance = AlpacaTrader()
-    trader_instance.api = mock_alpaca_api
-    return trader_instance
+    trader_instance = AlpacaTrader(limiter=RateLimiter("alpaca", backoff_seconds=0.0))
+    yield trader_instance
+    await trader_instance.aclose()
 
 
 @pytest.mark.asyncio
-async def test_get_account_info_success(trader: AlpacaTrader):
-    # Configure the mock to return a successful account object
-    mock_account = MagicMock(status="ACTIVE", equity="100000.0",
-                             buying_power="50000.0")
-    trader.api.get_account.return_value = mock_account
+async def test_get_account_info_success(trader: AlpacaTrader, respx_mock: MockRouter):
+    route = respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/account").mock(
+        return_value=httpx.Response(200, json={
+            "status": "ACTIVE", "equity": "100000.0",
+            "buying_power": "50000.0", "cash": "50000.0",
+        })
+    )
 
     account = await trader.get_account_info()
     assert account is not None
     assert account.status == "ACTIVE"
     assert float(account.equity) == 100000.0
-    trader.api.get_account.assert_called_once()  # Verify the mock was called
+    assert route.call_count == 1
+    headers = route.calls.last.request.headers
+    assert headers["APCA-API-KEY-ID"] == "test_key"
+    assert headers["APCA-API-SECRET-KEY"] == "test_secret"
 
 
 @pytest.mark.asyncio
-async def test_get_account_info_failure(trader: AlpacaTrader):
-    # Configure the mock to raise an exception
-    trader.api.get_account.side_effect = Exception("API error")
+async def test_get_account_info_failure(trader: AlpacaTrader, respx_mock: MockRouter):
+    route = respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/account").mock(
+        return_value=httpx.Response(500, json={"message": "API error"})
+    )
 
     account = await trader.get_account_info()
     assert account is None
-    trader.api.get_account.assert_called_once()
+    assert route.call_count == 4  # 5xx responses are retried three times
 
 
 @pytest.mark.asyncio
-async def test_place_order_success(trader: AlpacaTrader):
-    # Configure the mock to return a successful order object
-    mock_order = MagicMock(id="order_id_123", symbol="AAPL", qty="1",
-                           side="buy", type="market")
-    trader.api.submit_order.return_value = mock_order
+async def test_place_order_success(trader: AlpacaTrader, respx_mock: MockRouter):
+    route = respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(
+        return_value=httpx.Response(200, json={
+            "id": "order_id_123", "symbol": "AAPL", "qty": "1",
+            "side": "buy", "type": "market", "time_in_force": "gtc",
+            "status": "accepted",
+        })
+    )
 
     order = await trader.place_order(symbol="AAPL", qty=1, side="buy")
     assert order is not None
     assert order.id == "order_id_123"
     assert order.symbol == "AAPL"
-    trader.api.submit_order.assert_called_once_with(
-        symbol="AAPL", qty=1, side="buy", type="market", time_in_force="gtc"
-    )
+    assert route.call_count == 1
+    assert json.loads(route.calls.last.request.content) == {
+        "symbol": "AAPL", "qty": "1", "side": "buy", "type": "market",
+        "time_in_force": "gtc",
+    }
 
 
 @pytest.mark.asyncio
-async def test_place_order_failure(trader: AlpacaTrader):
-    # Configure the mock to raise an exception
-    trader.api.submit_order.side_effect = Exception("Invalid order parameters.")
+async def test_place_order_failure(trader: AlpacaTrader, respx_mock: MockRouter):
+    route = respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(
+        return_value=httpx.Response(422, json={
+            "message": "Invalid order parameters."
+        })
+    )
 
     order = await trader.place_order(symbol="INVALID", qty=1, side="buy")
     assert order is None
-    trader.api.submit_order.assert_called_once()
+    assert route.call_count == 1
 
 
 @pytest.mark.asyncio
-async def test_get_position_success(trader: AlpacaTrader):
-    # Configure the mock to return a successful position object
-    mock_position = MagicMock(symbol="AAPL", qty="10", avg_entry_price="150.0")
-    trader.api.get_position.return_value = mock_position
+async def test_place_order_retries_5xx_only_with_a_client_order_id(
+    trader: AlpacaTrader, respx_mock: MockRouter
+):
+    route = respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(
+        return_value=httpx.Response(503, json={"message": "unavailable"})
+    )
+    respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/orders:by_client_order_id").mock(
+        return_value=httpx.Response(404, json={"message": "not found"})
+    )
+
+    assert await trader.place_order(symbol="AAPL", qty=1, side="buy") is None
+    assert route.call_count == 1  # Not idempotent: never resent
+
+    await trader.place_order(symbol="AAPL", qty=1, side="buy", client_order_id="AAPL-buy-60")
+    assert route.call_count == 1 + 4
+
+
+@pytest.mark.asyncio
+async def test_place_order_network_error(trader: AlpacaTrader, respx_mock: MockRouter):
+    respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(
+        side_effect=httpx.ConnectError("Connection refused")
+    )
+
+    order = await trader.place_order(symbol="AAPL", qty=1, side="buy")
+    assert order is None
+
+
+@pytest.mark.asyncio
+async def test_get_position_success(trader: AlpacaTrader, respx_mock: MockRouter):
+    route = respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/positions/AAPL").mock(
+        return_value=httpx.Response(200, json={
+            "symbol": "AAPL", "qty": "10", "avg_entry_price": "150.0",
+            "side": "long",
+        })
+    )
 
     position = await trader.get_position(symbol="AAPL")
     assert position is not None
     assert position.symbol == "AAPL"
     assert int(position.qty) == 10
-    trader.api.get_position.assert_called_once_with("AAPL")
+    assert route.call_count == 1
 
 
 @pytest.mark.asyncio
-async def test_get_position_not_found(trader: AlpacaTrader):
-    # Configure the mock to raise an exception (Alpaca API raises for no position)
-    trader.api.get_position.side_effect = Exception("position not found")
+async def test_get_position_not_found(trader: AlpacaTrader, respx_mock: MockRouter):
+    # Alpaca answers 404 when there is no open position
+    route = respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/positions/MSFT").mock(
+        return_value=httpx.Response(404, json={"message": "position does not exist"})
+    )
 
     position = await trader.get_position(symbol="MSFT")
     assert position is None
-    trader.api.get_position.assert_called_once_with("MSFT")
+    assert route.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_get_positions_runs_in_parallel(trader: AlpacaTrader, respx_mock: MockRouter):
+    async def slow_position(request):
+        await asyncio.sleep(0.2)
+        symbol = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(200, json={
+            "symbol": symbol, "qty": "1", "avg_entry_price": "1.0",
+        })
+
+    respx_mock.get(url__regex=rf"{ALPACA_API_BASE_URL}/v2/positions/.+").mock(
+        side_effect=slow_position
+    )
+    symbols = ["BTCUSD", "ETHUSD", "SOLUSD", "LTCUSD"]
+
+    start = asyncio.get_event_loop().time()
+    positions = await trader.get_positions(symbols)
+    elapsed = asyncio.get_event_loop().time() - start
+
+    assert [p.symbol for p in positions.values()] == symbols
+    assert elapsed < 0.6  # Four 0.2s round trips overlap
+
+
+def test_ledger_books_fills_and_reports_drift():
+    ledger = PositionLedger()
+    assert ledger.reconcile(1000.0, {"BTCUSD": 0.5}, now=0.0) == []
+
+    ledger.apply_fill("ETHUSD", "buy", 2.0, 100.0)
+    ledger.apply_fill("BTCUSD", "sell", 0.5, 200.0)
+    assert ledger.cash == 1000.0 - 200.0 + 100.0
+    assert ledger.positions == {"ETHUSD": 2.0}
+    assert not ledger.due(300, now=100.0)
+    assert ledger.due(300, now=300.0)
+
+    assert ledger.reconcile(901.0, {"ETHUSD": 1.5}, now=300.0) == ["cash", "ETHUSD"]
+    assert ledger.position("ETHUSD") == 1.5
+
+
+@pytest.mark.asyncio
+async def test_reconcile_seeds_ledger_and_orders_update_it(trader: AlpacaTrader, respx_mock: MockRouter):
+    account = respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/account").mock(
+        return_value=httpx.Response(200, json={
+            "status": "ACTIVE", "equity": "1000", "buying_power": "1000", "cash": "1000",
+        })
+    )
+    respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/positions").mock(
+        return_value=httpx.Response(200, json=[
+            {"symbol": "BTCUSD", "qty": "0.25", "avg_entry_price": "100.0"},
+        ])
+    )
+    respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(side_effect=[
+        httpx.Response(200, json={
+            "id": "order-1", "symbol": "ETHUSD", "qty": "2", "side": "buy",
+            "type": "market", "status": "filled", "filled_qty": "2",
+            "filled_avg_price": "10.5",
+        }),
+        httpx.Response(200, json={
+            "id": "order-2", "symbol": "ETHUSD", "qty": "1", "side": "buy",
+            "type": "market", "status": "accepted", "filled_qty": "0",
+        }),
+    ])
+
+    assert await trader.maybe_reconcile(300) is True
+    assert trader.ledger.positions == {"BTCUSD": 0.25}
+    assert await trader.maybe_reconcile(300) is False  # Not due yet
+
+    # Booked from the reported fill, not the requested quantity
+    await trader.place_order(symbol="ETHUSD", qty=2.0, side="buy")
+    assert trader.ledger.position("ETHUSD") == 2.0
+    assert trader.ledger.cash == 979.0
+    assert trader.ledger.buying_power == 979.0
+    assert account.call_count == 1
+
+    await trader.place_order(symbol="ETHUSD", qty=1.0, side="buy")
+    assert trader.ledger.position("ETHUSD") == 2.0  # Nothing filled yet
+    assert await trader.maybe_reconcile(300) is True  # Stale until then
+
+
+@pytest.mark.asyncio
+async def test_reconcile_keeps_buying_power_separate_from_cash(
+    trader: AlpacaTrader, respx_mock: MockRouter
+):
+    respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/account").mock(
+        return_value=httpx.Response(200, json={
+            "status": "ACTIVE", "equity": "1000", "buying_power": "4000", "cash": "1000",
+        })
+    )
+    respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/positions").mock(
+        return_value=httpx.Response(200, json=[])
+    )
+
+    assert await trader.reconcile() is True
+    assert trader.ledger.cash == 1000.0
+    assert trader.ledger.buying_power == 4000.0
+    trader.ledger.apply_fill("ETHUSD", "buy", 1.0, 100.0)
+    assert trader.ledger.buying_power == 3900.0
+
+
+@pytest.mark.asyncio
+async def test_failed_order_marks_ledger_stale(trader: AlpacaTrader, respx_mock: MockRouter):
+    trader.ledger.reconcile(1000.0, {})
+    respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(
+        side_effect=httpx.ConnectError("connection reset")
+    )
+
+    assert await trader.place_order(symbol="ETHUSD", qty=1.0, side="buy") is None
+    assert trader.ledger.stale
+    assert trader.ledger.position("ETHUSD") == 0.0
+
+
+@pytest.mark.asyncio
+async def test_place_order_sends_client_order_id(trader: AlpacaTrader, respx_mock: MockRouter):
+    route = respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(
+        return_value=httpx.Response(200, json={
+            "id": "o1", "symbol": "BTCUSD", "qty": "1", "side": "buy", "type": "market", "status": "new",
+        })
+    )
+
+    order = await trader.place_order("BTCUSD", 1, "buy", client_order_id="BTCUSD-buy-60")
+    assert order.id == "o1"
+    assert json.loads(route.calls.last.request.content)["client_order_id"] == "BTCUSD-buy-60"
+
+
+@pytest.mark.asyncio
+async def test_place_order_duplicate_client_id_returns_existing(
+    trader: AlpacaTrader, respx_mock: MockRouter
+):
+    respx_mock.post(f"{ALPACA_API_BASE_URL}/v2/orders").mock(
+        return_value=httpx.Response(422, json={"message": "client_order_id must be unique"})
+    )
+    lookup = respx_mock.get(f"{ALPACA_API_BASE_URL}/v2/orders:by_client_order_id").mock(
+        return_value=httpx.Response(200, json={
+            "id": "o1", "symbol": "BTCUSD", "qty": "1", "side": "buy", "type": "market", "status": "filled",
+        })
+    )
+    trader.ledger.reconcile(1000.0, {})
+
+    order = await trader.place_order("BTCUSD", 1, "buy", client_order_id="BTCUSD-buy-60")
+    assert order.id == "o1"
+    assert lookup.calls.last.request.url.params["client_order_id"] == "BTCUSD-buy-60"
+    # An earlier attempt may already have booked it; reconcile decides
+    assert trader.ledger.position("BTCUSD") == 0
+    assert trader.ledger.cash == 1000.0
+    assert trader.ledger.stale
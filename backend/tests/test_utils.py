@@ -0,0 +1,85 @@
+import io
+import json
+import logging
+import threading
+
+from app import utils
+from app.utils import JsonFormatter, LogSampler, setup_logging
+
+
+def test_json_formatter_merges_structured_fields():
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, "Tick %s", ("BTC-USD",), None)
+    record.fields = {"symbol": "BTC-USD", "indicators": {"RSI_14": 55.5}}
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "Tick BTC-USD"
+    assert entry["level"] == "INFO"
+    assert entry["indicators"] == {"RSI_14": 55.5}
+
+
+def test_log_sampler_rate_limits_per_key_and_counts_drops():
+    now = [0.0]
+    sampler = LogSampler(60, clock=lambda: now[0])
+
+    assert sampler.sample("BTC-USD") == 0
+    assert sampler.sample("ETH-USD") == 0  # Keys are independent
+    now[0] = 30.0
+    assert sampler.sample("BTC-USD") is None
+    assert sampler.sample("BTC-USD") is None
+    assert sampler.sample("BTC-USD", force=True) == 2
+    now[0] = 95.0
+    assert sampler.sample("BTC-USD") == 0
+
+
+def test_setup_logging_writes_on_a_background_thread(monkeypatch):
+    stream = io.StringIO()
+    threads = []
+
+    class RecordingHandler(logging.StreamHandler):
+        def emit(self, record):
+            threads.append(threading.current_thread())
+            super().emit(record)
+
+    monkeypatch.setattr(utils.logging, "StreamHandler", lambda: RecordingHandler(stream))
+    try:
+        setup_logging("INFO", "json")
+        logging.getLogger("app.test").info("hello", extra={"fields": {"tick": 1}})
+        logging.getLogger("app.test").debug("dropped")
+        utils._stop_listener()  # Drains the queue
+
+        lines = stream.getvalue().splitlines()
+        assert [json.loads(line)["tick"] for line in lines] == [1]
+        assert threads and threads[0] is not threading.main_thread()
+    finally:
+        monkeypatch.undo()
+        setup_logging()
+
+
+def test_setup_logging_formats_tracebacks_on_the_listener(monkeypatch):
+    stream = io.StringIO()
+    threads = []
+
+    class RecordingFormatter(JsonFormatter):
+        def formatException(self, exc_info):
+            threads.append(threading.current_thread())
+            return super().formatException(exc_info)
+
+    stream_handler = logging.StreamHandler(stream)
+    monkeypatch.setattr(utils.logging, "StreamHandler", lambda: stream_handler)
+    monkeypatch.setattr(utils, "JsonFormatter", RecordingFormatter)
+    try:
+        setup_logging("INFO", "json")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logging.getLogger("app.test").exception("Tick %s failed", "BTC-USD")
+        utils._stop_listener()
+
+        entry = json.loads(stream.getvalue())
+        assert entry["message"] == "Tick BTC-USD failed"
+        assert "ValueError: boom" in entry["exc_info"]
+        assert threads and threads[0] is not threading.main_thread()
+    finally:
+        monkeypatch.undo()
+        setup_logging()